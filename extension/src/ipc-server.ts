@@ -73,10 +73,12 @@ export class IPCServer extends EventEmitter {
         });
 
         // Send welcome message
-        this.sendResponse(socket, {
+        this.sendResponse(socket, undefined, {
             type: 'welcome',
             data: {
                 version: '0.1.0',
+                // Every reply carries the id of the request it answers
+                echoesIds: true,
                 capabilities: this.rooInterface.getCapabilities()
             }
         });
@@ -93,7 +95,7 @@ export class IPCServer extends EventEmitter {
                 this.handleMessage(session, message);
             } catch (error) {
                 console.error('Failed to parse message:', error);
-                this.sendError(session.socket, 'PARSE_ERROR', 'Invalid JSON message');
+                this.sendError(session.socket, undefined, 'PARSE_ERROR', 'Invalid JSON message');
             }
         }
     }
@@ -110,7 +112,7 @@ export class IPCServer extends EventEmitter {
                 
                 case 'execute':
                     if (!session.authenticated) {
-                        this.sendError(session.socket, 'AUTH_REQUIRED', 'Authentication required');
+                        this.sendError(session.socket, message, 'AUTH_REQUIRED', 'Authentication required');
                         return;
                     }
                     await this.handleExecute(session, message);
@@ -118,7 +120,7 @@ export class IPCServer extends EventEmitter {
 
                 case 'readFile':
                     if (!session.authenticated) {
-                        this.sendError(session.socket, 'AUTH_REQUIRED', 'Authentication required');
+                        this.sendError(session.socket, message, 'AUTH_REQUIRED', 'Authentication required');
                         return;
                     }
                     await this.handleReadFile(session, message);
@@ -126,7 +128,7 @@ export class IPCServer extends EventEmitter {
 
                 case 'writeFile':
                     if (!session.authenticated) {
-                        this.sendError(session.socket, 'AUTH_REQUIRED', 'Authentication required');
+                        this.sendError(session.socket, message, 'AUTH_REQUIRED', 'Authentication required');
                         return;
                     }
                     await this.handleWriteFile(session, message);
@@ -134,7 +136,7 @@ export class IPCServer extends EventEmitter {
 
                 case 'listFiles':
                     if (!session.authenticated) {
-                        this.sendError(session.socket, 'AUTH_REQUIRED', 'Authentication required');
+                        this.sendError(session.socket, message, 'AUTH_REQUIRED', 'Authentication required');
                         return;
                     }
                     await this.handleListFiles(session, message);
@@ -142,7 +144,7 @@ export class IPCServer extends EventEmitter {
 
                 case 'search':
                     if (!session.authenticated) {
-                        this.sendError(session.socket, 'AUTH_REQUIRED', 'Authentication required');
+                        this.sendError(session.socket, message, 'AUTH_REQUIRED', 'Authentication required');
                         return;
                     }
                     await this.handleSearch(session, message);
@@ -150,7 +152,7 @@ export class IPCServer extends EventEmitter {
 
                 case 'getActiveFile':
                     if (!session.authenticated) {
-                        this.sendError(session.socket, 'AUTH_REQUIRED', 'Authentication required');
+                        this.sendError(session.socket, message, 'AUTH_REQUIRED', 'Authentication required');
                         return;
                     }
                     await this.handleGetActiveFile(session, message);
@@ -158,7 +160,7 @@ export class IPCServer extends EventEmitter {
 
                 case 'getDiagnostics':
                     if (!session.authenticated) {
-                        this.sendError(session.socket, 'AUTH_REQUIRED', 'Authentication required');
+                        this.sendError(session.socket, message, 'AUTH_REQUIRED', 'Authentication required');
                         return;
                     }
                     await this.handleGetDiagnostics(session, message);
@@ -166,7 +168,7 @@ export class IPCServer extends EventEmitter {
 
                 case 'runTask':
                     if (!session.authenticated) {
-                        this.sendError(session.socket, 'AUTH_REQUIRED', 'Authentication required');
+                        this.sendError(session.socket, message, 'AUTH_REQUIRED', 'Authentication required');
                         return;
                     }
                     await this.handleRunTask(session, message);
@@ -174,7 +176,7 @@ export class IPCServer extends EventEmitter {
 
                 case 'configureProvider':
                     if (!session.authenticated) {
-                        this.sendError(session.socket, 'AUTH_REQUIRED', 'Authentication required');
+                        this.sendError(session.socket, message, 'AUTH_REQUIRED', 'Authentication required');
                         return;
                     }
                     await this.handleConfigureProvider(session, message);
@@ -182,18 +184,18 @@ export class IPCServer extends EventEmitter {
 
                 case 'approvalResponse':
                     if (!session.authenticated) {
-                        this.sendError(session.socket, 'AUTH_REQUIRED', 'Authentication required');
+                        this.sendError(session.socket, message, 'AUTH_REQUIRED', 'Authentication required');
                         return;
                     }
                     await this.handleApprovalResponse(session, message);
                     break;
 
                 default:
-                    this.sendError(session.socket, 'UNKNOWN_MESSAGE', `Unknown message type: ${message.type}`);
+                    this.sendError(session.socket, message, 'UNKNOWN_MESSAGE', `Unknown message type: ${message.type}`);
             }
         } catch (error: any) {
             console.error('Error handling message:', error);
-            this.sendError(session.socket, 'INTERNAL_ERROR', error.message);
+            this.sendError(session.socket, message, 'INTERNAL_ERROR', error.message);
         }
     }
 
@@ -203,24 +205,24 @@ export class IPCServer extends EventEmitter {
         // Simple authentication - in production, validate against secure store
         if (apiKey && apiKey.length > 0) {
             session.authenticated = true;
-            this.sendResponse(session.socket, {
+            this.sendResponse(session.socket, message, {
                 type: 'authenticated',
                 data: { success: true }
             });
         } else {
-            this.sendError(session.socket, 'AUTH_FAILED', 'Invalid API key');
+            this.sendError(session.socket, message, 'AUTH_FAILED', 'Invalid API key');
         }
     }
 
     private async handleExecute(session: ClientSession, message: IPCMessage) {
         const { command } = message.data || {};
         if (!command) {
-            this.sendError(session.socket, 'INVALID_PARAMS', 'Command is required');
+            this.sendError(session.socket, message, 'INVALID_PARAMS', 'Command is required');
             return;
         }
 
         const result = await this.rooInterface.executeCommand(command);
-        this.sendResponse(session.socket, {
+        this.sendResponse(session.socket, message, {
             type: 'executeResult',
             data: result
         });
@@ -229,12 +231,12 @@ export class IPCServer extends EventEmitter {
     private async handleReadFile(session: ClientSession, message: IPCMessage) {
         const { path } = message.data || {};
         if (!path) {
-            this.sendError(session.socket, 'INVALID_PARAMS', 'Path is required');
+            this.sendError(session.socket, message, 'INVALID_PARAMS', 'Path is required');
             return;
         }
 
         const content = await this.rooInterface.readFile(path);
-        this.sendResponse(session.socket, {
+        this.sendResponse(session.socket, message, {
             type: 'fileContent',
             data: { path, content }
         });
@@ -243,12 +245,12 @@ export class IPCServer extends EventEmitter {
     private async handleWriteFile(session: ClientSession, message: IPCMessage) {
         const { path, content } = message.data || {};
         if (!path || content === undefined) {
-            this.sendError(session.socket, 'INVALID_PARAMS', 'Path and content are required');
+            this.sendError(session.socket, message, 'INVALID_PARAMS', 'Path and content are required');
             return;
         }
 
         await this.rooInterface.writeFile(path, content);
-        this.sendResponse(session.socket, {
+        this.sendResponse(session.socket, message, {
             type: 'writeSuccess',
             data: { path }
         });
@@ -257,7 +259,7 @@ export class IPCServer extends EventEmitter {
     private async handleListFiles(session: ClientSession, message: IPCMessage) {
         const { directory, pattern } = message.data || {};
         const files = await this.rooInterface.listFiles(directory, pattern);
-        this.sendResponse(session.socket, {
+        this.sendResponse(session.socket, message, {
             type: 'fileList',
             data: { files }
         });
@@ -266,12 +268,12 @@ export class IPCServer extends EventEmitter {
     private async handleSearch(session: ClientSession, message: IPCMessage) {
         const { query, options } = message.data || {};
         if (!query) {
-            this.sendError(session.socket, 'INVALID_PARAMS', 'Query is required');
+            this.sendError(session.socket, message, 'INVALID_PARAMS', 'Query is required');
             return;
         }
 
         const results = await this.rooInterface.search(query, options);
-        this.sendResponse(session.socket, {
+        this.sendResponse(session.socket, message, {
             type: 'searchResults',
             data: { results }
         });
@@ -279,7 +281,7 @@ export class IPCServer extends EventEmitter {
 
     private async handleGetActiveFile(session: ClientSession, message: IPCMessage) {
         const activeFile = await this.rooInterface.getActiveFile();
-        this.sendResponse(session.socket, {
+        this.sendResponse(session.socket, message, {
             type: 'activeFile',
             data: activeFile
         });
@@ -288,7 +290,7 @@ export class IPCServer extends EventEmitter {
     private async handleGetDiagnostics(session: ClientSession, message: IPCMessage) {
         const { uri } = message.data || {};
         const diagnostics = await this.rooInterface.getDiagnostics(uri);
-        this.sendResponse(session.socket, {
+        this.sendResponse(session.socket, message, {
             type: 'diagnostics',
             data: { diagnostics }
         });
@@ -297,12 +299,12 @@ export class IPCServer extends EventEmitter {
     private async handleRunTask(session: ClientSession, message: IPCMessage) {
         const { prompt, config } = message.data || {};
         if (!prompt) {
-            this.sendError(session.socket, 'INVALID_PARAMS', 'Prompt is required');
+            this.sendError(session.socket, message, 'INVALID_PARAMS', 'Prompt is required');
             return;
         }
 
         const result = await this.rooInterface.runTask(prompt, config);
-        this.sendResponse(session.socket, {
+        this.sendResponse(session.socket, message, {
             type: 'taskResult',
             data: result
         });
@@ -311,12 +313,12 @@ export class IPCServer extends EventEmitter {
     private async handleConfigureProvider(session: ClientSession, message: IPCMessage) {
         const config = message.data;
         if (!config) {
-            this.sendError(session.socket, 'INVALID_PARAMS', 'Configuration is required');
+            this.sendError(session.socket, message, 'INVALID_PARAMS', 'Configuration is required');
             return;
         }
 
         const success = await this.rooInterface.configureProvider(config);
-        this.sendResponse(session.socket, {
+        this.sendResponse(session.socket, message, {
             type: 'configurationResult',
             data: { success }
         });
@@ -325,12 +327,12 @@ export class IPCServer extends EventEmitter {
     private async handleApprovalResponse(session: ClientSession, message: IPCMessage) {
         const { approved, response } = message.data || {};
         if (typeof approved !== 'boolean') {
-            this.sendError(session.socket, 'INVALID_PARAMS', 'Approval status is required');
+            this.sendError(session.socket, message, 'INVALID_PARAMS', 'Approval status is required');
             return;
         }
 
         const success = await this.rooInterface.sendApprovalResponse(approved, response);
-        this.sendResponse(session.socket, {
+        this.sendResponse(session.socket, message, {
             type: 'approvalResult',
             data: { success }
         });
@@ -353,13 +355,13 @@ export class IPCServer extends EventEmitter {
         }
     }
 
-    private sendResponse(socket: net.Socket, response: IPCResponse) {
-        const message = JSON.stringify(response) + '\n';
+    private sendResponse(socket: net.Socket, request: IPCMessage | undefined, response: IPCResponse) {
+        const message = JSON.stringify(request?.id !== undefined ? { id: request.id, ...response } : response) + '\n';
         socket.write(message);
     }
 
-    private sendError(socket: net.Socket, code: string, message: string) {
-        this.sendResponse(socket, {
+    private sendError(socket: net.Socket, request: IPCMessage | undefined, code: string, message: string) {
+        this.sendResponse(socket, request, {
             type: 'error',
             error: { code, message }
         });
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark: SQLite insert and read throughput, stock settings vs the tuned profile
+
+Usage: python scripts/bench_database.py [--writers 8] [--readers 8] [--rows 2000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+sys.path.append('src')
+from models.database import create_engines
+
+async def run_load(write_engine, read_engine, writers: int, readers: int, rows: int):
+    async with write_engine.begin() as conn:
+        await conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS bench (id INTEGER PRIMARY KEY, task TEXT, body TEXT)"
+        ))
+        await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_bench_task ON bench (task, id)"))
+
+    body = "x" * 512
+    per_writer = rows // writers
+    reads_done = 0
+    stop = asyncio.Event()
+
+    async def writer(n: int):
+        for i in range(per_writer):
+            async with write_engine.begin() as conn:
+                await conn.execute(
+                    text("INSERT INTO bench (task, body) VALUES (:task, :body)"),
+                    {"task": f"task-{(n * per_writer + i) % 50}", "body": body}
+                )
+
+    async def reader(n: int):
+        nonlocal reads_done
+        while not stop.is_set():
+            async with read_engine.connect() as conn:
+                await conn.execute(
+                    text("SELECT id, body FROM bench WHERE task = :task ORDER BY id DESC LIMIT 50"),
+                    {"task": f"task-{n % 50}"}
+                )
+            reads_done += 1
+
+    started = time.perf_counter()
+    reader_tasks = [asyncio.create_task(reader(n)) for n in range(readers)]
+    await asyncio.gather(*(writer(n) for n in range(writers)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await asyncio.gather(*reader_tasks)
+
+    await write_engine.dispose()
+    if read_engine is not write_engine:
+        await read_engine.dispose()
+    return per_writer * writers / elapsed, reads_done / elapsed
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    print("📊 SQLite throughput benchmark")
+    print(f"   {args.writers} writers, {args.readers} readers, {args.rows} single-row transactions")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stock_url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'stock.db')}"
+        stock = create_async_engine(stock_url)
+        inserts, reads = await run_load(stock, stock, args.writers, args.readers, args.rows)
+        print(f"Stock:  {inserts:8.0f} inserts/s  {reads:8.0f} reads/s")
+
+        tuned_url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'tuned.db')}"
+        write_engine, read_engine = create_engines(tuned_url)
+        inserts, reads = await run_load(write_engine, read_engine, args.writers, args.readers, args.rows)
+        print(f"Tuned:  {inserts:8.0f} inserts/s  {reads:8.0f} reads/s")
+
+if __name__ == "__main__":
+    asyncio.run(main())
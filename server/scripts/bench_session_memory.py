@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark: memory per connected session, pydantic model + parallel dicts vs slotted records
+
+Usage: python scripts/bench_session_memory.py [--sessions 100000]
+"""
+
+import argparse
+import gc
+import sys
+import tracemalloc
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+sys.path.append('src')
+from models.connection import Connection
+from models.session import Session
+
+class PydanticSession(BaseModel):
+    """The session model as it was before the slotted rewrite."""
+    id: str
+    client_id: str
+    created_at: datetime
+    last_activity: datetime
+    active: bool
+    context: dict
+    provider: Optional[str] = "roo-code"
+
+def build_pydantic(count: int, websocket):
+    active_connections, sessions, adapters = {}, {}, {}
+    for i in range(count):
+        client_id = f"client-{i}"
+        now = datetime.utcnow()
+        active_connections[client_id] = websocket
+        sessions[client_id] = PydanticSession(
+            id=str(uuid.uuid4()), client_id=client_id, created_at=now,
+            last_activity=now, active=True, context={}, provider="roo-code"
+        )
+    return active_connections, sessions, adapters
+
+def build_slotted(count: int, websocket):
+    connections = {}
+    for i in range(count):
+        client_id = f"client-{i}"
+        now = datetime.utcnow()
+        session = Session(id=str(uuid.uuid4()), client_id=client_id, created_at=now, last_activity=now)
+        connections[client_id] = Connection(client_id, websocket, session)
+    return connections
+
+def measure(build, count: int) -> float:
+    websocket = object()  # shared stand-in; the socket itself is not part of the comparison
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    registry = build(count, websocket)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del registry
+    return (after - before) / count
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=100000)
+    args = parser.parse_args()
+
+    print("📊 Session memory benchmark")
+    print(f"   {args.sessions} simulated connected sessions")
+    print("=" * 50)
+
+    before = measure(build_pydantic, args.sessions)
+    print(f"Pydantic + parallel dicts: {before:8.0f} bytes/session")
+    after = measure(build_slotted, args.sessions)
+    print(f"Slotted connection record: {after:8.0f} bytes/session")
+    print(f"Saved: {before - after:.0f} bytes/session ({(1 - after / before) * 100:.0f}%)")
+
+if __name__ == "__main__":
+    main()
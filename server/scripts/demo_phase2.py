@@ -11,10 +11,25 @@ Run after starting the server with: uv run python src/main.py
 
 import asyncio
 import json
+import os
+import urllib.parse
+import urllib.request
 import websockets
 from datetime import datetime
 import sys
 
+
+def get_token(base_url: str) -> str:
+    """Bearer token for the WebSocket handshake: $BRIDGE_TOKEN, or a /token login."""
+    if os.getenv("BRIDGE_TOKEN"):
+        return os.environ["BRIDGE_TOKEN"]
+    form = urllib.parse.urlencode({
+        "username": os.getenv("BRIDGE_USERNAME", "admin"),
+        "password": os.getenv("BRIDGE_PASSWORD", "admin"),
+    }).encode()
+    with urllib.request.urlopen(f"{base_url}/token", data=form) as response:
+        return json.load(response)["access_token"]
+
 class Phase2Demo:
     def __init__(self, client_id="demo-phase2"):
         self.client_id = client_id
@@ -22,8 +37,9 @@ class Phase2Demo:
         self.websocket = None
         
     async def connect(self):
-        """Connect to the WebSocket server."""
-        self.websocket = await websockets.connect(self.uri)
+        """Connect to the WebSocket server, authenticating at the handshake."""
+        token = get_token("http://localhost:8000")
+        self.websocket = await websockets.connect(f"{self.uri}?token={token}")
         print(f"✅ Connected to WebSocket as {self.client_id}")
         
     async def disconnect(self):
@@ -5,8 +5,23 @@ Demo: How to use the Roo-Code Bridge with Qwen-3-Coder
 
 import asyncio
 import json
+import os
+import urllib.parse
+import urllib.request
 import websockets
 
+
+def get_token(base_url: str) -> str:
+    """Bearer token for the WebSocket handshake: $BRIDGE_TOKEN, or a /token login."""
+    if os.getenv("BRIDGE_TOKEN"):
+        return os.environ["BRIDGE_TOKEN"]
+    form = urllib.parse.urlencode({
+        "username": os.getenv("BRIDGE_USERNAME", "admin"),
+        "password": os.getenv("BRIDGE_PASSWORD", "admin"),
+    }).encode()
+    with urllib.request.urlopen(f"{base_url}/token", data=form) as response:
+        return json.load(response)["access_token"]
+
 async def demo_usage():
     print("🎯 Roo-Code Bridge Usage Demo")
     print("=" * 40)
@@ -15,7 +30,9 @@ async def demo_usage():
     print("🔗 Endpoint: http://localhost:3000/v1")
     print("=" * 40)
     
-    uri = "ws://localhost:47291/ws/demo-user"
+    # The bridge authenticates WebSockets at the handshake
+    token = get_token("http://localhost:47291")
+    uri = f"ws://localhost:47291/ws/demo-user?token={token}"
     
     async with websockets.connect(uri) as websocket:
         print("\n✅ Connected to bridge!")
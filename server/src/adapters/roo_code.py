@@ -2,7 +2,7 @@ import asyncio
 import json
 from typing import AsyncIterator, Dict, Any, Optional
 from adapters.base import LLMAdapter
-from utils.ipc_client import IPCClient
+from utils.ipc_client import IPCClient, Priority
 import logging
 
 logger = logging.getLogger(__name__)
@@ -115,7 +115,7 @@ class RooCodeAdapter(LLMAdapter):
                 "data": {
                     "task_id": self.current_task_id
                 }
-            })
+            }, priority=Priority.CONTROL)
             
             if response.get("type") == "task.cancelled":
                 self.current_task_id = None
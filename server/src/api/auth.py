@@ -2,52 +2,340 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+import asyncio
+import hashlib
+import hmac
+import json
+import secrets
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
 import os
+import time
+
+from utils.metrics import metrics
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+MAX_PENDING_LOGINS = int(os.getenv("MAX_PENDING_LOGINS", "200"))
+API_KEY_PREFIX = "rcb_"
+API_KEY_SECRET = os.getenv("API_KEY_SECRET", SECRET_KEY)
+API_KEYS_FILE = os.getenv("API_KEYS_FILE")
+# Users, and API keys with ADMIN_SCOPE, that may change settings shared by everyone
+ADMIN_USERS = frozenset(name.strip() for name in os.getenv("ADMIN_USERS", "admin").split(",") if name.strip())
+ADMIN_SCOPE = "admin"
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
+class TokenCache:
+    """Bounded LRU of tokens that already passed ``jwt.decode``.
+
+    Each entry lives until the token's own ``exp``, so a hit is a dict
+    lookup plus a clock read. Revocation evicts entries and calls the
+    registered hooks (e.g. to close WebSockets opened with the token).
+    """
+    
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()  # token -> (subject, exp)
+        self._revoked: Dict[str, float] = {}  # token -> exp, so it fails even after eviction
+        self._revoked_before: Dict[str, float] = {}  # subject -> tokens issued earlier are invalid
+        self._hooks: List[Callable[[Optional[str], Optional[str]], None]] = []
+        self.hits = 0
+        self.misses = 0
+        
+    def __len__(self) -> int:
+        return len(self._entries)
+        
+    def get_entry(self, token: str) -> Optional[Tuple[str, float]]:
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[1] <= time.time():
+            del self._entries[token]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return entry
+        
+    def get(self, token: str) -> Optional[str]:
+        entry = self.get_entry(token)
+        return entry[0] if entry else None
+        
+    def put(self, token: str, subject: str, exp: float):
+        self._entries[token] = (subject, exp)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            
+    def is_revoked(self, token: str, subject: str, issued_at: float) -> bool:
+        return token in self._revoked or issued_at < self._revoked_before.get(subject, 0)
+        
+    def revoke(self, token: str, exp: Optional[float] = None):
+        """Reject this token from now on, cached or not."""
+        entry = self._entries.pop(token, None)
+        now = time.time()
+        self._revoked = {t: e for t, e in self._revoked.items() if e > now}
+        self._revoked[token] = exp or (entry[1] if entry else now + ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+        for hook in self._hooks:
+            hook(token, None)
+            
+    def revoke_subject(self, subject: str):
+        """Reject every token issued to ``subject`` so far."""
+        self._revoked_before[subject] = time.time()
+        for token in [t for t, (s, _) in self._entries.items() if s == subject]:
+            del self._entries[token]
+        for hook in self._hooks:
+            hook(None, subject)
+            
+    def add_revocation_hook(self, hook: Callable[[Optional[str], Optional[str]], None]):
+        """``hook(token, subject)`` runs after each revoke; one of the two is None."""
+        self._hooks.append(hook)
+        
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+token_cache = TokenCache()
+metrics.gauge("auth.token_cache.hit_rate", token_cache.hit_rate)
+metrics.gauge("auth.token_cache.size", lambda: len(token_cache))
+
+class ApiKey:
+    """A machine client's key: only its digest is kept, never the key itself."""
+    
+    __slots__ = ("name", "digest", "scopes", "uses", "last_used")
+    
+    def __init__(self, name: str, digest: str, scopes: Iterable[str] = ("*",)):
+        self.name = name
+        self.digest = digest
+        self.scopes: Set[str] = set(scopes)
+        self.uses = 0
+        self.last_used: Optional[float] = None
+        
+    @property
+    def subject(self) -> str:
+        return f"apikey:{self.name}"
+        
+    def allows(self, scope: str) -> bool:
+        return "*" in self.scopes or scope in self.scopes
+
+class ApiKeyStore:
+    """API keys indexed by HMAC-SHA256 digest.
+    
+    Keys are long random strings, so a keyed fast hash is enough; checking
+    one is a single HMAC plus a dict lookup instead of a bcrypt verify.
+    """
+    
+    def __init__(self, secret: str = API_KEY_SECRET):
+        self._secret = secret.encode()
+        self._by_digest: Dict[str, ApiKey] = {}
+        self._by_name: Dict[str, ApiKey] = {}
+        
+    def __len__(self) -> int:
+        return len(self._by_digest)
+        
+    def digest(self, key: str) -> str:
+        return hmac.new(self._secret, key.encode(), hashlib.sha256).hexdigest()
+        
+    def add(self, name: str, digest: str, scopes: Iterable[str] = ("*",)) -> ApiKey:
+        self.revoke(name)
+        api_key = ApiKey(name, digest, scopes)
+        self._by_digest[digest] = api_key
+        self._by_name[name] = api_key
+        return api_key
+        
+    def issue(self, name: str, scopes: Iterable[str] = ("*",)) -> str:
+        """Create a key for ``name`` and return it; it cannot be recovered later."""
+        key = API_KEY_PREFIX + secrets.token_urlsafe(32)
+        self.add(name, self.digest(key), scopes)
+        return key
+        
+    def revoke(self, name: str):
+        api_key = self._by_name.pop(name, None)
+        if api_key is not None:
+            del self._by_digest[api_key.digest]
+            
+    def lookup(self, key: str) -> Optional[ApiKey]:
+        return self._by_digest.get(self.digest(key))
+        
+    def verify(self, key: str) -> Optional[ApiKey]:
+        """Like ``lookup`` but counts the use."""
+        api_key = self.lookup(key)
+        if api_key is None:
+            metrics.inc("auth.api_key_rejected")
+            return None
+        api_key.uses += 1
+        api_key.last_used = time.time()
+        return api_key
+        
+    def load(self, path: str):
+        """Load ``{"name": {"digest": "...", "scopes": [...]}}`` from a JSON file."""
+        with open(path) as f:
+            for name, entry in json.load(f).items():
+                self.add(name, entry["digest"], entry.get("scopes", ["*"]))
+                
+    def usage(self) -> Dict[str, int]:
+        return {name: api_key.uses for name, api_key in self._by_name.items()}
+
+api_keys = ApiKeyStore()
+if API_KEYS_FILE:
+    api_keys.load(API_KEYS_FILE)
+metrics.gauge("auth.api_keys.uses", api_keys.usage)
+
+def is_api_key(token: str) -> bool:
+    return token.startswith(API_KEY_PREFIX)
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+class PasswordHasher:
+    """Runs bcrypt on a small dedicated thread pool, off the event loop.
+    
+    bcrypt releases the GIL while hashing, so threads are enough to keep
+    WebSockets responsive. At most ``workers`` operations run at once;
+    later ones wait in FIFO order, and past ``max_pending`` new logins are
+    turned away with 503 instead of queueing without bound.
+    """
+    
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = MAX_PENDING_LOGINS):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop = None
+        self._pending = 0
+        
+    @property
+    def pending(self) -> int:
+        return self._pending
+        
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._slots = loop, asyncio.Semaphore(self.workers)
+        if self._pending >= self.max_pending:
+            metrics.inc("auth.password_rejected")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many logins in progress",
+                headers={"Retry-After": "1"},
+            )
+        
+        self._pending += 1
+        queued = time.perf_counter()
+        try:
+            async with self._slots:
+                metrics.observe("auth.password_queue_ms", (time.perf_counter() - queued) * 1000)
+                return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self._pending -= 1
+            
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(pwd_context.verify, plain_password, hashed_password)
+        
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+        
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+password_hasher = PasswordHasher()
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+def verify_token_claims(token: str) -> Optional[Tuple[str, Optional[float]]]:
+    """Return ``(subject, exp)`` if the token is valid, using the cache when possible."""
+    entry = token_cache.get_entry(token)
+    if entry is not None:
+        return entry
     
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        return username
     except JWTError:
-        raise credentials_exception
+        return None
+    username = payload.get("sub")
+    if username is None or token_cache.is_revoked(token, username, payload.get("iat", 0)):
+        return None
+    if "exp" in payload:
+        token_cache.put(token, username, payload["exp"])
+    return username, payload.get("exp")
+
+def verify_token(token: str) -> Optional[str]:
+    """Return the subject of a valid JWT or API key, without counting key usage."""
+    if is_api_key(token):
+        api_key = api_keys.lookup(token)
+        return api_key.subject if api_key else None
+    claims = verify_token_claims(token)
+    return claims[0] if claims else None
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    token = credentials.credentials
+    if is_api_key(token):
+        api_key = api_keys.verify(token)
+        username = api_key.subject if api_key else None
+    else:
+        username = verify_token(token)
+    if username is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return username
+
+def require_scope(scope: str):
+    """Dependency rejecting API keys without ``scope``; interactive users pass."""
+    async def check(credentials: HTTPAuthorizationCredentials = Depends(security)):
+        if not is_api_key(credentials.credentials):
+            return
+        api_key = api_keys.lookup(credentials.credentials)
+        if api_key is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Could not validate credentials",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        if not api_key.allows(scope):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"API key lacks the '{scope}' scope",
+            )
+    return check
+
+async def is_admin(credentials: HTTPAuthorizationCredentials = Depends(security)) -> bool:
+    """Whether the caller may change global settings; never raises."""
+    token = credentials.credentials
+    if is_api_key(token):
+        api_key = api_keys.lookup(token)
+        return api_key is not None and api_key.allows(ADMIN_SCOPE)
+    return verify_token(token) in ADMIN_USERS
+
+# Demo user store (username -> bcrypt hash) - replace with database lookup.
+# Without ADMIN_PASSWORD_HASH the demo admin/admin login is hashed on first use.
+USERS: Dict[str, Optional[str]] = {"admin": os.getenv("ADMIN_PASSWORD_HASH")}
 
-def authenticate_user(username: str, password: str):
-    # Simple authentication for demo - replace with database lookup
-    if username == "admin" and password == "admin":
+async def authenticate_user(username: str, password: str):
+    if username not in USERS:
+        return None
+    if USERS[username] is None:
+        USERS[username] = await password_hasher.hash("admin")
+    if await password_hasher.verify(password, USERS[username]):
         return {"username": username}
     return None
\ No newline at end of file
@@ -1,7 +1,7 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
-from api.auth import get_current_user
+from api.auth import get_current_user, is_admin
 
 router = APIRouter()
 
@@ -30,6 +30,14 @@ async def get_providers(user: str = Depends(get_current_user)):
         ]
     }
 
+@router.get("/providers/{provider}/models")
+async def get_provider_models(provider: str, request: Request, user: str = Depends(get_current_user)):
+    # Only the catalog's base URL is queried; callers cannot point the bridge elsewhere
+    models = await request.app.state.provider_manager.get_available_models(provider)
+    if not models:
+        raise HTTPException(status_code=404, detail=f"Unknown provider: {provider}")
+    return {"provider": provider, "models": models}
+
 @router.post("/providers")
 async def configure_provider(config: ProviderConfig, user: str = Depends(get_current_user)):
     return {"status": "configured", "provider": config.name}
@@ -48,4 +56,47 @@ async def configure_auto_approval(config: AutoApprovalConfig, user: str = Depend
 
 @router.post("/commands")
 async def configure_commands(config: CommandConfig, user: str = Depends(get_current_user)):
-    return {"status": "configured", "commands": config.dict()}
\ No newline at end of file
+    return {"status": "configured", "commands": config.dict()}
+
+@router.get("/profiles")
+async def list_profiles(request: Request, user: str = Depends(get_current_user)):
+    return {"profiles": await request.app.state.provider_manager.profiles.list(user)}
+
+@router.get("/profiles/{name}")
+async def get_profile(name: str, request: Request, user: str = Depends(get_current_user)):
+    profile = await request.app.state.provider_manager.profiles.get(name, user)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Unknown provider profile: {name}")
+    # Stored keys are never echoed back
+    return {"name": name, "config": {k: v for k, v in profile.items() if k != "api_key"}}
+
+@router.put("/profiles/{name}")
+async def save_profile(
+    name: str,
+    config: Dict[str, Any],
+    request: Request,
+    shared: bool = False,
+    user: str = Depends(get_current_user),
+    admin: bool = Depends(is_admin)
+):
+    if shared and not admin:
+        raise HTTPException(status_code=403, detail="Only admins may change global profiles")
+    provider_manager = request.app.state.provider_manager
+    if not provider_manager.validate_config(config):
+        raise HTTPException(status_code=400, detail="Invalid provider configuration")
+    await provider_manager.profiles.save(name, config, owner=None if shared else user)
+    return {"status": "saved", "name": name, "global": shared}
+
+@router.delete("/profiles/{name}")
+async def delete_profile(
+    name: str,
+    request: Request,
+    shared: bool = False,
+    user: str = Depends(get_current_user),
+    admin: bool = Depends(is_admin)
+):
+    if shared and not admin:
+        raise HTTPException(status_code=403, detail="Only admins may change global profiles")
+    if not await request.app.state.provider_manager.profiles.delete(name, owner=None if shared else user):
+        raise HTTPException(status_code=404, detail=f"Unknown provider profile: {name}")
+    return {"status": "deleted", "name": name}
@@ -1,7 +1,11 @@
-from fastapi import APIRouter, HTTPException, Depends
+import json
+
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
-from api.auth import get_current_user
+from api.auth import get_current_user, is_admin
+from api.tasks import owned_task
 
 router = APIRouter()
 
@@ -35,9 +39,70 @@ async def send_followup(request: MessageRequest, user: str = Depends(get_current
     }
 
 @router.get("/history")
-async def get_message_history(task_id: Optional[str] = None, limit: int = 50, user: str = Depends(get_current_user)):
+async def get_message_history(
+    request: Request,
+    task_id: Optional[str] = None,
+    limit: int = 50,
+    before: Optional[int] = None,
+    q: Optional[str] = None,
+    user: str = Depends(get_current_user),
+    admin: bool = Depends(is_admin)
+):
+    """Newest-first transcript page of the caller's own messages; pass ``next_before`` to page back."""
+    history = getattr(request.app.state, "message_history", None)
+    if history is None:
+        raise HTTPException(status_code=503, detail="Message history not available")
+    limit = max(1, min(limit, 500))
+    messages = await history.fetch(
+        task_id=task_id, limit=limit, before=before, query=q, principal=None if admin else user
+    )
+    return {
+        "messages": messages,
+        "total": len(messages),
+        "task_id": task_id,
+        "next_before": messages[-1]["id"] if len(messages) == limit else None
+    }
+
+def _transcripts(request: Request):
+    transcripts = getattr(request.app.state, "transcripts", None)
+    if transcripts is None:
+        raise HTTPException(status_code=503, detail="Transcripts not available")
+    return transcripts
+
+@router.get("/transcript/{task_id}")
+async def get_transcript(
+    task_id: str,
+    request: Request,
+    offset: int = 0,
+    limit: int = 500,
+    user: str = Depends(get_current_user),
+    admin: bool = Depends(is_admin)
+):
+    """Raw frames of a task in routing order; pass ``next_offset`` back to continue."""
+    transcripts = _transcripts(request)
+    await owned_task(request, task_id, user, admin)
+    limit = max(1, min(limit, 5000))
+    records = await transcripts.read(task_id, offset=max(offset, 0), limit=limit)
     return {
-        "messages": [],
-        "total": 0,
-        "task_id": task_id
-    }
\ No newline at end of file
+        "task_id": task_id,
+        "records": records,
+        "next_offset": records[-1]["offset"] + 1 if records else max(offset, 0)
+    }
+
+@router.get("/transcript/{task_id}/stream")
+async def stream_transcript(
+    task_id: str,
+    request: Request,
+    offset: int = 0,
+    user: str = Depends(get_current_user),
+    admin: bool = Depends(is_admin)
+):
+    """The whole transcript from ``offset`` as newline-delimited JSON."""
+    transcripts = _transcripts(request)
+    await owned_task(request, task_id, user, admin)
+
+    async def lines():
+        async for record in transcripts.stream(task_id, offset=max(offset, 0)):
+            yield json.dumps(record, default=str) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
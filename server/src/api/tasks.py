@@ -1,7 +1,8 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
-from api.auth import get_current_user
+from api.auth import get_current_user, is_admin
+from messages.types import WebviewMessage
 
 router = APIRouter()
 
@@ -9,34 +10,109 @@ class TaskRequest(BaseModel):
     provider: str = "roo-code"
     prompt: str
     config: Optional[Dict[str, Any]] = {}
+    # WebSocket client whose VS Code extension runs the task; defaults to one of the caller's
+    client_id: Optional[str] = None
 
 class TaskResponse(BaseModel):
-    task_id: str
+    task_id: Optional[str] = None
     status: str
     provider: str
+    client_id: Optional[str] = None
 
 @router.post("/", response_model=TaskResponse)
-async def create_task(request: TaskRequest, user: str = Depends(get_current_user)):
-    # This will be connected to the WebSocket manager in main.py
-    # For now, return a placeholder response
+async def create_task(task: TaskRequest, request: Request, user: str = Depends(get_current_user)):
+    message_router = request.app.state.message_router
+    # Only the caller's own connections to the extension may run the task
+    candidates = [
+        client_id for client_id in message_router.ipc_clients
+        if message_router.principal_of(client_id) == user
+    ]
+    if task.client_id is not None:
+        if task.client_id not in candidates:
+            raise HTTPException(status_code=404, detail=f"No extension connection for client {task.client_id}")
+        client_id = task.client_id
+    elif candidates:
+        client_id = candidates[0]
+    else:
+        raise HTTPException(status_code=409, detail="No VS Code extension is connected for this user")
+    
+    try:
+        result = await message_router.route_from_web(
+            client_id, WebviewMessage(type="newTask", data={**(task.config or {}), "prompt": task.prompt})
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
     return TaskResponse(
-        task_id="task-123",
+        task_id=result.get("taskId"),
         status="started",
-        provider=request.provider
+        provider=task.provider,
+        client_id=client_id
     )
 
+async def owned_task(request: Request, task_id: str, user: str, admin: bool = False):
+    """The task, if the caller's own client started it (or the caller is an admin); 404 otherwise."""
+    registry = getattr(request.app.state, "task_registry", None)
+    task = await registry.load(task_id) if registry is not None else None
+    message_router = getattr(request.app.state, "message_router", None)
+    principal = task and (
+        task.principal or (message_router.principal_of(task.client_id) if message_router else None)
+    )
+    # Someone else's task answers exactly like a missing one
+    if task is None or not (admin or (principal is not None and principal == user)):
+        raise HTTPException(status_code=404, detail="Unknown task")
+    return task
+
+async def _control(request: Request, task_id: str, action: str, user: str, admin: bool):
+    result = await request.app.state.message_router.control_task(task_id, action, user, admin)
+    if "error" in result:
+        raise HTTPException(status_code=result.get("code", 400), detail=result["error"])
+    return result
+
 @router.delete("/{task_id}")
-async def cancel_task(task_id: str, user: str = Depends(get_current_user)):
-    return {"status": "cancelled", "task_id": task_id}
+async def cancel_task(
+    task_id: str,
+    request: Request,
+    user: str = Depends(get_current_user),
+    admin: bool = Depends(is_admin)
+):
+    return await _control(request, task_id, "cancel", user, admin)
 
 @router.post("/{task_id}/resume")
-async def resume_task(task_id: str, user: str = Depends(get_current_user)):
-    return {"status": "resumed", "task_id": task_id}
+async def resume_task(
+    task_id: str,
+    request: Request,
+    user: str = Depends(get_current_user),
+    admin: bool = Depends(is_admin)
+):
+    return await _control(request, task_id, "resume", user, admin)
 
 @router.post("/{task_id}/close")
-async def close_task(task_id: str, user: str = Depends(get_current_user)):
-    return {"status": "closed", "task_id": task_id}
+async def close_task(
+    task_id: str,
+    request: Request,
+    user: str = Depends(get_current_user),
+    admin: bool = Depends(is_admin)
+):
+    return await _control(request, task_id, "close", user, admin)
 
 @router.get("/{task_id}/status")
-async def get_task_status(task_id: str, user: str = Depends(get_current_user)):
-    return {"task_id": task_id, "status": "running", "progress": 50}
\ No newline at end of file
+async def get_task_status(
+    task_id: str,
+    request: Request,
+    user: str = Depends(get_current_user),
+    admin: bool = Depends(is_admin)
+):
+    # Served from the in-memory registry, or the tasks table once evicted; no IPC round trip
+    task = await owned_task(request, task_id, user, admin)
+    return {
+        "task_id": task.id,
+        "status": task.state.value,
+        "client_id": task.client_id,
+        "parent_id": task.parent_id,
+        "message_count": task.message_count,
+        "last_event": task.last_event,
+        "created_at": task.created_at.isoformat(),
+        "updated_at": task.updated_at.isoformat()
+    }
\ No newline at end of file
@@ -0,0 +1,90 @@
+"""Immutable, indexed provider/model catalog loaded from a JSON file."""
+
+import json
+import os
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, List, Mapping, Optional, Tuple
+
+DEFAULT_CATALOG_FILE = os.path.join(os.path.dirname(__file__), "providers.json")
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class ProviderCatalog:
+    """Providers and models with every lookup the bridge needs precomputed.
+
+    A catalog is never modified after construction; reloading builds a new
+    one and swaps the reference, so readers holding the old one are
+    unaffected. The payload dicts are shared between callers and must not
+    be mutated.
+    """
+
+    __slots__ = (
+        "providers", "model_sets", "model_providers", "capability_models",
+        "providers_payload", "models_payload", "mtime"
+    )
+
+    def __init__(self, providers: Dict[str, Dict[str, Any]], mtime: Optional[float] = None):
+        self.mtime = mtime
+        self.providers: Mapping[str, Mapping[str, Any]] = _freeze(providers)
+        self.model_sets: Dict[str, FrozenSet[str]] = {
+            name: frozenset(info["models"]) for name, info in providers.items()
+        }
+        model_providers: Dict[str, List[str]] = {}
+        capability_models: Dict[str, List[Tuple[str, str]]] = {}
+        for name, info in providers.items():
+            capabilities = set(info.get("capabilities", ()))
+            if info.get("supports_vision"):
+                capabilities.add("vision")
+            for model in info["models"]:
+                model_providers.setdefault(model, []).append(name)
+                for capability in capabilities:
+                    capability_models.setdefault(capability, []).append((name, model))
+        self.model_providers: Dict[str, Tuple[str, ...]] = {
+            model: tuple(names) for model, names in model_providers.items()
+        }
+        self.capability_models: Dict[str, Tuple[Tuple[str, str], ...]] = {
+            capability: tuple(pairs) for capability, pairs in capability_models.items()
+        }
+        self.providers_payload: Dict[str, Any] = {
+            name: {
+                "models": list(info["models"]),
+                "supports_vision": info["supports_vision"],
+                "max_context": info["max_context"]
+            }
+            for name, info in providers.items()
+        }
+        self.models_payload: Dict[str, List[str]] = {
+            name: list(info["models"]) for name, info in providers.items()
+        }
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_CATALOG_FILE) -> "ProviderCatalog":
+        """Read and index ``path``; raises on unreadable or malformed files."""
+        mtime = os.stat(path).st_mtime
+        with open(path) as f:
+            providers = json.load(f)
+        for name, info in providers.items():
+            for key in ("models", "default_max_tokens", "default_temperature", "supports_vision", "max_context"):
+                if key not in info:
+                    raise ValueError(f"Provider {name} is missing {key}")
+        return cls(providers, mtime)
+
+    def __contains__(self, provider: str) -> bool:
+        return provider in self.providers
+
+    def has_model(self, provider: str, model: str) -> bool:
+        return model in self.model_sets.get(provider, ())
+
+    def providers_for_model(self, model: str) -> Tuple[str, ...]:
+        return self.model_providers.get(model, ())
+
+    def models_with(self, capability: str) -> Tuple[Tuple[str, str], ...]:
+        """``(provider, model)`` pairs offering ``capability``, e.g. ``"vision"``."""
+        return self.capability_models.get(capability, ())
@@ -0,0 +1,108 @@
+"""Live model lists from OpenAI-compatible servers, cached per base URL."""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DISCOVERY_TTL_SECONDS = float(os.getenv("MODEL_DISCOVERY_TTL_SECONDS", "300"))
+# After a failed refresh the stale list is served this long before trying again
+DISCOVERY_RETRY_SECONDS = float(os.getenv("MODEL_DISCOVERY_RETRY_SECONDS", "30"))
+DISCOVERY_TIMEOUT_SECONDS = float(os.getenv("MODEL_DISCOVERY_TIMEOUT_SECONDS", "5"))
+
+
+class ModelDiscovery:
+    """``GET {base_url}/models`` with a TTL cache and one upstream call at a time.
+
+    Concurrent callers for the same URL share a single request. Once a list
+    is cached, expiry triggers a background refresh while callers keep
+    getting the previous list; if the refresh fails that list stays in
+    service until a later retry succeeds.
+    """
+
+    def __init__(
+        self,
+        ttl: float = DISCOVERY_TTL_SECONDS,
+        retry_after: float = DISCOVERY_RETRY_SECONDS,
+        timeout: float = DISCOVERY_TIMEOUT_SECONDS,
+    ):
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self.timeout = timeout
+        self._entries: Dict[str, Tuple[Tuple[str, ...], float]] = {}  # base_url -> (models, expires)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def cached(self, base_url: str) -> Optional[Tuple[str, ...]]:
+        """Whatever list is cached for ``base_url``, fresh or not, without any I/O."""
+        entry = self._entries.get(base_url.rstrip("/"))
+        return entry[0] if entry else None
+
+    async def get_models(self, base_url: str, api_key: Optional[str] = None) -> Optional[List[str]]:
+        """The server's model ids, or None if it has never answered."""
+        base_url = base_url.rstrip("/")
+        entry = self._entries.get(base_url)
+        if entry is not None:
+            if entry[1] <= time.monotonic():
+                # Serve the old list now; refresh once in the background
+                metrics.inc("discovery.stale_served")
+                self._refresh(base_url, api_key)
+            return list(entry[0])
+
+        try:
+            models = await asyncio.shield(self._refresh(base_url, api_key))
+        except Exception as e:
+            logger.warning(f"Model discovery at {base_url} failed: {e}")
+            return None
+        return list(models)
+
+    def _refresh(self, base_url: str, api_key: Optional[str]) -> asyncio.Task:
+        task = self._inflight.get(base_url)
+        if task is None:
+            task = self._inflight[base_url] = asyncio.create_task(self._fetch(base_url, api_key))
+            task.add_done_callback(lambda t: self._settle(base_url, t))
+        return task
+
+    def _settle(self, base_url: str, task: asyncio.Task):
+        del self._inflight[base_url]
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is None:
+            return
+        entry = self._entries.get(base_url)
+        if entry is not None:
+            logger.warning(f"Model discovery at {base_url} failed, keeping cached list: {error}")
+            self._entries[base_url] = (entry[0], time.monotonic() + self.retry_after)
+
+    async def _fetch(self, base_url: str, api_key: Optional[str]) -> Tuple[str, ...]:
+        metrics.inc("discovery.fetches")
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else None
+        try:
+            response = await self._client.get(f"{base_url}/models", headers=headers)
+            response.raise_for_status()
+            payload = response.json()
+            # OpenAI shape is {"data": [{"id": ...}]}; some servers return a bare list
+            items = payload.get("data", []) if isinstance(payload, dict) else payload
+            models = tuple(item["id"] if isinstance(item, dict) else str(item) for item in items)
+        except Exception:
+            metrics.inc("discovery.errors")
+            raise
+        self._entries[base_url] = (models, time.monotonic() + self.ttl)
+        return models
+
+    async def close(self):
+        for task in list(self._inflight.values()):
+            task.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -1,81 +1,126 @@
 """Provider configuration management for Roo-Code bridge."""
 
+import asyncio
+import hashlib
 import json
-from typing import Dict, List, Optional, Any
+import os
+from typing import Dict, List, Mapping, Optional, Any, Tuple
 from datetime import datetime
 import logging
 
+from config.catalog import DEFAULT_CATALOG_FILE, ProviderCatalog
+from config.discovery import ModelDiscovery
 from messages.types import ProviderConfig
+from utils.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+CATALOG_FILE = os.getenv("PROVIDER_CATALOG_FILE", DEFAULT_CATALOG_FILE)
+# How often the catalog file is checked for changes; 0 disables hot reload
+CATALOG_RELOAD_SECONDS = float(os.getenv("PROVIDER_CATALOG_RELOAD_SECONDS", "5"))
+
+CONFIG_FIELDS = tuple(ProviderConfig.model_fields)
+
+
+def config_fingerprint(config: Dict[str, Any]) -> str:
+    """Canonical hash of an effective provider config; key order does not matter."""
+    canonical = json.dumps(config, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
 
 class ProviderManager:
     """Manages provider configuration for Roo-Code."""
     
-    def __init__(self):
+    def __init__(self, catalog_path: Optional[str] = None, reload_interval: float = CATALOG_RELOAD_SECONDS):
         self.active_configs: Dict[str, ProviderConfig] = {}
-        self.available_providers = {
-            "anthropic": {
-                "models": ["claude-3-opus", "claude-3-sonnet", "claude-3-haiku", "claude-2.1", "claude-2"],
-                "default_max_tokens": 4096,
-                "default_temperature": 0.7,
-                "supports_vision": True,
-                "max_context": 200000
-            },
-            "openai": {
-                "models": ["gpt-4-turbo", "gpt-4", "gpt-3.5-turbo", "gpt-4-vision-preview"],
-                "default_max_tokens": 4096,
-                "default_temperature": 0.7,
-                "supports_vision": True,
-                "max_context": 128000
-            },
-            "gemini": {
-                "models": ["gemini-pro", "gemini-pro-vision", "gemini-1.5-pro"],
-                "default_max_tokens": 8192,
-                "default_temperature": 0.7,
-                "supports_vision": True,
-                "max_context": 1000000
-            },
-            "ollama": {
-                "models": ["llama2", "codellama", "mistral", "mixtral", "deepseek-coder"],
-                "default_max_tokens": 4096,
-                "default_temperature": 0.7,
-                "supports_vision": False,
-                "max_context": 32000
-            },
-            "azure": {
-                "models": ["gpt-4", "gpt-35-turbo"],
-                "default_max_tokens": 4096,
-                "default_temperature": 0.7,
-                "supports_vision": False,
-                "max_context": 32000
-            },
-            "openai-compatible": {
-                "models": ["qwen-3-coder", "qwen-2.5-coder", "deepseek-coder", "codellama", "custom"],
-                "default_max_tokens": 4096,
-                "default_temperature": 0.7,
-                "supports_vision": False,
-                "max_context": 131000,
-                "default_base_url": "http://localhost:3000/v1"
-            }
-        }
+        # client_id -> (fingerprint, saveApiConfiguration message) of the last config set
+        self._applied: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        self.profiles = None  # ProfileStore, set by main
+        self.discovery = ModelDiscovery()
+        self.catalog_path = catalog_path or CATALOG_FILE
+        self.catalog = ProviderCatalog.load(self.catalog_path)
+        self.reload_interval = reload_interval
+        self._task: Optional[asyncio.Task] = None
+        
+    @property
+    def available_providers(self) -> Mapping[str, Mapping[str, Any]]:
+        return self.catalog.providers
+        
+    async def reload_if_changed(self) -> bool:
+        """Swap in a freshly indexed catalog if the file changed on disk.
+        
+        Parsing runs in a worker thread; requests already holding the old
+        catalog finish against it. A broken file keeps the current catalog.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            mtime = await loop.run_in_executor(None, os.path.getmtime, self.catalog_path)
+            if mtime == self.catalog.mtime:
+                return False
+            self.catalog = await loop.run_in_executor(None, ProviderCatalog.load, self.catalog_path)
+        except Exception as e:
+            logger.error(f"Keeping current provider catalog, reload failed: {e}")
+            return False
+        metrics.inc("providers.catalog_reloads")
+        logger.info(f"Reloaded provider catalog from {self.catalog_path}")
+        return True
+        
+    def start(self):
+        if self._task is None and self.reload_interval > 0:
+            self._task = asyncio.create_task(self._run())
+            
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.discovery.close()
+            
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            await self.reload_if_changed()
+        
+    async def apply_profile(self, config: Dict[str, Any], owner: Optional[str] = None) -> Dict[str, Any]:
+        """Expand ``config["profile"]`` into the saved config; explicit fields still win."""
+        name = config.get("profile")
+        if not name:
+            return config
+        if self.profiles is None:
+            raise ValueError("Provider profiles are not enabled")
+        profile = await self.profiles.get(name, owner)
+        if profile is None:
+            raise ValueError(f"Unknown provider profile: {name}")
+        return {**profile, **{key: value for key, value in config.items() if key != "profile"}}
         
     async def set_provider(self, client_id: str, config: Dict[str, Any]) -> Dict[str, Any]:
-        """Set provider configuration for a client."""
+        """Set provider configuration for a client.
+        
+        If the effective config hashes the same as the client's current one,
+        the previous message is returned without rebuilding the model.
+        """
+        
+        # Only provider fields count; newTask frames carry the prompt too
+        config = {key: config[key] for key in CONFIG_FIELDS if key in config}
+        
+        # One catalog for the whole call, even if a reload swaps it meanwhile
+        catalog = self.catalog
         
         # Validate provider
         provider = config.get("provider")
-        if provider not in self.available_providers:
+        if provider not in catalog:
             raise ValueError(f"Unknown provider: {provider}")
             
         # Validate model
         model = config.get("model")
-        if model and model not in self.available_providers[provider]["models"]:
+        if model and not catalog.has_model(provider, model) and not self._discovered(provider, config, model):
             logger.warning(f"Model {model} not in known models for {provider}, allowing anyway")
             
         # Apply defaults if not specified
-        provider_info = self.available_providers[provider]
+        provider_info = catalog.providers[provider]
         if "max_tokens" not in config:
             config["max_tokens"] = provider_info["default_max_tokens"]
         if "temperature" not in config:
@@ -87,14 +132,20 @@ class ProviderManager:
         if provider == "openai-compatible" and "base_url" not in config:
             config["base_url"] = provider_info["default_base_url"]
             
+        fingerprint = config_fingerprint(config)
+        applied = self._applied.get(client_id)
+        if applied is not None and applied[0] == fingerprint:
+            metrics.inc("providers.config_unchanged")
+            return applied[1]
+            
         # Create and store configuration
         provider_config = ProviderConfig(**config)
         self.active_configs[client_id] = provider_config
         
         logger.info(f"Set provider config for {client_id}: {provider}/{model}")
         
-        # Return formatted message for Roo-Code
-        return {
+        # Formatted message for Roo-Code
+        message = {
             "type": "saveApiConfiguration",
             "data": {
                 "apiProvider": provider_config.provider,
@@ -109,27 +160,54 @@ class ProviderManager:
                 "customInstructions": provider_config.custom_instructions,
             }
         }
+        self._applied[client_id] = (fingerprint, message)
+        return message
+        
+    def config_hash(self, client_id: str) -> Optional[str]:
+        """Fingerprint of the client's current effective config, if it has one."""
+        applied = self._applied.get(client_id)
+        return applied[0] if applied else None
         
     async def get_provider(self, client_id: str) -> Optional[ProviderConfig]:
         """Get current provider configuration for a client."""
         return self.active_configs.get(client_id)
         
-    async def get_available_models(self, provider: str) -> List[str]:
-        """Get list of available models for a provider."""
-        if provider not in self.available_providers:
+    def get_vision_limits(self, client_id: str) -> Dict[str, int]:
+        """Get image size limits for the provider a client is configured with."""
+        limits = {}
+        config = self.active_configs.get(client_id)
+        if config:
+            info = self.available_providers.get(config.provider, {})
+            for key in ("max_image_dimension", "max_image_bytes"):
+                if key in info:
+                    limits[key] = info[key]
+        return limits
+        
+    def _discovered(self, provider: str, config: Dict[str, Any], model: str) -> bool:
+        """Whether a live model list already fetched for this server includes ``model``."""
+        info = self.catalog.providers.get(provider, {})
+        base_url = config.get("base_url") or info.get("default_base_url")
+        return bool(info.get("discover_models") and base_url and model in (self.discovery.cached(base_url) or ()))
+        
+    async def get_available_models(self, provider: str, base_url: Optional[str] = None) -> List[str]:
+        """Get list of available models for a provider.
+        
+        Providers marked ``discover_models`` in the catalog are asked for
+        their live list; the catalog's list is the fallback.
+        """
+        info = self.catalog.providers.get(provider)
+        if info is None:
             return []
-        return self.available_providers[provider]["models"]
+        base_url = base_url or info.get("default_base_url")
+        if info.get("discover_models") and base_url:
+            models = await self.discovery.get_models(base_url)
+            if models:
+                return models
+        return self.catalog.models_payload[provider]
         
     async def get_available_providers(self) -> Dict[str, Any]:
         """Get information about all available providers."""
-        return {
-            name: {
-                "models": info["models"],
-                "supports_vision": info["supports_vision"],
-                "max_context": info["max_context"]
-            }
-            for name, info in self.available_providers.items()
-        }
+        return self.catalog.providers_payload
         
     def validate_config(self, config: Dict[str, Any]) -> bool:
         """Validate a provider configuration."""
@@ -0,0 +1,5 @@
+"""Image handling module for Roo-Code bridge."""
+
+from .handler import ImageHandler
+
+__all__ = ['ImageHandler']
@@ -0,0 +1,263 @@
+"""Image ingestion for the bridge: loading, downscaling and caching."""
+
+import asyncio
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+import httpx
+from PIL import Image
+
+if TYPE_CHECKING:
+    from messages.types import ImageData
+    from storage.blob_store import BlobStore
+
+logger = logging.getLogger(__name__)
+
+# Used when the client's provider does not declare its own vision limits
+DEFAULT_VISION_LIMITS = {
+    "max_image_dimension": 2048,
+    "max_image_bytes": 5 * 1024 * 1024,
+}
+
+# Refuse anything larger than this before even trying to decode it
+MAX_SOURCE_BYTES = 50 * 1024 * 1024
+# Refuse images whose header declares more pixels than this; a small file can decode to gigabytes
+MAX_SOURCE_PIXELS = 40_000_000
+
+# Hosts http(s) image URLs may be fetched from; empty (the default) disables remote fetching
+IMAGE_URL_ALLOWED_HOSTS = frozenset(
+    host.strip().lower() for host in os.getenv("IMAGE_URL_ALLOWED_HOSTS", "").split(",") if host.strip()
+)
+
+_FORMAT_BY_MIME = {
+    "image/png": "PNG",
+    "image/jpeg": "JPEG",
+    "image/jpg": "JPEG",
+    "image/webp": "WEBP",
+    "image/gif": "GIF",
+}
+_MIME_BY_FORMAT = {
+    "PNG": "image/png",
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+    "GIF": "image/gif",
+}
+
+
+def _split_data_url(data: str) -> Tuple[Optional[str], str]:
+    """Split a ``data:<mime>;base64,<payload>`` string into mime and payload."""
+    if data.startswith("data:") and "," in data:
+        header, payload = data.split(",", 1)
+        mime = header[5:].split(";", 1)[0] or None
+        return mime, payload
+    return None, data
+
+
+def _read_file(path: Path) -> bytes:
+    size = path.stat().st_size
+    if size > MAX_SOURCE_BYTES:
+        raise ValueError(f"Image {path} is {size} bytes, limit is {MAX_SOURCE_BYTES}")
+    return path.read_bytes()
+
+
+async def _fetch_url(url: str, host: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """Download an allowlisted image, giving up as soon as it passes ``MAX_SOURCE_BYTES``."""
+    if not host or host.lower() not in IMAGE_URL_ALLOWED_HOSTS:
+        raise ValueError(f"Fetching images from {host or url} is not allowed")
+    chunks = []
+    received = 0
+    # Redirects are not followed, so the allowlist cannot be bypassed through one
+    async with httpx.AsyncClient(timeout=10.0, follow_redirects=False) as client:
+        async with client.stream("GET", url) as response:
+            response.raise_for_status()
+            declared = response.headers.get("content-length")
+            if declared and declared.isdigit() and int(declared) > MAX_SOURCE_BYTES:
+                raise ValueError(f"Image at {url} exceeds {MAX_SOURCE_BYTES} bytes")
+            async for chunk in response.aiter_bytes():
+                received += len(chunk)
+                if received > MAX_SOURCE_BYTES:
+                    raise ValueError(f"Image at {url} exceeds {MAX_SOURCE_BYTES} bytes")
+                chunks.append(chunk)
+            mime = response.headers.get("content-type", "").split(";", 1)[0] or None
+    return b"".join(chunks), mime
+
+
+def _fit_image(raw: bytes, mime_type: str, max_dimension: int, max_bytes: int) -> Dict[str, Any]:
+    """Decode, downscale and re-encode an image so it fits the given limits.
+
+    Runs in a worker thread. Returns ``{"data": None, ...}`` when the source
+    already fits and can be forwarded untouched.
+    """
+    with Image.open(io.BytesIO(raw)) as img:
+        # The header is parsed; nothing has been decoded yet
+        width, height = img.size
+        if width * height > MAX_SOURCE_PIXELS:
+            raise ValueError(f"Image is {width}x{height} pixels, limit is {MAX_SOURCE_PIXELS}")
+        source_fmt = img.format
+        fmt = source_fmt or _FORMAT_BY_MIME.get(mime_type, "PNG")
+        if fmt not in _MIME_BY_FORMAT:
+            fmt = "PNG"
+        # BMP, TIFF and the like are always re-encoded; only the listed formats go out as they came
+        fits = source_fmt in _MIME_BY_FORMAT and max(width, height) <= max_dimension and len(raw) <= max_bytes
+
+        if fmt == "JPEG" and max(width, height) > max_dimension:
+            # Let the decoder skip straight to a reduced scale that is still at least the target size
+            target = max_dimension / float(max(width, height))
+            img.draft(img.mode, (max(1, int(width * target)), max(1, int(height * target))))
+        img.load()
+        width, height = img.size
+
+        if fits:
+            return {
+                "data": None,
+                "mime_type": _MIME_BY_FORMAT[fmt],
+                "width": width,
+                "height": height,
+            }
+
+        scale = min(1.0, max_dimension / float(max(width, height)))
+        if fmt == "GIF":
+            # Only the first frame is forwarded; re-encode as PNG
+            fmt = "PNG"
+        if fmt == "JPEG" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+
+        # Shrink until the encoded payload fits the byte budget
+        for _ in range(8):
+            size = (max(1, int(width * scale)), max(1, int(height * scale)))
+            resized = img.resize(size, Image.LANCZOS) if size != img.size else img
+            buffer = io.BytesIO()
+            if fmt == "JPEG":
+                resized.save(buffer, format=fmt, quality=85, optimize=True)
+            else:
+                resized.save(buffer, format=fmt, optimize=True)
+            encoded = buffer.getvalue()
+            if len(encoded) <= max_bytes:
+                return {
+                    "data": base64.b64encode(encoded).decode("ascii"),
+                    "mime_type": _MIME_BY_FORMAT[fmt],
+                    "width": size[0],
+                    "height": size[1],
+                }
+            scale *= 0.75
+
+    raise ValueError(f"Image could not be reduced below {max_bytes} bytes")
+
+
+class ImageHandler:
+    """Loads images from base64, paths, URLs or blob references and fits them to provider limits.
+
+    Remote http(s) URLs are only fetched from ``IMAGE_URL_ALLOWED_HOSTS``.
+
+    Decoding and re-encoding happen in a dedicated thread pool so large
+    screenshots never block the event loop. Results are cached by content
+    hash, so re-sending the same image costs one hash.
+    """
+
+    def __init__(self, max_workers: int = 2, cache_size: int = 64, blob_store: Optional["BlobStore"] = None):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-worker")
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.cache_size = cache_size
+        self.blob_store = blob_store
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def load_bytes(self, image: "ImageData") -> Tuple[bytes, Optional[str]]:
+        """Return the raw image bytes and the mime type they were declared with."""
+
+        if image.type == "base64":
+            mime, payload = _split_data_url(image.data)
+            try:
+                raw = await self._run(base64.b64decode, payload)
+            except binascii.Error as e:
+                raise ValueError(f"Invalid base64 image data: {e}")
+            return raw, mime
+
+        if image.type == "blobRef":
+            if self.blob_store is None:
+                raise ValueError("Blob references are not supported without a blob store")
+            raw = await self.blob_store.get(image.data)
+            if raw is None:
+                raise ValueError(f"Unknown blob: {image.data}")
+            return raw, self.blob_store.mime_types.get(image.data)
+
+        if image.type == "path":
+            return await self._run(_read_file, Path(image.data).expanduser()), None
+
+        if image.type == "url":
+            parsed = urlparse(image.data)
+            if parsed.scheme == "file":
+                return await self._run(_read_file, Path(unquote(parsed.path))), None
+            if parsed.scheme == "data":
+                mime, payload = _split_data_url(image.data)
+                return await self._run(base64.b64decode, payload), mime
+            if parsed.scheme in ("http", "https"):
+                return await _fetch_url(image.data, parsed.hostname)
+            raise ValueError(f"Unsupported image URL scheme: {parsed.scheme}")
+
+        raise ValueError(f"Unknown image type: {image.type}")
+
+    async def process(self, image: "ImageData", limits: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        """Load an image and return it fitted to ``limits`` in Roo-Code format."""
+
+        limits = {**DEFAULT_VISION_LIMITS, **(limits or {})}
+        max_dimension = limits["max_image_dimension"]
+        max_bytes = limits["max_image_bytes"]
+
+        raw, declared_mime = await self.load_bytes(image)
+        if len(raw) > MAX_SOURCE_BYTES:
+            raise ValueError(f"Image is {len(raw)} bytes, limit is {MAX_SOURCE_BYTES}")
+
+        if image.type == "blobRef":
+            # Blob references are already content addressed
+            digest = image.data
+        else:
+            digest = await self._run(lambda: hashlib.sha256(raw).hexdigest())
+        cache_key = f"{digest}:{max_dimension}:{max_bytes}"
+
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            self._cache.move_to_end(cache_key)
+            self.cache_hits += 1
+            return {**cached, "name": image.name}
+        self.cache_misses += 1
+
+        mime_type = declared_mime or image.mime_type
+        fitted = await self._run(_fit_image, raw, mime_type, max_dimension, max_bytes)
+
+        if fitted["data"] is None:
+            # Already within limits; forward base64 input untouched
+            if image.type == "base64":
+                fitted["data"] = image.data
+            else:
+                fitted["data"] = await self._run(lambda: base64.b64encode(raw).decode("ascii"))
+
+        result = {
+            "data": fitted["data"],
+            "mime_type": fitted["mime_type"],
+            "width": fitted["width"],
+            "height": fitted["height"],
+            "hash": digest,
+        }
+        self._cache[cache_key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+        return {**result, "name": image.name}
+
+    def shutdown(self):
+        """Stop the worker pool."""
+        self._executor.shutdown(wait=False)
@@ -1,15 +1,32 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.security import OAuth2PasswordRequestForm
 from contextlib import asynccontextmanager
 import asyncio
 import json
 import logging
-from typing import Dict, Optional
-from datetime import datetime
+import math
+import os
+import time
+from typing import Dict, Optional, Tuple
+from datetime import datetime, timedelta
 
-from models.session import SessionManager, Session
-from models.database import init_db
-from api.auth import get_current_user, authenticate_user
+from models.session import SessionManager
+from models.connection import Connection
+from models.database import init_db, close_db, AsyncReadSessionLocal
+from models.session_writer import SessionWriter
+from models.message import MessageHistory
+from models.provider_profile import ProfileStore
+from storage.transcript_log import TranscriptLog
+from storage.retention import (
+    Compactor, RetentionPolicy, ApprovalRetention, BlobRetention, MessageRetention, SessionRetention,
+    TaskRetention, TranscriptRetention
+)
+from api.auth import (
+    get_current_user, authenticate_user, create_access_token, password_hasher, token_cache, api_keys,
+    is_api_key, require_scope, verify_token, verify_token_claims, ACCESS_TOKEN_EXPIRE_MINUTES
+)
 from api.tasks import router as tasks_router
 from api.config import router as config_router
 from api.tools import router as tools_router
@@ -17,6 +34,8 @@ from api.messages import router as messages_router
 from adapters.base import LLMAdapter
 from adapters.roo_code import RooCodeAdapter
 from utils.ipc_client import IPCClient
+from utils.metrics import frame_received_at, metrics
+from utils.rate_limit import CONTROL, RateLimiter, classify_message, classify_request
 from messages.router import MessageRouter
 from messages.types import WebviewMessage
 from config.provider_manager import ProviderManager
@@ -24,17 +43,86 @@ from config.provider_manager import ProviderManager
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Set to "false" only for local development against unauthenticated clients
+WS_AUTH_REQUIRED = os.getenv("WS_AUTH_REQUIRED", "true").lower() != "false"
+# Paths that must answer even for a throttled client
+RATE_LIMIT_EXEMPT_PATHS = {"/health"}
+
+rate_limiter = RateLimiter.from_env()
+metrics.gauge("rate_limit.buckets", lambda: len(rate_limiter))
+metrics.gauge("rate_limit.throttled", lambda: rate_limiter.throttled)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
+    # Persist sessions in the background, off the connect path
+    app.state.session_writer = SessionWriter()
+    SessionManager.set_writer(app.state.session_writer)
+    # Earlier sessions are read back on demand, never bulk-loaded here
+    SessionManager.set_loader(AsyncReadSessionLocal)
+    app.state.session_writer.start()
+    reaper = asyncio.create_task(SessionManager.run_reaper())
     # Initialize provider manager and message router
     app.state.provider_manager = ProviderManager()
+    app.state.provider_manager.profiles = ProfileStore()
+    app.state.provider_manager.start()
     app.state.message_router = MessageRouter(app.state.provider_manager)
+    app.state.message_history = MessageHistory()
+    app.state.message_router.history = app.state.message_history
+    app.state.message_history.start()
+    app.state.transcripts = TranscriptLog()
+    app.state.message_router.transcripts = app.state.transcripts
+    app.state.transcripts.start()
+    message_retention = MessageRetention(RetentionPolicy.from_env("messages", 30, 512))
+    app.state.message_history.on_persisted = message_retention.added
+    app.state.compactor = Compactor([
+        ApprovalRetention(app.state.message_router.pending_approvals, RetentionPolicy.from_env("approvals", 1, 16)),
+        message_retention,
+        SessionRetention(RetentionPolicy.from_env("sessions", 30, 0)),
+        TaskRetention(RetentionPolicy.from_env("tasks", 30, 0)),
+        TranscriptRetention(app.state.transcripts, RetentionPolicy.from_env("transcripts", 30, 2048)),
+        BlobRetention(app.state.message_router.blob_store, RetentionPolicy.from_env("blobs", 7, 1024)),
+    ])
+    app.state.compactor.start()
+    app.state.task_registry = app.state.message_router.tasks
+    app.state.task_registry.start()
     yield
+    reaper.cancel()
+    await app.state.compactor.stop()
     await SessionManager.cleanup_all()
+    await app.state.session_writer.stop()
+    await app.state.message_history.stop()
+    await app.state.task_registry.stop()
+    await app.state.transcripts.stop()
+    await app.state.provider_manager.stop()
+    app.state.transcripts.shutdown()
+    await close_db()
+    app.state.message_router.image_handler.shutdown()
+    password_hasher.shutdown()
 
 app = FastAPI(title="Roo-Code Bridge", version="0.1.0", lifespan=lifespan)
 
+@app.middleware("http")
+async def rate_limit_requests(request: Request, call_next):
+    if request.url.path in RATE_LIMIT_EXEMPT_PATHS:
+        return await call_next(request)
+    # Verified tokens are cached, so get_current_user reuses this lookup
+    authorization = request.headers.get("authorization", "")
+    username = verify_token(authorization[7:]) if authorization[:7].lower() == "bearer " else None
+    retry_after = rate_limiter.acquire(
+        classify_request(request.method, request.url.path),
+        (f"user:{username}" if username else None, f"ip:{request.client.host}" if request.client else None)
+    )
+    if retry_after:
+        metrics.inc("http.throttled")
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "Rate limit exceeded", "retry_after": round(retry_after, 3)},
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+    return await call_next(request)
+
+# Added last so CORS headers also reach 429 responses
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -43,29 +131,62 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.include_router(tasks_router, prefix="/api/tasks", tags=["tasks"])
-app.include_router(config_router, prefix="/api/config", tags=["config"])
-app.include_router(tools_router, prefix="/api/tools", tags=["tools"])
-app.include_router(messages_router, prefix="/api/messages", tags=["messages"])
+# API keys only reach the routers their scopes name; user logins reach all of them
+app.include_router(tasks_router, prefix="/api/tasks", tags=["tasks"], dependencies=[Depends(require_scope("tasks"))])
+app.include_router(config_router, prefix="/api/config", tags=["config"], dependencies=[Depends(require_scope("config"))])
+app.include_router(tools_router, prefix="/api/tools", tags=["tools"], dependencies=[Depends(require_scope("tools"))])
+app.include_router(messages_router, prefix="/api/messages", tags=["messages"], dependencies=[Depends(require_scope("messages"))])
 
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
-        self.sessions: Dict[str, Session] = {}
-        self.adapters: Dict[str, LLMAdapter] = {}
+        self.connections: Dict[str, Connection] = {}
         self.message_router: Optional[MessageRouter] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
         
-    async def connect(self, websocket: WebSocket, client_id: str):
-        await websocket.accept()
-        self.active_connections[client_id] = websocket
+    async def connect(
+        self,
+        websocket: WebSocket,
+        client_id: str,
+        observer: bool = False,
+        principal: Optional[str] = None,
+        token: Optional[str] = None,
+        expires_at: Optional[float] = None,
+        subprotocol: Optional[str] = None
+    ) -> bool:
+        """Accept and register the socket; False if ``client_id`` is held by another principal."""
+        # A client_id belongs to whoever holds it; another principal cannot take it over
+        previous = self.connections.get(client_id)
+        if previous is not None and previous.principal != principal:
+            metrics.inc("ws.client_id_conflict")
+            await websocket.close(code=1008)
+            return False
+        await websocket.accept(subprotocol=subprotocol)
+        self._loop = asyncio.get_running_loop()
+        previous = self.connections.get(client_id)  # may have changed while accepting
+        if previous is not None:
+            if previous.principal != principal:
+                metrics.inc("ws.client_id_conflict")
+                await websocket.close(code=4403, reason="client_id is in use")
+                return False
+            # Same owner reconnecting: retire the old socket, its session and its IPC adapter first
+            await self.close_connection(previous, 4409, "Replaced by a newer connection")
         session = await SessionManager.create_session(client_id)
-        self.sessions[client_id] = session
+        connection = Connection(client_id, websocket, session, observer=observer)
+        connection.principal = principal
+        connection.token = token
+        self.connections[client_id] = connection
+        self.schedule_expiry(connection, expires_at)
+        
+        # Observers only watch other clients' tasks and need no IPC connection
+        if observer:
+            logger.info(f"Client {client_id} connected as observer")
+            return True
         
         # Try to connect adapter but don't fail if IPC server is not available
         try:
             adapter = RooCodeAdapter(client_id)
             if await adapter.connect():
-                self.adapters[client_id] = adapter
+                connection.adapter = adapter
                 # Register IPC client with message router
                 if self.message_router:
                     self.message_router.register_ipc_client(client_id, adapter.ipc_client)
@@ -76,39 +197,131 @@ class ConnectionManager:
             logger.warning(f"Client {client_id} connected without adapter: {e}")
         
         logger.info(f"Client {client_id} connected")
+        return True
         
-    def disconnect(self, client_id: str):
-        if client_id in self.active_connections:
-            del self.active_connections[client_id]
-        if client_id in self.sessions:
-            SessionManager.close_session(self.sessions[client_id].id)
-            del self.sessions[client_id]
-        if client_id in self.adapters:
+    def disconnect(self, client_id: str, connection: Optional[Connection] = None):
+        if connection is not None and self.connections.get(client_id) is not connection:
+            return  # already gone, or replaced by a newer connection with this id
+        connection = self.connections.pop(client_id, None)
+        if connection is not None:
+            if connection.expiry_timer is not None:
+                connection.expiry_timer.cancel()
+            for _, worker in connection.lanes.values():
+                worker.cancel()
+            connection.lanes.clear()
+            SessionManager.close_session(connection.session.id)
+        if self.message_router:
+            self.message_router.remove_client(client_id)
+        if connection is not None and connection.adapter is not None:
             # Unregister from message router
             if self.message_router:
                 self.message_router.unregister_ipc_client(client_id)
-            self.adapters[client_id].disconnect()
-            del self.adapters[client_id]
+            connection.adapter.disconnect()
         logger.info(f"Client {client_id} disconnected")
         
+    def schedule_expiry(self, connection: Connection, expires_at: Optional[float]):
+        """Close the socket when its token expires, unless it is refreshed first."""
+        if connection.expiry_timer is not None:
+            connection.expiry_timer.cancel()
+            connection.expiry_timer = None
+        connection.token_expires_at = expires_at
+        if expires_at is not None:
+            loop = asyncio.get_running_loop()
+            connection.expiry_timer = loop.call_later(
+                max(0.0, expires_at - time.time()), self._expire, connection
+            )
+            
+    def _expire(self, connection: Connection):
+        connection.expiry_timer = None
+        if self.connections.get(connection.client_id) is connection:
+            asyncio.create_task(self.close_connection(connection, 4401, "Token expired"))
+            
+    def _drop_revoked(self, token: Optional[str], subject: Optional[str]):
+        for connection in list(self.connections.values()):
+            if (token and connection.token == token) or (subject and connection.principal == subject):
+                asyncio.create_task(self.close_connection(connection, 4401, "Token revoked"))
+            
+    async def close_connection(self, connection: Connection, code: int, reason: str):
+        try:
+            await connection.websocket.close(code=code, reason=reason)
+        except Exception as e:
+            logger.debug(f"Closing {connection.client_id}: {e}")
+        self.disconnect(connection.client_id, connection)
+        
+    def on_token_revoked(self, token: Optional[str], subject: Optional[str]):
+        """Drop connections authenticated with a revoked token or subject.
+        
+        Safe to call from any thread; the work is handed to the event loop.
+        """
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._drop_revoked, token, subject)
+                
+    async def refresh_token(self, client_id: str, token: Optional[str]):
+        connection = self.connections[client_id]
+        claims = verify_token_claims(token) if token else None
+        if claims is None or (connection.principal and claims[0] != connection.principal):
+            await self.send_message(client_id, {
+                "type": "error",
+                "data": {"message": "Invalid token"}
+            })
+            return
+        connection.principal, connection.token = claims[0], token
+        self.schedule_expiry(connection, claims[1])
+        await self.send_message(client_id, {
+            "type": "tokenRefreshed",
+            "data": {"expires_at": claims[1]}
+        })
+        
     async def send_message(self, client_id: str, message: dict):
-        if client_id in self.active_connections:
-            await self.active_connections[client_id].send_json(message)
+        connection = self.connections.get(client_id)
+        if connection is not None:
+            connection.messages_out += 1
+            await connection.websocket.send_json(message)
             
     async def send_personal_message(self, message: str, client_id: str):
         """Send message string to a specific client."""
-        if client_id in self.active_connections:
-            await self.active_connections[client_id].send_text(message)
+        connection = self.connections.get(client_id)
+        if connection is not None:
+            connection.messages_out += 1
+            await connection.websocket.send_text(message)
             
     async def broadcast(self, message: dict, exclude: Optional[str] = None):
-        for client_id, connection in self.active_connections.items():
+        for client_id, connection in list(self.connections.items()):
             if client_id != exclude:
-                await connection.send_json(message)
+                connection.messages_out += 1
+                await connection.websocket.send_json(message)
+                
+    def dispatch(self, connection: Connection, message: dict, klass: str, received_at: float):
+        """Queue a frame on its lane without waiting for earlier frames to finish.
+        
+        Each lane handles its frames in arrival order, but a cancel or approval
+        never sits behind a newTask still waiting on the extension.
+        """
+        lane = "control" if klass == CONTROL else "bulk"
+        entry = connection.lanes.get(lane)
+        if entry is None:
+            queue: asyncio.Queue = asyncio.Queue()
+            entry = connection.lanes[lane] = (queue, asyncio.create_task(self._run_lane(connection, queue)))
+        entry[0].put_nowait((message, received_at))
+        
+    async def _run_lane(self, connection: Connection, queue: asyncio.Queue):
+        while True:
+            message, received_at = await queue.get()
+            frame_received_at.set(received_at)
+            try:
+                await self.handle_message(connection.client_id, message)
+            except Exception as e:
+                logger.error(f"Error handling {message.get('type')} from {connection.client_id}: {e}")
                 
     async def handle_message(self, client_id: str, message: dict):
         message_type = message.get("type")
         data = message.get("data", {})
         
+        # The one message that does any crypto after the handshake
+        if message_type == "refreshToken":
+            await self.refresh_token(client_id, data.get("token"))
+            return
+        
         # Handle ping message
         if message_type == "ping":
             await self.send_message(client_id, {
@@ -120,7 +333,8 @@ class ConnectionManager:
         # Use message router for Phase 2 message types
         if self.message_router and message_type in [
             "newTask", "askResponse", "saveApiConfiguration", 
-            "cancelTask", "resumeTask", "selectImages", "draggedImages"
+            "cancelTask", "resumeTask", "selectImages", "draggedImages", "putBlob",
+            "subscribeTask", "unsubscribeTask", "grantApprover", "revokeApprover", "setStreamOptions", "resync"
         ]:
             try:
                 webview_msg = WebviewMessage(
@@ -135,9 +349,11 @@ class ConnectionManager:
                         "data": result
                     })
                 elif result and "error" in result:
+                    # Extra fields (e.g. tokenEstimate) ride along with the message
+                    details = {k: v for k, v in result.items() if k != "error"}
                     await self.send_message(client_id, {
                         "type": "error",
-                        "data": {"message": result["error"]}
+                        "data": {"message": result["error"], **details}
                     })
             except Exception as e:
                 logger.error(f"Error in message router: {e}")
@@ -148,14 +364,15 @@ class ConnectionManager:
             return
         
         # Legacy handling for Phase 1 compatibility
-        if client_id not in self.adapters:
+        connection = self.connections.get(client_id)
+        if connection is None or connection.adapter is None:
             await self.send_message(client_id, {
                 "type": "error",
                 "data": {"message": "No adapter connected (VS Code extension not running)"}
             })
             return
             
-        adapter = self.adapters[client_id]
+        adapter = connection.adapter
         
         try:
             if message_type == "task.start":
@@ -193,38 +410,121 @@ class ConnectionManager:
             })
 
 manager = ConnectionManager()
+token_cache.add_revocation_hook(manager.on_token_revoked)
+
+def handshake_token(websocket: WebSocket) -> Tuple[Optional[str], Optional[str]]:
+    """Token from ``?token=`` or a ``Sec-WebSocket-Protocol: bearer, <token>`` header.
+
+    Returns the token and the subprotocol to echo back when accepting.
+    """
+    token = websocket.query_params.get("token")
+    if token:
+        return token, None
+    protocols = websocket.scope.get("subprotocols") or []
+    if len(protocols) >= 2 and protocols[0].lower() == "bearer":
+        return protocols[1], protocols[0]
+    return None, None
 
 @app.websocket("/ws/{client_id}")
-async def websocket_endpoint(websocket: WebSocket, client_id: str):
+async def websocket_endpoint(websocket: WebSocket, client_id: str, observer: bool = False):
     # Connect message router and manager
     if hasattr(app.state, 'message_router'):
         manager.message_router = app.state.message_router
         app.state.message_router.set_websocket_manager(manager)
     
-    await manager.connect(websocket, client_id)
+    token, subprotocol = handshake_token(websocket)
+    if token and is_api_key(token):
+        # API keys do not expire, so no expiry timer is scheduled
+        api_key = api_keys.verify(token)
+        claims = (api_key.subject, None) if api_key else None
+    else:
+        claims = verify_token_claims(token) if token else None
+    if claims is None and WS_AUTH_REQUIRED:
+        metrics.inc("ws.auth_rejected")
+        # Closing before accept rejects the upgrade with HTTP 403
+        await websocket.close(code=1008)
+        return
+    
+    connected = await manager.connect(
+        websocket, client_id, observer=observer,
+        principal=claims[0] if claims else None,
+        token=token if claims else None,
+        expires_at=claims[1] if claims else None,
+        subprotocol=subprotocol
+    )
+    if not connected:
+        return
+    connection = manager.connections[client_id]
     try:
         while True:
             data = await websocket.receive_text()
+            received_at = time.perf_counter()
             message = json.loads(data)
-            await manager.handle_message(client_id, message)
+            connection.messages_in += 1
+            await SessionManager.update_activity(connection.session.id)
+            klass = classify_message(message.get("type"))
+            retry_after = rate_limiter.acquire(
+                klass,
+                (f"user:{connection.principal}" if connection.principal else None, f"client:{client_id}")
+            )
+            if retry_after:
+                metrics.inc("ws.throttled")
+                await manager.send_message(client_id, {
+                    "type": "error",
+                    "data": {
+                        "message": "Rate limit exceeded",
+                        "requestType": message.get("type"),
+                        "retry_after": round(retry_after, 3)
+                    }
+                })
+                continue
+            manager.dispatch(connection, message, klass, received_at)
     except WebSocketDisconnect:
-        manager.disconnect(client_id)
+        manager.disconnect(client_id, connection)
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
-        manager.disconnect(client_id)
+        manager.disconnect(client_id, connection)
 
 @app.get("/")
 async def root():
     return {"message": "Roo-Code Bridge API", "version": "0.1.0"}
 
+@app.post("/token")
+async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+    # Password checks run on the bcrypt pool; the event loop never hashes
+    user = await authenticate_user(form_data.username, form_data.password)
+    if not user:
+        raise HTTPException(
+            status_code=401,
+            detail="Incorrect username or password",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    token = create_access_token(
+        {"sub": user["username"]}, timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {"access_token": token, "token_type": "bearer"}
+
 @app.get("/health")
 async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
-        "active_sessions": len(manager.sessions)
+        "active_sessions": SessionManager.active_count()
     }
 
+@app.get("/sessions", dependencies=[Depends(require_scope("sessions"))])
+async def list_sessions(limit: int = 50, after: Optional[str] = None, user: str = Depends(get_current_user)):
+    sessions = SessionManager.get_active_sessions(limit=min(limit, 500), after=after)
+    return {
+        "sessions": [s.to_model().dict() for s in sessions],
+        "total": SessionManager.active_count(),
+        "next": sessions[-1].id if len(sessions) == min(limit, 500) else None
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    return metrics.snapshot()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=47291, reload=True)
\ No newline at end of file
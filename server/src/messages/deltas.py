@@ -0,0 +1,80 @@
+"""Delta encoding for streamed partial ``say`` messages."""
+
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set
+
+
+def _utf16_len(text: str) -> int:
+    """Length in UTF-16 code units, the unit JavaScript string indices count."""
+    if text.isascii():
+        return len(text)
+    return len(text.encode("utf-16-le")) // 2
+
+
+def make_delta(previous: str, current: str) -> Optional[Dict[str, Any]]:
+    """Describe how to turn ``previous`` into ``current``.
+
+    Returns an ``append`` op for pure appends, a ``patch`` op replacing
+    ``previous[start:end]`` otherwise, or None if a patch would not be
+    smaller than the full text. Offsets are in UTF-16 code units, so
+    browsers can apply them with ``slice``; astral characters such as
+    emoji count as two.
+    """
+    if current.startswith(previous):
+        return {"op": "append", "offset": _utf16_len(previous), "text": current[len(previous):]}
+
+    # Longest common prefix and suffix around the changed region
+    limit = min(len(previous), len(current))
+    start = 0
+    while start < limit and previous[start] == current[start]:
+        start += 1
+    end_prev, end_cur = len(previous), len(current)
+    while end_prev > start and end_cur > start and previous[end_prev - 1] == current[end_cur - 1]:
+        end_prev -= 1
+        end_cur -= 1
+
+    replacement = current[start:end_cur]
+    if len(replacement) >= len(current) // 2:
+        return None
+    # Found on code points, so neither end can split a surrogate pair
+    start_units = _utf16_len(previous[:start])
+    end_units = start_units + _utf16_len(previous[start:end_prev])
+    return {"op": "patch", "start": start_units, "end": end_units, "text": replacement}
+
+
+class DeltaEncoder:
+    """Remembers the last text each delta-capable client saw per message ts."""
+
+    def __init__(self, max_streams_per_client: int = 32):
+        self.max_streams_per_client = max_streams_per_client
+        self.enabled: Set[str] = set()
+        self.snapshots: Dict[str, "OrderedDict[Any, str]"] = {}
+
+    def set_enabled(self, client_id: str, enabled: bool):
+        if enabled:
+            self.enabled.add(client_id)
+        else:
+            self.enabled.discard(client_id)
+            self.snapshots.pop(client_id, None)
+
+    def is_enabled(self, client_id: str) -> bool:
+        return client_id in self.enabled
+
+    def resync(self, client_id: str):
+        """Forget what the client has seen so its next frames are full snapshots."""
+        self.snapshots.pop(client_id, None)
+
+    def remove_client(self, client_id: str):
+        self.enabled.discard(client_id)
+        self.snapshots.pop(client_id, None)
+
+    def swap(self, client_id: str, ts: Any, text: str, partial: bool) -> Optional[str]:
+        """Record ``text`` as the client's latest snapshot and return the previous one."""
+        streams = self.snapshots.setdefault(client_id, OrderedDict())
+        previous = streams.pop(ts, None)
+        if partial:
+            streams[ts] = text
+            # Streams that never finish must not pile up
+            while len(streams) > self.max_streams_per_client:
+                streams.popitem(last=False)
+        return previous
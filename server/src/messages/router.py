@@ -1,19 +1,39 @@
 """Message router for bridging communication between web UI and Roo-Code."""
 
+import asyncio
+import base64
+import binascii
 import uuid
 import json
 import logging
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
 
 from messages.types import (
     WebviewMessage, RooCodeMessage, ClineAsk, ClineSay,
     ApprovalRequest, ApprovalResponse, ImageData
 )
+from messages.topics import TopicHub, SubscriberRole
+from messages.deltas import DeltaEncoder, make_delta
 from config.provider_manager import ProviderManager
+from utils.ipc_client import Priority
+from utils.metrics import metrics
+from utils.redact import redact
+from utils.tokens import TokenEstimate, estimate_task
+from models.task import TaskRegistry, TaskState
+from images.handler import ImageHandler
+from storage.blob_store import BlobStore
 
 logger = logging.getLogger(__name__)
 
+# Small frames that are written ahead of queued bulk payloads
+CONTROL_MESSAGE_TYPES = {"cancelTask", "askResponse", "resumeTask"}
+
+# Bridge-only requests that are not part of a task transcript
+UNRECORDED_MESSAGE_TYPES = {
+    "putBlob", "setStreamOptions", "resync", "subscribeTask", "unsubscribeTask", "grantApprover", "revokeApprover"
+}
+
 
 class MessageRouter:
     """Routes messages between web UI and Roo-Code."""
@@ -24,6 +44,14 @@ class MessageRouter:
         self.provider_manager = provider_manager
         self.websocket_manager = None  # Will be set by main
         self.ipc_clients = {}  # client_id -> IPC connection
+        self.sent_configs: Dict[str, str] = {}  # client_id -> config hash its backend has applied
+        self.topics = TopicHub()
+        self.deltas = DeltaEncoder()
+        self.history = None  # MessageHistory, set by main
+        self.transcripts = None  # TranscriptLog, set by main
+        self.tasks = TaskRegistry()
+        self.blob_store = BlobStore()
+        self.image_handler = ImageHandler(blob_store=self.blob_store)
         
     def set_websocket_manager(self, manager):
         """Set the WebSocket manager for sending messages to web clients."""
@@ -32,20 +60,58 @@ class MessageRouter:
     def register_ipc_client(self, client_id: str, ipc_connection):
         """Register an IPC connection for a client."""
         self.ipc_clients[client_id] = ipc_connection
+        self.sent_configs.pop(client_id, None)  # a new backend has seen nothing yet
+        # Frames Roo-Code pushes on its own (events, say/ask updates) rather than as replies
+        ipc_connection.on_unsolicited = lambda message: self.route_from_roocode(client_id, message)
         logger.info(f"Registered IPC client for {client_id}")
         
     def unregister_ipc_client(self, client_id: str):
         """Unregister an IPC connection for a client."""
+        self.sent_configs.pop(client_id, None)
         if client_id in self.ipc_clients:
-            del self.ipc_clients[client_id]
+            self.ipc_clients.pop(client_id).on_unsolicited = None
             logger.info(f"Unregistered IPC client for {client_id}")
             
+    def principal_of(self, client_id: str) -> Optional[str]:
+        """User the client's WebSocket authenticated as, if any."""
+        connection = getattr(self.websocket_manager, "connections", {}).get(client_id)
+        return getattr(connection, "principal", None)
+            
+    def is_owner(self, task_id: str, client_id: str) -> bool:
+        """The client running ``task_id``, or another connection of the same user."""
+        owner = self.topics.owner_of(task_id)
+        if owner is None:
+            return False
+        if owner == client_id:
+            return True
+        principal = self.principal_of(client_id)
+        return principal is not None and principal == self.principal_of(owner)
+            
+    def may_approve(self, task_id: str, client_id: str) -> bool:
+        return self.is_owner(task_id, client_id) or self.topics.is_granted(
+            task_id, client_id, self.principal_of(client_id)
+        )
+            
+    def remove_client(self, client_id: str):
+        """Forget task ownership, subscriptions and stream state of a disconnected web client."""
+        self.topics.remove_client(client_id)
+        self.deltas.remove_client(client_id)
+            
     async def route_from_web(self, client_id: str, message: WebviewMessage) -> Dict[str, Any]:
         """Route message from web UI to Roo-Code."""
         
         logger.debug(f"Routing from web: {client_id} -> {message.type}")
         
+        # Provider configs carry API keys; they never reach history or transcripts
+        frame = redact({"type": message.type, "data": message.data, "images": message.images})
+        if message.type != "newTask":
+            task_id = (message.data or {}).get("taskId") or self.topics.current_task(client_id)
+            self.record_incoming(client_id, task_id, frame)
+        
         if message.type == "newTask":
+            # Large fields may be sent as {"blobRef": <hash>} after a putBlob
+            message.data = await self.resolve_blob_refs(message.data or {})
+            
             # Start new task in Roo-Code
             task_data = {
                 "type": "newTask",
@@ -53,18 +119,45 @@ class MessageRouter:
                 "configuration": {}
             }
             
-            # Apply provider config if specified
-            if "provider" in message.data or "model" in message.data:
-                config = await self.provider_manager.set_provider(client_id, message.data)
-                task_data["configuration"] = config["data"]
+            # Apply provider config if specified; an empty configuration keeps the current one
+            config_hash = None
+            if "provider" in message.data or "model" in message.data or "profile" in message.data:
+                settings = await self.provider_manager.apply_profile(message.data, self.principal_of(client_id))
+                config = await self.provider_manager.set_provider(client_id, settings)
+                config_hash = self.provider_manager.config_hash(client_id)
+                if self.sent_configs.get(client_id) != config_hash:
+                    task_data["configuration"] = config["data"]
+                
+            # Refuse prompts that cannot fit before they cost an IPC and model round trip
+            estimate = self.estimate_prompt(client_id, message.data.get("prompt"), len(message.images or []))
+            if estimate is not None and estimate.over:
+                metrics.inc("tasks.rejected_over_context")
+                self.record_incoming(client_id, None, frame)
+                return {
+                    "error": f"Prompt is about {estimate.tokens} tokens, over the {estimate.budget}-token budget",
+                    "tokenEstimate": estimate.to_dict()
+                }
                 
             # Include images if provided
             if message.images:
-                task_data["images"] = await self.process_images(message.images)
+                task_data["images"] = await self.process_images(message.images, client_id)
                 
-            await self.send_to_roocode(client_id, task_data)
+            response = await self.send_to_roocode(client_id, task_data)
+            if response is not None and config_hash:
+                self.sent_configs[client_id] = config_hash
             
-            return {"status": "task_started", "client_id": client_id}
+            result = {"status": "task_started", "client_id": client_id}
+            if estimate is not None:
+                result["tokenEstimate"] = estimate.to_dict()
+            # The extension answers with the new task's id when it has one
+            task_id = self.extract_task_id(response) if response else None
+            if task_id:
+                self.topics.set_owner(task_id, client_id)
+                self.tasks.ensure(task_id, client_id, principal=self.principal_of(client_id))
+                result["taskId"] = task_id
+            # Filed under the task it created, never the client's previous one
+            self.record_incoming(client_id, task_id, frame)
+            return result
             
         elif message.type == "askResponse":
             # User responded to approval request
@@ -79,9 +172,15 @@ class MessageRouter:
             
         elif message.type == "saveApiConfiguration":
             # Update provider settings in Roo-Code
-            config_msg = await self.provider_manager.set_provider(client_id, message.data)
-            await self.send_to_roocode(client_id, config_msg)
-            return {"status": "config_updated", "provider": message.data.get("provider")}
+            settings = await self.provider_manager.apply_profile(message.data, self.principal_of(client_id))
+            config_msg = await self.provider_manager.set_provider(client_id, settings)
+            config_hash = self.provider_manager.config_hash(client_id)
+            if self.sent_configs.get(client_id) == config_hash:
+                # The backend already runs this exact config; skip the IPC round trip
+                return {"status": "config_updated", "provider": settings.get("provider"), "unchanged": True}
+            if await self.send_to_roocode(client_id, config_msg) is not None:
+                self.sent_configs[client_id] = config_hash
+            return {"status": "config_updated", "provider": settings.get("provider")}
             
         elif message.type == "cancelTask":
             # Cancel current task
@@ -91,6 +190,61 @@ class MessageRouter:
             })
             return {"status": "task_cancelled"}
             
+        elif message.type == "subscribeTask":
+            # Watch a task owned by another client
+            task_id = message.data.get("taskId")
+            if not task_id:
+                return {"error": "taskId is required"}
+            try:
+                role = SubscriberRole(message.data.get("role", SubscriberRole.OBSERVER.value))
+            except ValueError:
+                return {"error": f"Unknown role: {message.data.get('role')}"}
+            # Task frames carry prompts, file contents and command output, so watching
+            # needs the same standing as approving: the owner, the same user, or a grant
+            if not self.may_approve(task_id, client_id):
+                return {"error": f"The {role.value} role must be granted by the task owner"}
+            self.topics.subscribe(task_id, client_id, role)
+            return {"status": "subscribed", "taskId": task_id, "role": role.value}
+            
+        elif message.type in ("grantApprover", "revokeApprover"):
+            # Only the task owner decides who may answer its approvals
+            task_id = message.data.get("taskId")
+            if not task_id or not self.is_owner(task_id, client_id):
+                return {"error": "Only the task owner can change approvers"}
+            grantee = message.data.get("clientId") or (
+                f"user:{message.data['principal']}" if message.data.get("principal") else None
+            )
+            if not grantee:
+                return {"error": "clientId or principal is required"}
+            if message.type == "grantApprover":
+                self.topics.grant(task_id, grantee)
+                return {"status": "approver_granted", "taskId": task_id, "grantee": grantee}
+            clients = [
+                c for c in self.topics.subscribers(task_id)
+                if grantee.startswith("user:") and f"user:{self.principal_of(c)}" == grantee
+            ]
+            self.topics.revoke(task_id, grantee, clients)
+            return {"status": "approver_revoked", "taskId": task_id, "grantee": grantee}
+            
+        elif message.type == "unsubscribeTask":
+            task_id = message.data.get("taskId")
+            self.topics.unsubscribe(task_id, client_id)
+            return {"status": "unsubscribed", "taskId": task_id}
+            
+        elif message.type == "setStreamOptions":
+            # Clients opt in to delta frames for partial status updates
+            self.deltas.set_enabled(client_id, bool(message.data.get("deltas")))
+            return {"status": "stream_options_updated", "deltas": self.deltas.is_enabled(client_id)}
+            
+        elif message.type == "resync":
+            # Next status frames go out as full snapshots
+            self.deltas.resync(client_id)
+            return {"status": "resynced"}
+            
+        elif message.type == "putBlob":
+            # Upload once, refer to it by hash in later messages
+            return await self.store_blob(message.data or {})
+            
         elif message.type == "resumeTask":
             # Resume a paused task
             await self.send_to_roocode(client_id, {
@@ -107,6 +261,15 @@ class MessageRouter:
             })
             return {"status": "forwarded", "type": message.type}
             
+    def record_incoming(self, client_id: str, task_id: Optional[str], frame: Dict[str, Any]):
+        """Append a redacted web frame to the history table and the task's transcript."""
+        message_type = frame["type"]
+        if self.history and message_type not in UNRECORDED_MESSAGE_TYPES:
+            self.history.record(client_id, task_id, "in", frame, self.principal_of(client_id))
+        # putBlob payloads already live in the blob store under their hash
+        if self.transcripts and task_id and message_type != "putBlob":
+            self.transcripts.append(task_id, "in", frame)
+            
     async def route_from_roocode(self, client_id: str, message: Dict[str, Any]) -> None:
         """Route message from Roo-Code to web UI."""
         
@@ -116,6 +279,21 @@ class MessageRouter:
         msg_type = message.get("type")
         msg_data = message.get("data", {})
         
+        task_id = self.extract_task_id(message)
+        if task_id and self.topics.current_task(client_id) != task_id:
+            self.topics.set_owner(task_id, client_id)
+            
+        task_id = task_id or self.topics.current_task(client_id)
+        principal = self.principal_of(client_id)
+        self.tasks.observe(client_id, task_id, msg_type, msg_data, principal)
+            
+        recorded = redact(message)
+        if self.transcripts and task_id:
+            self.transcripts.append(task_id, "out", recorded)
+        # Partial snapshots are superseded by the final message; store only that
+        if self.history and not (isinstance(msg_data, dict) and msg_data.get("partial")):
+            self.history.record(client_id, task_id, "out", recorded, principal)
+        
         # Check if this is an ask (approval request) or say (status update)
         if msg_type == "ask":
             await self.handle_ask_message(client_id, msg_data)
@@ -136,6 +314,7 @@ class MessageRouter:
         # Store approval request
         self.pending_approvals[approval_id] = {
             "client_id": client_id,
+            "task_id": self.topics.current_task(client_id),
             "ask_type": ask_type,
             "data": data,
             "created_at": datetime.now().isoformat(),
@@ -163,17 +342,52 @@ class MessageRouter:
         """Handle status update from Roo-Code."""
         
         say_type = data.get("say_type") or data.get("type")
-        
-        await self.send_to_web(client_id, {
+        full_message = {
             "type": "status_update",
             "say_type": say_type,
             "data": data
-        })
+        }
+        
+        ts = data.get("ts")
+        text = data.get("text")
+        recipients = self.web_recipients(client_id)
+        if ts is None or not isinstance(text, str) or not any(self.deltas.is_enabled(r) for r in recipients):
+            await self.send_to_web(client_id, full_message)
+            return
+            
+        # Roo-Code re-sends the growing text; delta-capable clients get only the change
+        partial = bool(data.get("partial"))
+        full_text = None
+        delta_by_previous: Dict[str, Optional[str]] = {}
+        frames = []
+        for recipient in recipients:
+            frame = None
+            if self.deltas.is_enabled(recipient):
+                previous = self.deltas.swap(recipient, ts, text, partial)
+                if previous is not None:
+                    if previous not in delta_by_previous:
+                        delta = make_delta(previous, text)
+                        delta_by_previous[previous] = json.dumps({
+                            "type": "status_delta",
+                            "say_type": say_type,
+                            "ts": ts,
+                            "partial": partial,
+                            **delta
+                        }) if delta else None
+                    frame = delta_by_previous[previous]
+            if frame is None:
+                if full_text is None:
+                    full_text = json.dumps(full_message)
+                frame = full_text
+            frames.append((recipient, frame))
+            
+        await self.deliver(frames)
         
     async def handle_event_message(self, client_id: str, data: Dict[str, Any]) -> None:
         """Handle event message from Roo-Code."""
         
-        event_name = data.get("name")
+        # The extension's broadcasts name the event under "event"
+        event_name = data.get("name") or data.get("event")
         event_data = data.get("data", {})
         
         await self.send_to_web(client_id, {
@@ -190,8 +404,16 @@ class MessageRouter:
             logger.warning(f"Unknown approval ID: {response.approval_id}")
             return {"error": "Unknown approval ID"}
             
-        # Send response back to Roo-Code
-        await self.send_to_roocode(client_id, {
+        # Observers may answer only if they hold a still-valid, owner-granted approver role
+        owner_id = approval["client_id"]
+        task_id = approval.get("task_id")
+        if client_id != owner_id and not (
+            self.topics.can_approve(task_id, client_id) and self.may_approve(task_id, client_id)
+        ):
+            return {"error": "Not allowed to respond to this approval"}
+            
+        # Send response back to Roo-Code over the owner's connection
+        await self.send_to_roocode(owner_id, {
             "type": "askResponse",
             "data": {
                 "approved": response.approved,
@@ -204,6 +426,8 @@ class MessageRouter:
         # Update status
         approval["status"] = "approved" if response.approved else "denied"
         approval["responded_at"] = datetime.now().isoformat()
+        approval["responded_by"] = client_id
+        self.tasks.approval_answered(approval.get("task_id"))
         
         return {"status": "response_sent", "approval_id": response.approval_id}
         
@@ -238,52 +462,164 @@ class MessageRouter:
             
         return formatted
         
-    async def process_images(self, images: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    def estimate_prompt(self, client_id: str, prompt: Optional[str], image_count: int) -> Optional[TokenEstimate]:
+        """Token estimate for a new task under the client's current provider config, if any."""
+        config = self.provider_manager.active_configs.get(client_id)
+        if config is None or not config.context_length:
+            return None
+        return estimate_task(
+            prompt,
+            image_count,
+            config.custom_instructions,
+            config.provider,
+            config.context_length,
+            config.max_tokens,
+            self.provider_manager.catalog.providers.get(config.provider)
+        )
+        
+    async def process_images(self, images: List[Dict[str, str]], client_id: Optional[str] = None) -> List[Dict[str, str]]:
         """Process images for Roo-Code format."""
         
-        processed = []
-        for img in images:
+        limits = self.provider_manager.get_vision_limits(client_id) if client_id else {}
+        
+        async def process_one(img: Dict[str, str]) -> Optional[Dict[str, Any]]:
             try:
                 image_data = ImageData(**img)
-                
-                if image_data.type == "base64":
-                    # Already in correct format
-                    processed.append({
-                        "data": image_data.data,
-                        "mime_type": image_data.mime_type,
-                        "name": image_data.name
-                    })
-                elif image_data.type == "url":
-                    # Would need to fetch and convert
-                    logger.warning("URL image type not yet implemented")
-                elif image_data.type == "path":
-                    # Would need to read and convert
-                    logger.warning("Path image type not yet implemented")
-                    
+                return await self.image_handler.process(image_data, limits)
             except Exception as e:
                 logger.error(f"Error processing image: {e}")
+                return None
                 
-        return processed
+        results = await asyncio.gather(*(process_one(img) for img in images))
+        return [r for r in results if r is not None]
         
-    async def send_to_web(self, client_id: str, message: Dict[str, Any]) -> None:
-        """Send message to web client via WebSocket."""
+    async def store_blob(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Store an uploaded payload in the blob store and return its hash."""
         
-        if self.websocket_manager:
-            await self.websocket_manager.send_personal_message(
-                json.dumps(message),
-                client_id
-            )
+        limit = self.blob_store.max_blob_size
+        loop = asyncio.get_running_loop()
+        if "text" in data:
+            text = data["text"]
+            # UTF-8 never takes fewer bytes than characters
+            if len(text) > limit:
+                return {"error": f"Blob is over {limit} bytes"}
+            payload = await loop.run_in_executor(None, text.encode, "utf-8")
         else:
+            encoded = data.get("data", "")
+            if encoded.startswith("data:") and "," in encoded:
+                encoded = encoded.split(",", 1)[1]
+            # Refuse from the encoded length, before decoding anything
+            if len(encoded) * 3 // 4 > limit + 2:
+                return {"error": f"Blob is over {limit} bytes"}
+            try:
+                payload = await loop.run_in_executor(None, base64.b64decode, encoded)
+            except binascii.Error as e:
+                return {"error": f"Invalid base64 data: {e}"}
+            
+        try:
+            digest = await self.blob_store.put(payload, data.get("mime_type"))
+        except ValueError as e:
+            return {"error": str(e)}
+        return {"status": "blob_stored", "hash": digest, "size": len(payload)}
+        
+    async def resolve_blob_refs(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Replace top-level ``{"blobRef": <hash>}`` values with the stored text."""
+        
+        resolved = dict(data)
+        for key, value in data.items():
+            if isinstance(value, dict) and set(value) == {"blobRef"}:
+                blob = await self.blob_store.get(value["blobRef"])
+                if blob is None:
+                    raise ValueError(f"Unknown blob: {value['blobRef']}")
+                resolved[key] = blob.decode("utf-8")
+        return resolved
+        
+    @staticmethod
+    def extract_task_id(message: Dict[str, Any]) -> Optional[str]:
+        """Find the task id an upstream message belongs to, if it carries one."""
+        
+        data = message.get("data") or {}
+        if not isinstance(data, dict):
+            return None
+        nested = data.get("data")
+        return (
+            message.get("task_id")
+            or data.get("taskId")
+            or data.get("task_id")
+            or (nested.get("taskId") if isinstance(nested, dict) else None)
+        )
+        
+    def web_recipients(self, client_id: str) -> List[str]:
+        """The owning client followed by every subscriber of its current task."""
+        
+        recipients = [client_id]
+        for subscriber in self.topics.subscribers(self.topics.current_task(client_id)):
+            if subscriber != client_id:
+                recipients.append(subscriber)
+        return recipients
+        
+    async def send_to_web(self, client_id: str, message: Dict[str, Any]) -> None:
+        """Send message to web client via WebSocket, and to its task's subscribers."""
+        
+        # Encode once, fan out the same text to every recipient
+        text = json.dumps(message)
+        await self.deliver([(recipient, text) for recipient in self.web_recipients(client_id)])
+        
+    async def deliver(self, frames: List[Tuple[str, str]]) -> None:
+        """Send pre-encoded frames to web clients."""
+        
+        if not self.websocket_manager:
             logger.warning("WebSocket manager not set, cannot send to web")
+            return
+            
+        if len(frames) == 1:
+            recipient, text = frames[0]
+            await self.websocket_manager.send_personal_message(text, recipient)
+            return
+            
+        results = await asyncio.gather(
+            *(self.websocket_manager.send_personal_message(text, r) for r, text in frames),
+            return_exceptions=True
+        )
+        for (recipient, _), result in zip(frames, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Failed to send to subscriber {recipient}: {result}")
             
-    async def send_to_roocode(self, client_id: str, message: Dict[str, Any]) -> None:
-        """Send message to Roo-Code via IPC."""
+    async def control_task(
+        self, task_id: str, action: str, user: Optional[str], admin: bool = False
+    ) -> Dict[str, Any]:
+        """Cancel, resume or close one of ``user``'s tasks through the IPC connection that owns it."""
+        
+        task = await self.tasks.load(task_id)
+        # Someone else's task answers exactly like a missing one
+        principal = task and (task.principal or self.principal_of(task.client_id))
+        if task is None or not (admin or (principal is not None and principal == user)):
+            return {"error": "Unknown task", "code": 404}
+        if task.client_id not in self.ipc_clients:
+            return {"error": "Task owner is not connected to Roo-Code", "code": 409}
+            
+        if action == "cancel":
+            await self.send_to_roocode(task.client_id, {"type": "cancelTask", "taskId": task_id})
+            return {"status": "cancelled", "task_id": task_id}
+        if action == "resume":
+            await self.send_to_roocode(task.client_id, {"type": "resumeTask", "taskId": task_id})
+            return {"status": "resumed", "task_id": task_id}
+        if action == "close":
+            await self.send_to_roocode(task.client_id, {"type": "clearCurrentTask", "taskId": task_id})
+            self.tasks.set_state(task_id, TaskState.CLOSED, "close")
+            return {"status": "closed", "task_id": task_id}
+        return {"error": f"Unknown action: {action}", "code": 400}
+        
+    async def send_to_roocode(self, client_id: str, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Send message to Roo-Code via IPC and return the extension's reply."""
         
         ipc_client = self.ipc_clients.get(client_id)
         if ipc_client:
+            priority = Priority.CONTROL if message.get("type") in CONTROL_MESSAGE_TYPES else Priority.BULK
             try:
-                await ipc_client.send_message(message)
+                return await ipc_client.send_message(message, priority=priority)
             except Exception as e:
                 logger.error(f"Error sending to Roo-Code: {e}")
         else:
-            logger.warning(f"No IPC client for {client_id}, cannot send to Roo-Code")
\ No newline at end of file
+            logger.warning(f"No IPC client for {client_id}, cannot send to Roo-Code")
+        return None
\ No newline at end of file
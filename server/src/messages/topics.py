@@ -0,0 +1,97 @@
+"""Task subscriptions so several web clients can watch one Roo-Code task."""
+
+import logging
+from enum import Enum
+from typing import Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class SubscriberRole(str, Enum):
+    """What a subscriber may do with the task it watches."""
+    OBSERVER = "observer"  # read-only
+    APPROVER = "approver"  # may also answer approval requests
+
+
+class TopicHub:
+    """Tracks which web clients watch which task.
+
+    Upstream traffic is still received once per task owner; the router
+    encodes each message once and hands the same text to every subscriber.
+    """
+
+    def __init__(self):
+        self.subscriptions: Dict[str, Dict[str, SubscriberRole]] = {}  # task_id -> client_id -> role
+        self.client_topics: Dict[str, Set[str]] = {}  # client_id -> task_ids
+        self.task_owners: Dict[str, str] = {}  # task_id -> owning client_id
+        self.current_tasks: Dict[str, str] = {}  # owning client_id -> current task_id
+        self.approver_grants: Dict[str, Set[str]] = {}  # task_id -> client_ids / "user:<principal>" the owner allowed
+
+    def set_owner(self, task_id: str, client_id: str):
+        """Record that ``client_id``'s IPC connection is running ``task_id``."""
+        self.task_owners[task_id] = client_id
+        self.current_tasks[client_id] = task_id
+
+    def current_task(self, client_id: str) -> Optional[str]:
+        return self.current_tasks.get(client_id)
+
+    def owner_of(self, task_id: str) -> Optional[str]:
+        return self.task_owners.get(task_id)
+
+    def subscribe(self, task_id: str, client_id: str, role: SubscriberRole = SubscriberRole.OBSERVER):
+        self.subscriptions.setdefault(task_id, {})[client_id] = role
+        self.client_topics.setdefault(client_id, set()).add(task_id)
+        logger.info(f"Client {client_id} subscribed to task {task_id} as {role.value}")
+
+    def grant(self, task_id: str, grantee: str):
+        """Let ``grantee`` (a client_id or ``user:<principal>``) take the approver role."""
+        self.approver_grants.setdefault(task_id, set()).add(grantee)
+
+    def revoke(self, task_id: str, grantee: str, clients: Iterable[str] = ()):
+        """Withdraw a grant; ``clients`` that held the approver role through it drop to observer."""
+        grants = self.approver_grants.get(task_id)
+        if grants is not None:
+            grants.discard(grantee)
+            if not grants:
+                del self.approver_grants[task_id]
+        subscribers = self.subscriptions.get(task_id, {})
+        for client_id in (grantee, *clients):
+            if subscribers.get(client_id) == SubscriberRole.APPROVER:
+                subscribers[client_id] = SubscriberRole.OBSERVER
+
+    def is_granted(self, task_id: str, client_id: str, principal: Optional[str] = None) -> bool:
+        grants = self.approver_grants.get(task_id, ())
+        return client_id in grants or (principal is not None and f"user:{principal}" in grants)
+
+    def unsubscribe(self, task_id: str, client_id: str):
+        subscribers = self.subscriptions.get(task_id)
+        if subscribers is not None:
+            subscribers.pop(client_id, None)
+            if not subscribers:
+                del self.subscriptions[task_id]
+        topics = self.client_topics.get(client_id)
+        if topics is not None:
+            topics.discard(task_id)
+            if not topics:
+                del self.client_topics[client_id]
+
+    def remove_client(self, client_id: str):
+        """Drop every subscription held by a disconnecting client."""
+        for task_id in list(self.client_topics.get(client_id, ())):
+            self.unsubscribe(task_id, client_id)
+        task_id = self.current_tasks.pop(client_id, None)
+        if task_id and self.task_owners.get(task_id) == client_id:
+            del self.task_owners[task_id]
+            self.approver_grants.pop(task_id, None)
+
+    def subscribers(self, task_id: Optional[str]) -> List[str]:
+        if task_id is None:
+            return []
+        return list(self.subscriptions.get(task_id, ()))
+
+    def can_approve(self, task_id: Optional[str], client_id: str) -> bool:
+        if task_id is None:
+            return False
+        if self.task_owners.get(task_id) == client_id:
+            return True
+        return self.subscriptions.get(task_id, {}).get(client_id) == SubscriberRole.APPROVER
@@ -61,8 +61,8 @@ class WebviewMessage(BaseModel):
 
 class ImageData(BaseModel):
     """Image data structure."""
-    type: str  # "base64", "url", "path"
-    data: str  # base64 string, URL, or file path
+    type: str  # "base64", "url", "path", "blobRef"
+    data: str  # base64 string, URL, file path, or blob hash
     mime_type: str  # "image/png", "image/jpeg", etc.
     name: Optional[str] = None
     size: Optional[int] = None
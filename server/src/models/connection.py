@@ -0,0 +1,36 @@
+"""Per-WebSocket connection record kept by the ConnectionManager."""
+
+import asyncio
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    from adapters.base import LLMAdapter
+    from models.session import Session
+
+class Connection:
+    """Everything the bridge holds for one connected client, in a single slotted object."""
+
+    __slots__ = (
+        "client_id", "websocket", "session", "adapter", "observer",
+        "connected_at", "messages_in", "messages_out",
+        "principal", "token", "token_expires_at", "expiry_timer", "lanes"
+    )
+
+    def __init__(self, client_id: str, websocket: Any, session: "Session", observer: bool = False):
+        self.client_id = client_id
+        self.websocket = websocket
+        self.session = session
+        self.adapter: Optional["LLMAdapter"] = None
+        self.observer = observer
+        self.connected_at = time.time()
+        self.messages_in = 0
+        self.messages_out = 0
+        # Authenticated once at the handshake; nothing is re-verified per message
+        self.principal: Optional[str] = None
+        self.token: Optional[str] = None
+        self.token_expires_at: Optional[float] = None
+        self.expiry_timer: Optional[asyncio.TimerHandle] = None
+        # lane name -> (queue of (message, received_at), worker); control never waits behind bulk
+        self.lanes: Dict[str, Tuple[asyncio.Queue, asyncio.Task]] = {}
+
@@ -1,20 +1,97 @@
+from sqlalchemy import event, inspect
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 import os
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./roo_bridge.db")
 
-engine = create_async_engine(DATABASE_URL, echo=False)
+# Applied to every new SQLite connection; each can be overridden from the environment
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),  # negative = KiB
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000")),  # ms
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+}
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "4"))
+
+def apply_sqlite_pragmas(engine, pragmas=None, query_only: bool = False):
+    """Run the performance pragmas on each connection the engine opens."""
+    pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        if query_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+def create_engines(url: str = DATABASE_URL, read_pool_size: int = SQLITE_READ_POOL_SIZE, pragmas=None):
+    """Create the writer engine and, for file-backed SQLite, a separate reader pool.
+
+    SQLite allows one writer at a time, so writes share a single pooled
+    connection while reads run concurrently against WAL snapshots.
+    """
+    if not url.startswith("sqlite") or ":memory:" in url:
+        write_engine = create_async_engine(url, echo=False)
+        return write_engine, write_engine
+
+    write_engine = create_async_engine(
+        url, echo=False, poolclass=AsyncAdaptedQueuePool, pool_size=1, max_overflow=0
+    )
+    read_engine = create_async_engine(
+        url, echo=False, poolclass=AsyncAdaptedQueuePool, pool_size=read_pool_size, max_overflow=0
+    )
+    apply_sqlite_pragmas(write_engine, pragmas)
+    apply_sqlite_pragmas(read_engine, pragmas, query_only=True)
+    return write_engine, read_engine
+
+engine, read_engine = create_engines()
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+AsyncReadSessionLocal = sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
 
 Base = declarative_base()
 
+def add_missing_columns(sync_conn, table):
+    """Add nullable columns a table gained since it was created; create_all never alters tables."""
+    existing = {column["name"] for column in inspect(sync_conn).get_columns(table.name)}
+    for column in table.columns:
+        if column.name not in existing and column.nullable:
+            ddl = column.type.compile(dialect=sync_conn.dialect)
+            sync_conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {ddl}")
+    for index in table.indexes:
+        index.create(sync_conn, checkfirst=True)
+
 async def init_db():
+    from models.session import Base as SessionBase, SessionRecord
+    from models.message import MessageRecord, create_search_index
+    import models.task  # registers the tasks table
+    import models.provider_profile  # registers the provider_profiles table
     async with engine.begin() as conn:
-        from models.session import Base
+        await conn.run_sync(SessionBase.metadata.create_all)
+        # create_all skips indexes on tables that already exist
+        for index in SessionRecord.__table__.indexes:
+            await conn.run_sync(index.create, checkfirst=True)
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns, MessageRecord.__table__)
+        await conn.run_sync(add_missing_columns, models.task.TaskRecord.__table__)
+        if engine.dialect.name == "sqlite":
+            await create_search_index(conn)
 
 async def get_db():
     async with AsyncSessionLocal() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+async def get_read_db():
+    async with AsyncReadSessionLocal() as session:
+        yield session
+
+async def close_db():
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
@@ -0,0 +1,70 @@
+"""Hashed timer wheel for expiring sessions without scanning them."""
+
+import math
+from typing import Dict, List, Optional, Set
+
+
+class ExpiryWheel:
+    """Buckets keys by deadline slot so scheduling and expiry are amortized O(1).
+
+    Rescheduling a key moves it between two bucket sets; expiring walks only
+    the slots that have come due since the previous call.
+    """
+
+    def __init__(self, resolution: float = 1.0):
+        self.resolution = resolution
+        self._buckets: Dict[int, Set[str]] = {}
+        self._slots: Dict[str, int] = {}
+        self._cursor: Optional[int] = None  # last slot already expired
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._slots
+
+    def schedule(self, key: str, deadline: float):
+        slot = math.ceil(deadline / self.resolution)
+        if self._cursor is not None and slot <= self._cursor:
+            slot = self._cursor + 1
+        old = self._slots.get(key)
+        if old == slot:
+            return
+        if old is not None:
+            self._discard(key, old)
+        self._slots[key] = slot
+        self._buckets.setdefault(slot, set()).add(key)
+
+    def cancel(self, key: str):
+        slot = self._slots.pop(key, None)
+        if slot is not None:
+            self._discard(key, slot)
+
+    def _discard(self, key: str, slot: int):
+        bucket = self._buckets.get(slot)
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self._buckets[slot]
+
+    def expire(self, now: float) -> List[str]:
+        """Remove and return every key whose deadline slot has passed by ``now``."""
+        current = math.floor(now / self.resolution)
+        if self._cursor is not None and current <= self._cursor:
+            return []
+
+        if self._cursor is not None and current - self._cursor <= len(self._buckets):
+            due = range(self._cursor + 1, current + 1)
+        else:
+            # First call or a long gap: visit only occupied slots
+            due = sorted(slot for slot in self._buckets if slot <= current)
+
+        expired = []
+        for slot in due:
+            bucket = self._buckets.pop(slot, None)
+            if bucket:
+                for key in bucket:
+                    del self._slots[key]
+                expired.extend(bucket)
+        self._cursor = current
+        return expired
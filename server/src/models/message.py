@@ -0,0 +1,222 @@
+"""Persisted message history with keyset pagination and full-text search."""
+
+import asyncio
+import json
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from sqlalchemy import Column, DateTime, Index, Integer, JSON, String, Text, insert, select, text
+
+from models.database import AsyncReadSessionLocal, AsyncSessionLocal, Base
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Fields whose text is indexed for search, in the order they are looked up
+_TEXT_FIELDS = ("text", "prompt", "question", "command", "response", "content")
+
+SEARCH_INDEX_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts "
+    "USING fts5(content, content='messages', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages "
+    "WHEN new.content != '' BEGIN "
+    "INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages "
+    "WHEN old.content != '' BEGIN "
+    "INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+]
+
+class MessageRecord(Base):
+    __tablename__ = "messages"
+
+    # INTEGER PRIMARY KEY is SQLite's rowid: inserts always append
+    id = Column(Integer, primary_key=True)
+    task_id = Column(String, nullable=True)
+    client_id = Column(String, nullable=False)
+    principal = Column(String, nullable=True)  # user the client authenticated as
+    direction = Column(String, nullable=False)  # "in" from web, "out" from Roo-Code
+    type = Column(String, nullable=False)
+    content = Column(Text, nullable=False, default="")
+    payload = Column(JSON)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_messages_task_id_id", "task_id", "id"),
+        Index("ix_messages_principal_id", "principal", "id"),
+    )
+
+async def create_search_index(conn):
+    """Create the FTS5 index and the triggers that keep it in sync (SQLite only)."""
+    for statement in SEARCH_INDEX_DDL:
+        await conn.execute(text(statement))
+
+def extract_text(message: Dict[str, Any]) -> str:
+    """Pull the human-readable text out of a routed message for indexing."""
+    parts = []
+    for source in (message.get("data"), message):
+        if isinstance(source, dict):
+            for field in _TEXT_FIELDS:
+                value = source.get(field)
+                if isinstance(value, str) and value:
+                    parts.append(value)
+    return "\n".join(parts)
+
+def stored_bytes(row: Dict[str, Any]) -> int:
+    """``length(content) + length(payload)`` of a row once inserted, as retention measures it."""
+    return len(row["content"]) + len(json.dumps(row["payload"]))
+
+def _fts_query(query: str) -> str:
+    # Quote every term so user input cannot break FTS5 query syntax
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+class MessageHistory:
+    """Buffers routed messages in memory and appends them to SQLite in batches."""
+
+    def __init__(
+        self,
+        flush_interval: float = 0.5,
+        batch_size: int = 500,
+        max_pending: int = 50000,
+        session_factory=AsyncSessionLocal,
+        read_session_factory=AsyncReadSessionLocal,
+    ):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.session_factory = session_factory
+        self.read_session_factory = read_session_factory
+        self._pending: Deque[Dict[str, Any]] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        # Called with the stored size of each batch once it is committed (MessageRetention.added)
+        self.on_persisted: Optional[Callable[[int], None]] = None
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background loop and write out whatever is still buffered."""
+        self._stopping = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self.flush()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def record(
+        self,
+        client_id: str,
+        task_id: Optional[str],
+        direction: str,
+        message: Dict[str, Any],
+        principal: Optional[str] = None
+    ):
+        """Queue a routed message for persistence. Never blocks.
+
+        ``message`` should already be redacted (``utils.redact``).
+        """
+
+        payload = dict(message)
+        data = payload.get("data")
+        if isinstance(data, dict) and "images" in data:
+            payload["data"] = {**data, "images": len(data["images"])}
+        if "images" in payload:
+            payload["images"] = len(payload["images"] or [])
+
+        if len(self._pending) >= self.max_pending:
+            self._pending.popleft()
+            metrics.inc("messages.history_dropped")
+        self._pending.append({
+            "task_id": task_id,
+            "client_id": client_id,
+            "principal": principal,
+            "direction": direction,
+            "type": str(message.get("type", "")),
+            "content": extract_text(message),
+            "payload": payload,
+            "created_at": datetime.utcnow(),
+        })
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Insert everything buffered, one transaction per batch."""
+        while self._pending:
+            count = min(len(self._pending), self.batch_size)
+            rows = [self._pending.popleft() for _ in range(count)]
+            try:
+                async with self.session_factory() as db:
+                    async with db.begin():
+                        await db.execute(insert(MessageRecord), rows)
+                metrics.inc("messages.history_persisted", len(rows))
+                if self.on_persisted is not None:
+                    self.on_persisted(sum(stored_bytes(row) for row in rows))
+            except Exception as e:
+                logger.error(f"Failed to persist {len(rows)} messages: {e}")
+                metrics.inc("messages.history_errors")
+                # Retry on the next flush, ahead of newer messages
+                self._pending.extendleft(reversed(rows))
+                return
+
+    async def fetch(
+        self,
+        task_id: Optional[str] = None,
+        limit: int = 50,
+        before: Optional[int] = None,
+        query: Optional[str] = None,
+        principal: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Newest-first page of messages older than the ``before`` id cursor.
+
+        With ``principal`` only that user's messages are returned.
+        """
+
+        stmt = select(MessageRecord)
+        if query:
+            stmt = stmt.where(MessageRecord.id.in_(
+                select(text("rowid")).select_from(text("messages_fts")).where(
+                    text("messages_fts MATCH :match")
+                )
+            )).params(match=_fts_query(query))
+        if task_id is not None:
+            stmt = stmt.where(MessageRecord.task_id == task_id)
+        if principal is not None:
+            stmt = stmt.where(MessageRecord.principal == principal)
+        if before is not None:
+            stmt = stmt.where(MessageRecord.id < before)
+        stmt = stmt.order_by(MessageRecord.id.desc()).limit(limit)
+
+        async with self.read_session_factory() as db:
+            records = (await db.execute(stmt)).scalars().all()
+
+        return [
+            {
+                "id": r.id,
+                "task_id": r.task_id,
+                "client_id": r.client_id,
+                "direction": r.direction,
+                "type": r.type,
+                "content": r.content,
+                "payload": r.payload,
+                "created_at": r.created_at.isoformat() if r.created_at else None,
+            }
+            for r in records
+        ]
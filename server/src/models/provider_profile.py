@@ -0,0 +1,120 @@
+"""Named provider configurations saved per user or for everyone."""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Column, DateTime, JSON, String, delete, or_, select
+
+from models.database import AsyncReadSessionLocal, AsyncSessionLocal, Base
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_OWNER = ""  # owner of profiles every user can reference
+
+class ProviderProfileRecord(Base):
+    __tablename__ = "provider_profiles"
+
+    owner = Column(String, primary_key=True)
+    name = Column(String, primary_key=True)
+    config = Column(JSON, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class ProfileStore:
+    """Read-through cache over the provider_profiles table.
+
+    Nothing is loaded at startup; a profile is read the first time it is
+    referenced and then served from memory, misses included. A user's own
+    profile shadows a global one with the same name.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, read_factory=AsyncReadSessionLocal, max_size: int = 10000):
+        self.session_factory = session_factory
+        self.read_factory = read_factory
+        self.max_size = max_size
+        self._cache: "OrderedDict[Tuple[str, str], Optional[Dict[str, Any]]]" = OrderedDict()
+        self._loading: Dict[Tuple[str, str], "asyncio.Future"] = {}
+
+    def _remember(self, key: Tuple[str, str], config: Optional[Dict[str, Any]]):
+        self._cache[key] = config
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    async def _load(self, name: str, owner: str):
+        """Fetch the user's and the global profile called ``name`` in one query."""
+        owners = {owner, GLOBAL_OWNER}
+        async with self.read_factory() as db:
+            records = (await db.execute(
+                select(ProviderProfileRecord).where(
+                    ProviderProfileRecord.name == name,
+                    or_(*(ProviderProfileRecord.owner == o for o in owners))
+                )
+            )).scalars().all()
+        found = {record.owner: dict(record.config) for record in records}
+        for o in owners:
+            self._remember((o, name), found.get(o))
+        metrics.inc("providers.profiles_loaded")
+
+    async def get(self, name: str, owner: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """The profile's config, preferring ``owner``'s own over the global one."""
+        owner = owner or GLOBAL_OWNER
+        keys = [(owner, name), (GLOBAL_OWNER, name)] if owner != GLOBAL_OWNER else [(GLOBAL_OWNER, name)]
+        if any(key not in self._cache for key in keys):
+            pending = self._loading.get(keys[0])
+            if pending is not None:
+                await asyncio.shield(pending)
+            else:
+                future = asyncio.get_running_loop().create_future()
+                self._loading[keys[0]] = future
+                try:
+                    await self._load(name, owner)
+                except Exception as e:
+                    logger.error(f"Failed to load provider profile {name}: {e}")
+                finally:
+                    future.set_result(None)
+                    del self._loading[keys[0]]
+        for key in keys:
+            config = self._cache.get(key)
+            if config is not None:
+                self._cache.move_to_end(key)
+                return config
+        return None
+
+    async def save(self, name: str, config: Dict[str, Any], owner: Optional[str] = None):
+        owner = owner or GLOBAL_OWNER
+        async with self.session_factory() as db:
+            async with db.begin():
+                await db.merge(ProviderProfileRecord(
+                    owner=owner, name=name, config=config, updated_at=datetime.utcnow()
+                ))
+        self._remember((owner, name), dict(config))
+
+    async def delete(self, name: str, owner: Optional[str] = None) -> bool:
+        owner = owner or GLOBAL_OWNER
+        async with self.session_factory() as db:
+            async with db.begin():
+                result = await db.execute(
+                    delete(ProviderProfileRecord).where(
+                        ProviderProfileRecord.owner == owner, ProviderProfileRecord.name == name
+                    )
+                )
+        self._remember((owner, name), None)
+        return result.rowcount > 0
+
+    async def list(self, owner: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Names visible to ``owner`` (their own and global); configs are not returned."""
+        owners = {owner or GLOBAL_OWNER, GLOBAL_OWNER}
+        async with self.read_factory() as db:
+            rows = (await db.execute(
+                select(ProviderProfileRecord.owner, ProviderProfileRecord.name, ProviderProfileRecord.updated_at)
+                .where(or_(*(ProviderProfileRecord.owner == o for o in owners)))
+                .order_by(ProviderProfileRecord.name)
+            )).all()
+        return [
+            {"name": name, "global": o == GLOBAL_OWNER, "updated_at": updated_at}
+            for o, name, updated_at in rows
+        ]
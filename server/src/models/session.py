@@ -1,14 +1,64 @@
+from collections import OrderedDict
 from typing import Dict, Optional, List
 from datetime import datetime, timedelta
 from pydantic import BaseModel
 import uuid
 import asyncio
-from sqlalchemy import Column, String, DateTime, JSON, Boolean
+import logging
+import time
+from sqlalchemy import Column, String, DateTime, JSON, Boolean, Index, select
 from sqlalchemy.ext.declarative import declarative_base
 
+from models.expiry import ExpiryWheel
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
 Base = declarative_base()
 
-class Session(BaseModel):
+class Session:
+    """Live state of one session.
+
+    Slotted rather than a pydantic model: the registry may hold 100k of these,
+    and pydantic is only needed where sessions leave the process (``to_model``).
+    """
+    
+    __slots__ = ("id", "client_id", "created_at", "last_activity", "active", "context", "provider")
+    
+    def __init__(
+        self,
+        id: str,
+        client_id: str,
+        created_at: datetime,
+        last_activity: datetime,
+        active: bool = True,
+        context: Optional[dict] = None,
+        provider: Optional[str] = "roo-code"
+    ):
+        self.id = id
+        self.client_id = client_id
+        self.created_at = created_at
+        self.last_activity = last_activity
+        self.active = active
+        # Most sessions never store context; allocate the dict on first use
+        self.context = context or None
+        self.provider = provider
+        
+    def to_model(self) -> "SessionInfo":
+        return SessionInfo(
+            id=self.id,
+            client_id=self.client_id,
+            created_at=self.created_at,
+            last_activity=self.last_activity,
+            active=self.active,
+            context=self.context or {},
+            provider=self.provider
+        )
+        
+    def __repr__(self) -> str:
+        return f"Session(id={self.id!r}, client_id={self.client_id!r}, active={self.active})"
+
+class SessionInfo(BaseModel):
     id: str
     client_id: str
     created_at: datetime
@@ -27,60 +77,270 @@ class SessionRecord(Base):
     active = Column(Boolean, default=True)
     context = Column(JSON, default=dict)
     provider = Column(String, default="roo-code")
+    
+    # Lets a reconnecting client find its latest session without a scan
+    __table_args__ = (Index("ix_sessions_client_id_last_activity", "client_id", "last_activity"),)
+
+class ActiveIndex:
+    """Active sessions in creation order with O(1) add/remove and cursor paging."""
+    
+    def __init__(self):
+        self._sessions: Dict[str, Session] = {}
+        self._links: Dict[str, List[Optional[str]]] = {}  # session_id -> [prev, next]
+        self._head: Optional[str] = None
+        self._tail: Optional[str] = None
+        
+    def __len__(self) -> int:
+        return len(self._sessions)
+        
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+        
+    def add(self, session: Session):
+        if session.id in self._sessions:
+            return
+        self._sessions[session.id] = session
+        self._links[session.id] = [self._tail, None]
+        if self._tail is not None:
+            self._links[self._tail][1] = session.id
+        else:
+            self._head = session.id
+        self._tail = session.id
+        
+    def remove(self, session_id: str):
+        if self._sessions.pop(session_id, None) is None:
+            return
+        prev, nxt = self._links.pop(session_id)
+        if prev is not None:
+            self._links[prev][1] = nxt
+        else:
+            self._head = nxt
+        if nxt is not None:
+            self._links[nxt][0] = prev
+        else:
+            self._tail = prev
+            
+    def clear(self):
+        self._sessions.clear()
+        self._links.clear()
+        self._head = self._tail = None
+        
+    def page(self, limit: Optional[int] = None, after: Optional[str] = None) -> List[Session]:
+        """Return up to ``limit`` sessions following the ``after`` cursor."""
+        if after is not None:
+            if after not in self._links:
+                return []
+            current = self._links[after][1]
+        else:
+            current = self._head
+        result = []
+        while current is not None and (limit is None or len(result) < limit):
+            result.append(self._sessions[current])
+            current = self._links[current][1]
+        return result
 
 class SessionManager:
+    # Single-threaded event loop: none of these methods await while mutating
+    # the registry, so no lock is needed on the hot path.
     _sessions: Dict[str, Session] = {}
-    _lock = asyncio.Lock()
+    _by_client: Dict[str, Session] = {}  # client_id -> most recent session
+    _active = ActiveIndex()
+    _writer = None  # SessionWriter, set from lifespan
+    _loader = None  # session factory for reading SessionRecord, set from lifespan
+    _loading: Dict[str, "asyncio.Future"] = {}  # in-flight rehydrations, keyed by session id or client
+    _missing: "OrderedDict[str, None]" = OrderedDict()  # ids known not to be in the database
+    max_missing: int = 10000
+    _expiry = ExpiryWheel()
+    idle_timeout: float = 30 * 60  # seconds without activity before a session is reaped
+    closed_retention: float = 0  # seconds a closed session stays in memory
+    rehydrated_retention: float = 5 * 60  # seconds a session read back by id stays cached
+    
+    @classmethod
+    def set_writer(cls, writer):
+        cls._writer = writer
+    
+    @classmethod
+    def set_loader(cls, session_factory):
+        """Enable read-through rehydration of sessions stored by earlier runs."""
+        cls._loader = session_factory
+        cls._missing.clear()
+    
+    @staticmethod
+    def _from_record(record: SessionRecord) -> Session:
+        return Session(
+            id=record.id,
+            client_id=record.client_id,
+            created_at=record.created_at,
+            last_activity=record.last_activity,
+            active=False,
+            context=dict(record.context) if record.context else None,
+            provider=record.provider
+        )
+    
+    @classmethod
+    async def _load(cls, key: str, stmt) -> Optional[Session]:
+        """Run one lookup per key even when many callers miss at once."""
+        pending = cls._loading.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        
+        future = asyncio.get_running_loop().create_future()
+        cls._loading[key] = future
+        try:
+            async with cls._loader() as db:
+                record = (await db.execute(stmt)).scalars().first()
+            session = cls._from_record(record) if record is not None else None
+            future.set_result(session)
+            return session
+        except Exception as e:
+            logger.error(f"Failed to load session {key}: {e}")
+            future.set_result(None)
+            return None
+        finally:
+            del cls._loading[key]
     
     @classmethod
     async def create_session(cls, client_id: str, provider: str = "roo-code") -> Session:
-        async with cls._lock:
-            session_id = str(uuid.uuid4())
+        now = datetime.utcnow()
+        session = None
+        previous = cls._by_client.get(client_id)
+        if cls._loader is not None and previous is not None and not previous.active:
+            # Reconnected before the closed session was reaped
+            session = previous
+        elif cls._loader is not None and previous is None:
+            # A returning client picks up where its last session left off
+            session = await cls._load(
+                f"client:{client_id}",
+                select(SessionRecord)
+                .where(SessionRecord.client_id == client_id)
+                .order_by(SessionRecord.last_activity.desc())
+                .limit(1)
+            )
+            if session is not None and session.id in cls._sessions:
+                session = cls._sessions[session.id]
+        if session is not None:
+            session.active = True
+            session.last_activity = now
+            metrics.inc("sessions.rehydrated")
+        else:
             session = Session(
-                id=session_id,
+                id=str(uuid.uuid4()),
                 client_id=client_id,
-                created_at=datetime.utcnow(),
-                last_activity=datetime.utcnow(),
-                active=True,
-                context={},
+                created_at=now,
+                last_activity=now,
                 provider=provider
             )
-            cls._sessions[session_id] = session
-            return session
+        cls._sessions[session.id] = session
+        cls._by_client[client_id] = session
+        cls._active.add(session)
+        cls._expiry.schedule(session.id, time.monotonic() + cls.idle_timeout)
+        if cls._writer:
+            cls._writer.record(session)
+        return session
     
     @classmethod
     async def get_session(cls, session_id: str) -> Optional[Session]:
-        return cls._sessions.get(session_id)
+        session = cls._sessions.get(session_id)
+        if session is not None or cls._loader is None or session_id in cls._missing:
+            return session
+        
+        session = await cls._load(session_id, select(SessionRecord).where(SessionRecord.id == session_id))
+        if session_id in cls._sessions:
+            # Created or loaded by someone else while we waited
+            return cls._sessions[session_id]
+        if session is None:
+            cls._missing[session_id] = None
+            if len(cls._missing) > cls.max_missing:
+                cls._missing.popitem(last=False)
+            return None
+        
+        cls._sessions[session_id] = session
+        cls._expiry.schedule(session_id, time.monotonic() + cls.rehydrated_retention)
+        metrics.inc("sessions.rehydrated")
+        return session
+    
+    @classmethod
+    async def get_session_by_client(cls, client_id: str) -> Optional[Session]:
+        return cls._by_client.get(client_id)
     
     @classmethod
     async def update_activity(cls, session_id: str):
-        if session_id in cls._sessions:
-            cls._sessions[session_id].last_activity = datetime.utcnow()
+        session = cls._sessions.get(session_id)
+        if session is not None:
+            session.last_activity = datetime.utcnow()
+            cls._expiry.schedule(session_id, time.monotonic() + cls.idle_timeout)
+            if cls._writer:
+                cls._writer.record(session, important=False)
     
     @classmethod
     def close_session(cls, session_id: str):
-        if session_id in cls._sessions:
-            cls._sessions[session_id].active = False
+        session = cls._sessions.get(session_id)
+        if session is not None:
+            session.active = False
+            cls._active.remove(session_id)
+            cls._expiry.schedule(session_id, time.monotonic() + cls.closed_retention)
+            if cls._writer:
+                cls._writer.record(session)
+    
+    @classmethod
+    def _remove(cls, session_id: str):
+        session = cls._sessions.pop(session_id, None)
+        if session is None:
+            return
+        cls._active.remove(session_id)
+        cls._expiry.cancel(session_id)
+        if cls._by_client.get(session.client_id) is session:
+            del cls._by_client[session.client_id]
     
     @classmethod
     async def cleanup_inactive(cls, timeout_minutes: int = 30):
-        async with cls._lock:
-            cutoff = datetime.utcnow() - timedelta(minutes=timeout_minutes)
-            inactive_sessions = [
-                sid for sid, session in cls._sessions.items()
-                if session.last_activity < cutoff
-            ]
-            for sid in inactive_sessions:
-                cls.close_session(sid)
-                del cls._sessions[sid]
+        cutoff = datetime.utcnow() - timedelta(minutes=timeout_minutes)
+        inactive_sessions = [
+            sid for sid, session in cls._sessions.items()
+            if session.last_activity < cutoff
+        ]
+        for sid in inactive_sessions:
+            cls.close_session(sid)
+            cls._remove(sid)
     
     @classmethod
-    async def cleanup_all(cls):
-        async with cls._lock:
-            for session_id in list(cls._sessions.keys()):
+    def reap(cls, now: Optional[float] = None) -> int:
+        """Remove sessions that went idle or were closed; returns how many."""
+        now = time.monotonic() if now is None else now
+        reaped = 0
+        for session_id in cls._expiry.expire(now):
+            session = cls._sessions.get(session_id)
+            if session is None:
+                continue
+            if session.active:
                 cls.close_session(session_id)
-            cls._sessions.clear()
+            cls._remove(session_id)
+            reaped += 1
+        return reaped
+    
+    @classmethod
+    async def run_reaper(cls, interval: float = 1.0):
+        """Reap expired sessions every ``interval`` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                reaped = cls.reap()
+                if reaped:
+                    logger.debug(f"Reaped {reaped} sessions")
+            except Exception as e:
+                logger.error(f"Session reaper error: {e}")
+    
+    @classmethod
+    async def cleanup_all(cls):
+        for session_id in list(cls._sessions.keys()):
+            cls.close_session(session_id)
+            cls._remove(session_id)
+    
+    @classmethod
+    def active_count(cls) -> int:
+        return len(cls._active)
     
     @classmethod
-    def get_active_sessions(cls) -> List[Session]:
-        return [s for s in cls._sessions.values() if s.active]
\ No newline at end of file
+    def get_active_sessions(cls, limit: Optional[int] = None, after: Optional[str] = None) -> List[Session]:
+        """Active sessions in creation order; page with ``limit`` and the last id seen as ``after``."""
+        return cls._active.page(limit, after)
\ No newline at end of file
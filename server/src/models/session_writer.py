@@ -0,0 +1,121 @@
+"""Write-behind persistence of sessions into the SessionRecord table."""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models.database import AsyncSessionLocal
+from models.session import SessionRecord
+from utils.metrics import metrics
+
+if TYPE_CHECKING:
+    from models.session import Session
+
+logger = logging.getLogger(__name__)
+
+_COLUMNS = ("id", "client_id", "created_at", "last_activity", "active", "context", "provider")
+
+# Keep each upsert well under SQLite's bound-parameter limit
+_ROWS_PER_STATEMENT = 100
+
+
+class SessionWriter:
+    """Batches session creates, activity updates and closes into periodic flushes.
+
+    ``record`` only marks a session dirty, so the WebSocket connect path never
+    waits on the database. Repeated updates to one session between flushes
+    coalesce into a single row write, and each flush is one transaction.
+    """
+
+    def __init__(self, flush_interval: float = 1.0, max_pending: int = 10000, session_factory=AsyncSessionLocal):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: "OrderedDict[str, Session]" = OrderedDict()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background loop and flush whatever is still pending."""
+        self._stopping = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def record(self, session: "Session", important: bool = True):
+        """Mark a session dirty. Activity-only updates (``important=False``) may be
+        dropped when the queue is full; creates and closes never are."""
+
+        if session.id in self._pending:
+            # Keep the newest object; a replaced session must not flush stale state
+            self._pending[session.id] = session
+            self._pending.move_to_end(session.id)
+            return
+        if len(self._pending) >= self.max_pending:
+            self._wakeup.set()
+            if not important:
+                metrics.inc("sessions.persist_dropped")
+                return
+        self._pending[session.id] = session
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    @staticmethod
+    def _row(session: "Session") -> Dict[str, Any]:
+        row = {column: getattr(session, column) for column in _COLUMNS}
+        row["context"] = dict(row["context"] or {})
+        return row
+
+    async def flush(self):
+        """Write every pending session in a single transaction."""
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, OrderedDict()
+        rows = [self._row(session) for session in batch.values()]
+        try:
+            await self._write(rows)
+            metrics.inc("sessions.persisted", len(rows))
+        except Exception as e:
+            logger.error(f"Failed to persist {len(rows)} sessions: {e}")
+            metrics.inc("sessions.persist_errors")
+            # Put the batch back behind anything that arrived meanwhile
+            for session_id, session in batch.items():
+                self._pending.setdefault(session_id, session)
+
+    async def _write(self, rows: List[Dict[str, Any]]):
+        async with self.session_factory() as db:
+            async with db.begin():
+                if db.get_bind().dialect.name == "sqlite":
+                    for i in range(0, len(rows), _ROWS_PER_STATEMENT):
+                        stmt = sqlite_insert(SessionRecord).values(rows[i:i + _ROWS_PER_STATEMENT])
+                        stmt = stmt.on_conflict_do_update(
+                            index_elements=[SessionRecord.id],
+                            set_={column: stmt.excluded[column] for column in _COLUMNS if column != "id"}
+                        )
+                        await db.execute(stmt)
+                else:
+                    for row in rows:
+                        await db.merge(SessionRecord(**row))
@@ -0,0 +1,283 @@
+"""Live task state fed by Roo-Code traffic, snapshotted to the database."""
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, Optional, Set
+
+from pydantic import BaseModel
+from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models.database import AsyncReadSessionLocal, AsyncSessionLocal, Base
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Finished tasks stay in memory this long after being snapshotted, then are read back on demand
+TASK_EVICT_SECONDS = float(os.getenv("TASK_EVICT_SECONDS", "300"))
+
+class TaskState(str, Enum):
+    CREATED = "created"
+    RUNNING = "running"
+    WAITING_APPROVAL = "waiting_approval"
+    PAUSED = "paused"
+    COMPLETED = "completed"
+    ABORTED = "aborted"
+    CLOSED = "closed"
+
+TERMINAL_STATES = {TaskState.COMPLETED, TaskState.ABORTED, TaskState.CLOSED}
+
+# Roo-Code say types and extension event names -> resulting state
+_TRANSITIONS = {
+    "task_created": TaskState.RUNNING,
+    "taskCreated": TaskState.RUNNING,
+    "taskStarted": TaskState.RUNNING,
+    "task_paused": TaskState.PAUSED,
+    "taskPaused": TaskState.PAUSED,
+    "task_unpaused": TaskState.RUNNING,
+    "taskUnpaused": TaskState.RUNNING,
+    "resume_completed": TaskState.RUNNING,
+    "task_completed": TaskState.COMPLETED,
+    "taskCompleted": TaskState.COMPLETED,
+    "task_aborted": TaskState.ABORTED,
+    "taskAborted": TaskState.ABORTED,
+}
+
+class Task(BaseModel):
+    id: str
+    client_id: str
+    state: TaskState
+    created_at: datetime
+    updated_at: datetime
+    parent_id: Optional[str] = None
+    message_count: int = 0
+    last_event: Optional[str] = None
+    principal: Optional[str] = None  # user whose client started it
+
+class TaskRecord(Base):
+    __tablename__ = "tasks"
+
+    id = Column(String, primary_key=True)
+    client_id = Column(String, nullable=False)
+    state = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    parent_id = Column(String, nullable=True)
+    message_count = Column(Integer, default=0)
+    last_event = Column(String, nullable=True)
+    principal = Column(String, nullable=True)
+
+class TaskRegistry:
+    """Keeps live tasks' state in memory; status reads of them never touch IPC or the DB.
+
+    Finished tasks are dropped from memory ``evict_after`` seconds after
+    their final state is snapshotted; ``load`` brings one back from the
+    tasks table when it is asked for again.
+    """
+
+    def __init__(self, snapshot_interval: float = 5.0, session_factory=AsyncSessionLocal,
+                 read_session_factory=AsyncReadSessionLocal, evict_after: float = TASK_EVICT_SECONDS):
+        self.snapshot_interval = snapshot_interval
+        self.session_factory = session_factory
+        self.read_session_factory = read_session_factory
+        self.evict_after = evict_after
+        self.tasks: Dict[str, Task] = {}
+        self._dirty: Set[str] = set()
+        # Snapshotted terminal tasks, oldest first -> when they were written
+        self._finished: "OrderedDict[str, float]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+
+    def get(self, task_id: str) -> Optional[Task]:
+        return self.tasks.get(task_id)
+
+    async def load(self, task_id: str) -> Optional[Task]:
+        """The task from memory, or read back from the tasks table if it was evicted."""
+        task = self.tasks.get(task_id)
+        if task is not None:
+            return task
+        try:
+            async with self.read_session_factory() as db:
+                record = await db.get(TaskRecord, task_id)
+        except Exception as e:
+            logger.error(f"Failed to load task {task_id}: {e}")
+            return None
+        if record is None or task_id in self.tasks:
+            return self.tasks.get(task_id)
+        task = Task(
+            id=record.id,
+            client_id=record.client_id,
+            state=TaskState(record.state),
+            created_at=record.created_at,
+            updated_at=record.updated_at,
+            parent_id=record.parent_id,
+            message_count=record.message_count or 0,
+            last_event=record.last_event,
+            principal=record.principal
+        )
+        self.tasks[task_id] = task
+        self._finished[task_id] = time.monotonic()
+        return task
+
+    def _evict(self):
+        """Drop finished tasks that have been on disk for ``evict_after`` seconds."""
+        deadline = time.monotonic() - self.evict_after
+        while self._finished:
+            task_id, written_at = next(iter(self._finished.items()))
+            if written_at > deadline:
+                break
+            del self._finished[task_id]
+            task = self.tasks.get(task_id)
+            # Changed since it was written (e.g. resumed): keep it
+            if task is not None and task.state in TERMINAL_STATES and task_id not in self._dirty:
+                del self.tasks[task_id]
+                metrics.inc("tasks.evicted")
+
+    def _touch(self, task: Task, event: Optional[str] = None):
+        task.updated_at = datetime.utcnow()
+        if event:
+            task.last_event = event
+        self._dirty.add(task.id)
+
+    def ensure(self, task_id: str, client_id: str, parent_id: Optional[str] = None,
+               principal: Optional[str] = None) -> Task:
+        task = self.tasks.get(task_id)
+        if task is None:
+            now = datetime.utcnow()
+            task = Task(
+                id=task_id,
+                client_id=client_id,
+                state=TaskState.CREATED,
+                created_at=now,
+                updated_at=now,
+                parent_id=parent_id,
+                principal=principal
+            )
+            self.tasks[task_id] = task
+            self._dirty.add(task_id)
+        elif task.client_id != client_id:
+            task.client_id = client_id
+            self._touch(task)
+        if task.principal is None and principal is not None:
+            task.principal = principal
+            self._dirty.add(task_id)
+        return task
+
+    def set_state(self, task_id: str, state: TaskState, event: Optional[str] = None):
+        task = self.tasks.get(task_id)
+        if task is None or task.state == state:
+            return
+        if task.state in TERMINAL_STATES and state not in TERMINAL_STATES:
+            # A finished task only comes back through an explicit resume
+            if event not in ("resume_completed", "taskStarted"):
+                return
+        task.state = state
+        self._touch(task, event)
+
+    def observe(self, client_id: str, task_id: Optional[str], msg_type: str, data: Dict[str, Any],
+                principal: Optional[str] = None):
+        """Update task state from one upstream ``say``/``ask``/``event`` message."""
+        if not task_id:
+            return
+        task = self.ensure(task_id, client_id, principal=principal)
+        task.message_count += 1
+        self._dirty.add(task_id)
+
+        if msg_type == "event":
+            name = data.get("name") or data.get("event")
+        elif msg_type == "say":
+            name = data.get("say_type") or data.get("type")
+        elif msg_type == "ask":
+            if task.state in (TaskState.CREATED, TaskState.RUNNING):
+                self.set_state(task_id, TaskState.WAITING_APPROVAL, data.get("ask_type") or data.get("type"))
+            return
+        else:
+            return
+
+        if name == "task_spawned" or name == "taskSpawned":
+            child_id = data.get("childTaskId") or (data.get("data") or {}).get("childTaskId")
+            if child_id:
+                self.ensure(child_id, client_id, parent_id=task_id, principal=task.principal)
+                self.set_state(child_id, TaskState.RUNNING, name)
+            return
+
+        state = _TRANSITIONS.get(name)
+        if state is not None:
+            self.set_state(task_id, state, name)
+        elif task.state == TaskState.WAITING_APPROVAL or task.state == TaskState.CREATED:
+            # Any other progress means the task is running again
+            self.set_state(task_id, TaskState.RUNNING, name)
+
+    def approval_answered(self, task_id: Optional[str]):
+        task = self.tasks.get(task_id) if task_id else None
+        if task and task.state == TaskState.WAITING_APPROVAL:
+            self.set_state(task_id, TaskState.RUNNING, "askResponse")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.snapshot()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            await self.snapshot()
+
+    async def snapshot(self):
+        """Write changed tasks to the tasks table in one transaction, then evict finished ones."""
+        self._evict()
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        rows = [
+            {
+                "id": t.id,
+                "client_id": t.client_id,
+                "state": t.state.value,
+                "created_at": t.created_at,
+                "updated_at": t.updated_at,
+                "parent_id": t.parent_id,
+                "message_count": t.message_count,
+                "last_event": t.last_event,
+                "principal": t.principal,
+            }
+            for t in (self.tasks.get(task_id) for task_id in dirty) if t is not None
+        ]
+        if not rows:
+            return
+        try:
+            async with self.session_factory() as db:
+                async with db.begin():
+                    if db.get_bind().dialect.name == "sqlite":
+                        for i in range(0, len(rows), 100):
+                            stmt = sqlite_insert(TaskRecord).values(rows[i:i + 100])
+                            stmt = stmt.on_conflict_do_update(
+                                index_elements=[TaskRecord.id],
+                                set_={k: stmt.excluded[k] for k in rows[0] if k != "id"}
+                            )
+                            await db.execute(stmt)
+                    else:
+                        for row in rows:
+                            await db.merge(TaskRecord(**row))
+            metrics.inc("tasks.snapshotted", len(rows))
+            now = time.monotonic()
+            for row in rows:
+                if TaskState(row["state"]) in TERMINAL_STATES:
+                    self._finished[row["id"]] = now
+                    self._finished.move_to_end(row["id"])
+        except Exception as e:
+            logger.error(f"Failed to snapshot {len(rows)} tasks: {e}")
+            self._dirty |= dirty
@@ -0,0 +1,7 @@
+"""Bridge-side storage for large payloads and raw transcripts."""
+
+from .blob_store import BlobStore
+from .transcript_log import TranscriptLog
+from .retention import Compactor, RetentionPolicy
+
+__all__ = ['BlobStore', 'TranscriptLog', 'Compactor', 'RetentionPolicy']
@@ -0,0 +1,176 @@
+"""Content-addressed blob store for images and large payloads."""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BLOB_DIR = os.getenv("BLOB_DIR", "./blobs")
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class BlobStore:
+    """Stores blobs by SHA-256 digest, in memory with LRU and spilling to disk.
+
+    Clients upload a payload once and refer to it afterwards by hash, so
+    retries and follow-ups no longer carry the same megabytes of base64.
+    Spilled files are aged out by ``storage.retention.BlobRetention``.
+    """
+
+    def __init__(
+        self,
+        memory_limit: int = 64 * 1024 * 1024,
+        max_blob_size: int = 50 * 1024 * 1024,
+        spill_dir: Optional[str] = None,
+    ):
+        self.memory_limit = memory_limit
+        self.max_blob_size = max_blob_size
+        self.spill_dir = Path(spill_dir or BLOB_DIR)
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._spilling: Dict[str, bytes] = {}
+        self.mime_types: Dict[str, Optional[str]] = {}
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def is_digest(value: str) -> bool:
+        return bool(_DIGEST_RE.match(value))
+
+    def _path(self, digest: str) -> Path:
+        return self.spill_dir / digest[:2] / digest
+
+    def _write_spill(self, digest: str, data: bytes):
+        path = self._path(digest)
+        if path.exists():
+            # Touch it so retention sees the blob as recently used
+            os.utime(path)
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def _read_spill(self, digest: str) -> Optional[bytes]:
+        try:
+            return self._path(digest).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def list_spilled(self) -> List[Tuple[float, str, int]]:
+        """(mtime, digest, size) of every spilled blob. Blocking; run it in an executor."""
+        spilled = []
+        if not self.spill_dir.is_dir():
+            return spilled
+        for shard in os.scandir(self.spill_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if self.is_digest(entry.name):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    spilled.append((stat.st_mtime, entry.name, stat.st_size))
+        return spilled
+
+    def _unlink_spill(self, digest: str) -> int:
+        path = self._path(digest)
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            return 0
+        return size
+
+    async def drop_spilled(self, digest: str) -> int:
+        """Delete a spilled blob's file; returns the bytes freed."""
+        loop = asyncio.get_running_loop()
+        freed = await loop.run_in_executor(None, self._unlink_spill, digest)
+        if digest not in self._memory and digest not in self._spilling:
+            # Gone for good; its mime type goes with it
+            self.mime_types.pop(digest, None)
+        return freed
+
+    async def _spill_overflow(self):
+        """Move least recently used blobs to disk until memory fits the limit."""
+        loop = asyncio.get_running_loop()
+        while self._memory_bytes > self.memory_limit and len(self._memory) > 1:
+            digest, data = self._memory.popitem(last=False)
+            self._memory_bytes -= len(data)
+            # Keep the bytes reachable until the file is fully written
+            self._spilling[digest] = data
+            try:
+                await loop.run_in_executor(None, self._write_spill, digest, data)
+            except OSError as e:
+                logger.error(f"Failed to spill blob {digest} to disk: {e}")
+            finally:
+                self._spilling.pop(digest, None)
+
+    def _remember(self, digest: str, data: bytes):
+        self._memory[digest] = data
+        self._memory_bytes += len(data)
+
+    async def put(self, data: bytes, mime_type: Optional[str] = None) -> str:
+        """Store a blob and return its digest. Storing the same bytes twice is free."""
+
+        if len(data) > self.max_blob_size:
+            raise ValueError(f"Blob is {len(data)} bytes, limit is {self.max_blob_size}")
+
+        loop = asyncio.get_running_loop()
+        digest = await loop.run_in_executor(None, self.digest, data)
+        if mime_type or digest not in self.mime_types:
+            self.mime_types[digest] = mime_type
+
+        if digest in self._memory:
+            self._memory.move_to_end(digest)
+            return digest
+
+        self._remember(digest, data)
+        await self._spill_overflow()
+        return digest
+
+    async def get(self, digest: str) -> Optional[bytes]:
+        """Return the blob for ``digest`` or None if it is unknown."""
+
+        if not self.is_digest(digest):
+            return None
+        data = self._memory.get(digest)
+        if data is not None:
+            self._memory.move_to_end(digest)
+            return data
+        if digest in self._spilling:
+            return self._spilling[digest]
+
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(None, self._read_spill, digest)
+        if data is None:
+            return None
+
+        if digest not in self._memory:
+            self._remember(digest, data)
+        await self._spill_overflow()
+        return data
+
+    async def has(self, digest: str) -> bool:
+        if not self.is_digest(digest):
+            return False
+        if digest in self._memory or digest in self._spilling:
+            return True
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._path(digest).exists)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "memory_blobs": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+        }
@@ -0,0 +1,429 @@
+"""Age and size budgets for everything the bridge stores, enforced by incremental compaction."""
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select
+
+from models.database import AsyncReadSessionLocal, AsyncSessionLocal
+from models.message import MessageRecord
+from models.session import SessionRecord
+from models.task import TERMINAL_STATES, TaskRecord
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class RetentionPolicy:
+    """Keep data no older than ``max_age`` seconds and no bigger than ``max_bytes``."""
+
+    __slots__ = ("max_age", "max_bytes")
+
+    def __init__(self, max_age: Optional[float] = None, max_bytes: Optional[int] = None):
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def from_env(cls, store: str, days: float, megabytes: float) -> "RetentionPolicy":
+        """Read ``RETENTION_<STORE>_DAYS`` / ``_MB``; 0 disables that budget."""
+        days = float(os.getenv(f"RETENTION_{store.upper()}_DAYS", str(days)))
+        megabytes = float(os.getenv(f"RETENTION_{store.upper()}_MB", str(megabytes)))
+        return cls(
+            max_age=days * 86400 if days > 0 else None,
+            max_bytes=int(megabytes * 1024 * 1024) if megabytes > 0 else None
+        )
+
+    def cutoff(self) -> Optional[datetime]:
+        return datetime.utcnow() - timedelta(seconds=self.max_age) if self.max_age else None
+
+
+class ApprovalRetention:
+    """Drops old entries from MessageRouter.pending_approvals (in memory).
+
+    Each approval is serialized once, the first pass that sees it, and that
+    size is kept until it is removed; new ones are measured a slice at a time.
+    Pending approvals are only dropped once expired; over budget, the scan
+    steps past them to the answered ones behind.
+    """
+
+    name = "approvals"
+
+    def __init__(self, approvals: Dict[str, Dict[str, Any]], policy: RetentionPolicy, slice_size: int = 500):
+        self.approvals = approvals
+        self.policy = policy
+        self.slice_size = slice_size
+        self._sizes: Dict[str, int] = {}
+        self._size = 0
+        self._kept = 0  # pending approvals stepped over at the head of the dict this pass
+
+    @staticmethod
+    def _bytes(approval: Dict[str, Any]) -> int:
+        return len(json.dumps(approval, default=str))
+
+    async def begin_pass(self):
+        self._kept = 0
+        if not self.policy.max_bytes:
+            return
+        # Forget approvals that were removed elsewhere
+        for approval_id in [a for a in self._sizes if a not in self.approvals]:
+            self._size -= self._sizes.pop(approval_id)
+        unsized = [a for a in self.approvals if a not in self._sizes]
+        for i in range(0, len(unsized), self.slice_size):
+            for approval_id in unsized[i:i + self.slice_size]:
+                approval = self.approvals.get(approval_id)
+                if approval is not None:
+                    size = self._sizes[approval_id] = self._bytes(approval)
+                    self._size += size
+            await asyncio.sleep(0)
+
+    async def step(self, batch_size: int) -> Tuple[int, int]:
+        # Approvals were created with local time; dicts keep insertion order, oldest first
+        cutoff = datetime.now() - timedelta(seconds=self.policy.max_age) if self.policy.max_age else None
+        over = self.policy.max_bytes is not None and self._size > self.policy.max_bytes
+        removed = reclaimed = 0
+        while removed < batch_size:
+            window = list(itertools.islice(self.approvals, self._kept, self._kept + batch_size - removed))
+            if not window:
+                break
+            for approval_id in window:
+                approval = self.approvals[approval_id]
+                expired = cutoff is not None and datetime.fromisoformat(approval["created_at"]) < cutoff
+                if not expired and not over:
+                    return removed, reclaimed  # everything behind it is newer
+                # Over budget only evicts answered approvals; a pending one may still be answered
+                if not expired and approval.get("status") == "pending":
+                    self._kept += 1
+                    continue
+                size = self._sizes.pop(approval_id, None)
+                if size is None:
+                    size = self._bytes(approval)
+                else:
+                    self._size -= size
+                del self.approvals[approval_id]
+                removed += 1
+                reclaimed += size
+                over = self.policy.max_bytes is not None and self._size > self.policy.max_bytes
+        return removed, reclaimed
+
+
+class MessageRetention:
+    """Deletes the oldest rows of the messages table, a batch per transaction.
+
+    The table is summed once, on the first pass; after that the total is kept
+    current by ``added`` (wired to MessageHistory.on_persisted) and by the
+    deletes made here.
+    """
+
+    name = "messages"
+
+    def __init__(self, policy: RetentionPolicy, session_factory=AsyncSessionLocal,
+                 read_session_factory=AsyncReadSessionLocal):
+        self.policy = policy
+        self.session_factory = session_factory
+        self.read_session_factory = read_session_factory
+        self._size: Optional[int] = None
+
+    @staticmethod
+    def _row_bytes():
+        return func.length(MessageRecord.content) + func.coalesce(func.length(MessageRecord.payload), 0)
+
+    def added(self, nbytes: int):
+        # Rows committed before the first pass are counted by its sum instead
+        if self._size is not None:
+            self._size += nbytes
+
+    async def begin_pass(self):
+        if self.policy.max_bytes and self._size is None:
+            async with self.read_session_factory() as db:
+                self._size = (await db.execute(select(func.coalesce(func.sum(self._row_bytes()), 0)))).scalar()
+
+    async def step(self, batch_size: int) -> Tuple[int, int]:
+        cutoff = self.policy.cutoff()
+        # Ids grow with time, so the oldest rows are always at the head of the table
+        async with self.read_session_factory() as db:
+            rows = (await db.execute(
+                select(MessageRecord.id, MessageRecord.created_at, self._row_bytes())
+                .order_by(MessageRecord.id)
+                .limit(batch_size)
+            )).all()
+
+        doomed, reclaimed = [], 0
+        for message_id, created_at, size in rows:
+            over = self.policy.max_bytes is not None and self._size - reclaimed > self.policy.max_bytes
+            if not over and not (cutoff is not None and created_at is not None and created_at < cutoff):
+                break
+            doomed.append(message_id)
+            reclaimed += size or 0
+        if not doomed:
+            return 0, 0
+
+        async with self.session_factory() as db:
+            async with db.begin():
+                await db.execute(delete(MessageRecord).where(MessageRecord.id <= doomed[-1]))
+        if self._size is not None:
+            self._size -= reclaimed
+        return len(doomed), reclaimed
+
+
+class SessionRetention:
+    """Deletes closed sessions from the sessions table, oldest activity first."""
+
+    name = "sessions"
+
+    def __init__(self, policy: RetentionPolicy, session_factory=AsyncSessionLocal,
+                 read_session_factory=AsyncReadSessionLocal):
+        self.policy = policy
+        self.session_factory = session_factory
+        self.read_session_factory = read_session_factory
+        self._size = 0
+
+    @staticmethod
+    def _row_bytes():
+        return (
+            func.length(SessionRecord.id) + func.length(SessionRecord.client_id)
+            + func.coalesce(func.length(SessionRecord.context), 0)
+            + func.coalesce(func.length(SessionRecord.provider), 0)
+        )
+
+    async def begin_pass(self):
+        self._size = 0
+        if self.policy.max_bytes:
+            async with self.read_session_factory() as db:
+                self._size = (await db.execute(select(func.coalesce(func.sum(self._row_bytes()), 0)))).scalar()
+
+    async def step(self, batch_size: int) -> Tuple[int, int]:
+        cutoff = self.policy.cutoff()
+        over = self.policy.max_bytes is not None and self._size > self.policy.max_bytes
+        if cutoff is None and not over:
+            return 0, 0
+
+        stmt = select(SessionRecord.id, SessionRecord.last_activity, self._row_bytes()).where(
+            SessionRecord.active.is_(False)
+        )
+        if not over:
+            stmt = stmt.where(SessionRecord.last_activity < cutoff)
+        async with self.read_session_factory() as db:
+            rows = (await db.execute(stmt.order_by(SessionRecord.last_activity).limit(batch_size))).all()
+
+        doomed, reclaimed = [], 0
+        for session_id, last_activity, size in rows:
+            over = self.policy.max_bytes is not None and self._size - reclaimed > self.policy.max_bytes
+            if not over and not (cutoff is not None and last_activity is not None and last_activity < cutoff):
+                break
+            doomed.append(session_id)
+            reclaimed += size or 0
+        if not doomed:
+            return 0, 0
+
+        async with self.session_factory() as db:
+            async with db.begin():
+                await db.execute(delete(SessionRecord).where(SessionRecord.id.in_(doomed)))
+        self._size -= reclaimed
+        return len(doomed), reclaimed
+
+
+class TaskRetention:
+    """Deletes finished tasks from the tasks table, least recently updated first."""
+
+    name = "tasks"
+
+    def __init__(self, policy: RetentionPolicy, session_factory=AsyncSessionLocal,
+                 read_session_factory=AsyncReadSessionLocal):
+        self.policy = policy
+        self.session_factory = session_factory
+        self.read_session_factory = read_session_factory
+        self._size = 0
+
+    @staticmethod
+    def _row_bytes():
+        return (
+            func.length(TaskRecord.id) + func.length(TaskRecord.client_id) + func.length(TaskRecord.state)
+            + func.coalesce(func.length(TaskRecord.parent_id), 0)
+            + func.coalesce(func.length(TaskRecord.last_event), 0)
+        )
+
+    async def begin_pass(self):
+        self._size = 0
+        if self.policy.max_bytes:
+            async with self.read_session_factory() as db:
+                self._size = (await db.execute(select(func.coalesce(func.sum(self._row_bytes()), 0)))).scalar()
+
+    async def step(self, batch_size: int) -> Tuple[int, int]:
+        cutoff = self.policy.cutoff()
+        over = self.policy.max_bytes is not None and self._size > self.policy.max_bytes
+        if cutoff is None and not over:
+            return 0, 0
+
+        stmt = select(TaskRecord.id, TaskRecord.updated_at, self._row_bytes()).where(
+            TaskRecord.state.in_([state.value for state in TERMINAL_STATES])
+        )
+        if not over:
+            stmt = stmt.where(TaskRecord.updated_at < cutoff)
+        async with self.read_session_factory() as db:
+            rows = (await db.execute(stmt.order_by(TaskRecord.updated_at).limit(batch_size))).all()
+
+        doomed, reclaimed = [], 0
+        for task_id, updated_at, size in rows:
+            over = self.policy.max_bytes is not None and self._size - reclaimed > self.policy.max_bytes
+            if not over and not (cutoff is not None and updated_at is not None and updated_at < cutoff):
+                break
+            doomed.append(task_id)
+            reclaimed += size or 0
+        if not doomed:
+            return 0, 0
+
+        async with self.session_factory() as db:
+            async with db.begin():
+                await db.execute(delete(TaskRecord).where(TaskRecord.id.in_(doomed)))
+        self._size -= reclaimed
+        return len(doomed), reclaimed
+
+
+class TranscriptRetention:
+    """Drops whole transcript segments, oldest first."""
+
+    name = "transcripts"
+
+    def __init__(self, transcripts, policy: RetentionPolicy):
+        self.transcripts = transcripts
+        self.policy = policy
+        self._segments: List[Tuple[float, str, int, int, bool]] = []
+        self._size = 0
+
+    async def begin_pass(self):
+        loop = asyncio.get_running_loop()
+        self._segments = await loop.run_in_executor(None, self.transcripts.list_segments)
+        self._segments.reverse()  # pop() from the oldest end
+        self._size = sum(segment[3] for segment in self._segments)
+
+    async def step(self, batch_size: int) -> Tuple[int, int]:
+        cutoff = time.time() - self.policy.max_age if self.policy.max_age else None
+        removed = reclaimed = 0
+        while self._segments and removed < batch_size:
+            mtime, task_dir, base, size, active = self._segments.pop()
+            expired = cutoff is not None and mtime < cutoff
+            over = self.policy.max_bytes is not None and self._size > self.policy.max_bytes
+            if not expired and not over:
+                self._segments.clear()  # everything after this one is newer
+                break
+            # A task's live segment only goes once it has aged out
+            if active and not expired:
+                continue
+            freed = await self.transcripts.drop_segment(task_dir, base)
+            self._size -= freed
+            removed += 1 if freed else 0
+            reclaimed += freed
+        return removed, reclaimed
+
+
+class BlobRetention:
+    """Deletes spilled blob files, least recently used first."""
+
+    name = "blobs"
+
+    def __init__(self, blobs, policy: RetentionPolicy):
+        self.blobs = blobs
+        self.policy = policy
+        self._files: List[Tuple[float, str, int]] = []
+        self._size = 0
+
+    async def begin_pass(self):
+        loop = asyncio.get_running_loop()
+        self._files = await loop.run_in_executor(None, self.blobs.list_spilled)
+        self._files.sort(reverse=True)  # pop() from the oldest end
+        self._size = sum(size for _, _, size in self._files)
+
+    async def step(self, batch_size: int) -> Tuple[int, int]:
+        cutoff = time.time() - self.policy.max_age if self.policy.max_age else None
+        removed = reclaimed = 0
+        while self._files and removed < batch_size:
+            mtime, digest, _ = self._files[-1]
+            expired = cutoff is not None and mtime < cutoff
+            over = self.policy.max_bytes is not None and self._size > self.policy.max_bytes
+            if not expired and not over:
+                self._files.clear()  # everything after this one is newer
+                break
+            self._files.pop()
+            freed = await self.blobs.drop_spilled(digest)
+            self._size -= freed
+            removed += 1 if freed else 0
+            reclaimed += freed
+        return removed, reclaimed
+
+
+class Compactor:
+    """Enforces every store's budget a small batch at a time.
+
+    Each batch is its own short transaction, and after ``slice_seconds`` of
+    work the compactor sleeps for ``pause_seconds``. A pass therefore never
+    holds the event loop or SQLite's write lock for long, however much it
+    has to delete.
+    """
+
+    def __init__(
+        self,
+        stores: List[Any],
+        interval: float = 300.0,
+        batch_size: int = 500,
+        slice_seconds: float = 0.02,
+        pause_seconds: float = 0.05,
+    ):
+        self.stores = stores
+        self.interval = interval
+        self.batch_size = batch_size
+        self.slice_seconds = slice_seconds
+        self.pause_seconds = pause_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Retention pass failed: {e}")
+
+    async def run_once(self) -> Dict[str, int]:
+        """One full pass over every store; returns bytes reclaimed per store."""
+        reclaimed_by_store: Dict[str, int] = {}
+        for store in self.stores:
+            await store.begin_pass()
+            total = 0
+            slice_started = time.perf_counter()
+            while True:
+                removed, reclaimed = await store.step(self.batch_size)
+                total += reclaimed
+                if removed:
+                    metrics.inc(f"retention.{store.name}.removed", removed)
+                    metrics.inc(f"retention.{store.name}.reclaimed_bytes", reclaimed)
+                if not removed:
+                    break
+                elapsed = time.perf_counter() - slice_started
+                if elapsed >= self.slice_seconds:
+                    metrics.observe("retention.slice_ms", elapsed * 1000)
+                    await asyncio.sleep(self.pause_seconds)
+                    slice_started = time.perf_counter()
+                else:
+                    await asyncio.sleep(0)
+            reclaimed_by_store[store.name] = total
+        metrics.inc("retention.passes")
+        return reclaimed_by_store
@@ -0,0 +1,420 @@
+"""Append-only, segmented per-task log of every frame routed through the bridge."""
+
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_DIR = os.getenv("TRANSCRIPT_DIR", "./transcripts")
+
+# Each record: payload length, unix time, direction flag; then the JSON payload
+RECORD_HEADER = struct.Struct("<IdB")
+# Each index entry: byte position of a record inside its (uncompressed) segment
+INDEX_ENTRY = struct.Struct("<Q")
+
+_DIRECTIONS = ("in", "out")
+_SAFE_NAME_RE = re.compile(r"^[A-Za-z0-9_-][A-Za-z0-9_.-]{0,99}$")
+
+
+class _TaskLog:
+    """Segment bookkeeping for one task. Mutated only on the writer thread."""
+
+    __slots__ = ("path", "bases", "counts", "sealed", "active_size")
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.bases: List[int] = []  # first offset of each segment, ascending
+        self.counts: List[int] = []  # records per segment
+        self.sealed: List[bool] = []
+        self.active_size = 0
+
+    @property
+    def next_offset(self) -> int:
+        return self.bases[-1] + self.counts[-1] if self.bases else 0
+
+
+class TranscriptLog:
+    """Per-task append-only transcript split into segment files.
+
+    ``append`` only queues the frame in memory. A single writer thread
+    serialises batches into the task's active segment and records each
+    record's position in an ``.idx`` file next to it. A segment is sealed
+    once it passes ``segment_bytes`` and, if enabled, compressed with zlib.
+    Reads mmap the index and uncompressed segments, so fetching a range from
+    any offset costs a few seeks.
+    """
+
+    def __init__(
+        self,
+        root_dir: Optional[str] = None,
+        segment_bytes: int = 8 * 1024 * 1024,
+        flush_interval: float = 0.25,
+        batch_size: int = 1000,
+        max_pending: int = 100000,
+        compress: bool = True,
+    ):
+        self.root = Path(root_dir or TRANSCRIPT_DIR)
+        self.segment_bytes = segment_bytes
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.compress = compress
+        self._pending: List[Tuple[str, float, int, Dict[str, Any]]] = []
+        self._logs: Dict[str, _TaskLog] = {}  # keyed by directory name
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="transcripts")
+        self._inflated: "OrderedDict[Path, bytes]" = OrderedDict()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    # -- hot path -----------------------------------------------------------
+
+    def append(self, task_id: str, direction: str, frame: Dict[str, Any]):
+        """Queue one frame for the task's transcript. Never blocks or touches disk."""
+        if len(self._pending) >= self.max_pending:
+            metrics.inc("transcripts.dropped")
+            return
+        self._pending.append((task_id, time.time(), 1 if direction == "out" else 0, frame))
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    # -- background writer --------------------------------------------------
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background loop and write out whatever is still queued."""
+        self._stopping = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def shutdown(self):
+        self._writer.shutdown(wait=True)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write every queued frame; one writer-thread call per batch."""
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        loop = asyncio.get_running_loop()
+        try:
+            written = await loop.run_in_executor(self._writer, self._write_batch, batch)
+            metrics.inc("transcripts.appended", len(batch))
+            metrics.inc("transcripts.bytes_written", written)
+        except Exception as e:
+            logger.error(f"Failed to write {len(batch)} transcript records: {e}")
+            metrics.inc("transcripts.errors")
+
+    def _write_batch(self, batch: List[Tuple[str, float, int, Dict[str, Any]]]) -> int:
+        by_task: Dict[str, List[bytes]] = {}
+        for task_id, timestamp, direction, frame in batch:
+            payload = json.dumps(frame, separators=(",", ":"), default=str).encode()
+            by_task.setdefault(task_id, []).append(
+                RECORD_HEADER.pack(len(payload), timestamp, direction) + payload
+            )
+
+        written = 0
+        for task_id, records in by_task.items():
+            log = self._load(task_id)
+            i = 0
+            while i < len(records):
+                if not log.bases or log.sealed[-1]:
+                    self._new_segment(log)
+                base = log.bases[-1]
+                data, index = bytearray(), bytearray()
+                position = log.active_size
+                count = 0
+                # Fill the active segment up to its size limit
+                while i < len(records) and (count == 0 or position < self.segment_bytes):
+                    record = records[i]
+                    i += 1
+                    index += INDEX_ENTRY.pack(position)
+                    data += record
+                    position += len(record)
+                    count += 1
+
+                # Data first: an index entry never points past the end of the file
+                with open(self._segment_path(log, base), "ab") as f:
+                    f.write(data)
+                with open(self._index_path(log, base), "ab") as f:
+                    f.write(index)
+                written += len(data)
+
+                with self._lock:
+                    log.counts[-1] += count
+                    log.active_size = position
+                if position >= self.segment_bytes:
+                    self._seal(log)
+        return written
+
+    def _new_segment(self, log: _TaskLog):
+        log.path.mkdir(parents=True, exist_ok=True)
+        base = log.next_offset
+        with self._lock:
+            log.bases.append(base)
+            log.counts.append(0)
+            log.sealed.append(False)
+            log.active_size = 0
+
+    def _seal(self, log: _TaskLog):
+        base = log.bases[-1]
+        path = self._segment_path(log, base)
+        if self.compress:
+            compressed = path.with_name(path.name + ".z")
+            tmp = compressed.with_name(compressed.name + ".tmp")
+            tmp.write_bytes(zlib.compress(path.read_bytes(), 6))
+            os.replace(tmp, compressed)
+            path.unlink()
+        with self._lock:
+            log.sealed[-1] = True
+        metrics.inc("transcripts.segments_sealed")
+
+    # -- on-disk layout -----------------------------------------------------
+
+    def _task_dir(self, task_id: str) -> Path:
+        if _SAFE_NAME_RE.match(task_id):
+            return self.root / task_id
+        return self.root / hashlib.sha256(task_id.encode()).hexdigest()
+
+    @staticmethod
+    def _segment_path(log: _TaskLog, base: int) -> Path:
+        return log.path / f"{base:020d}.log"
+
+    @staticmethod
+    def _index_path(log: _TaskLog, base: int) -> Path:
+        return log.path / f"{base:020d}.idx"
+
+    def _load(self, task_id: str) -> _TaskLog:
+        """Return the task's bookkeeping, rebuilding it from disk on first use."""
+        path = self._task_dir(task_id)
+        with self._lock:
+            log = self._logs.get(path.name)
+            if log is not None:
+                return log
+            log = _TaskLog(path)
+            if log.path.is_dir():
+                bases = sorted(int(p.stem) for p in log.path.glob("*.idx"))
+                for base in bases:
+                    index_size = self._index_path(log, base).stat().st_size
+                    log.bases.append(base)
+                    log.counts.append(index_size // INDEX_ENTRY.size)
+                    log.sealed.append(not self._segment_path(log, base).exists())
+                if bases and not log.sealed[-1]:
+                    self._recover_active(log)
+                # Earlier segments left uncompressed by a crash count as sealed
+                for i in range(len(log.sealed) - 1):
+                    log.sealed[i] = True
+            self._logs[path.name] = log
+            return log
+
+    def _recover_active(self, log: _TaskLog):
+        """Trim a torn tail left by a crash mid-write."""
+        base = log.bases[-1]
+        index_path, segment_path = self._index_path(log, base), self._segment_path(log, base)
+        index = index_path.read_bytes()
+        index = index[:len(index) - len(index) % INDEX_ENTRY.size]
+        data_size = segment_path.stat().st_size
+
+        end = 0
+        count = len(index) // INDEX_ENTRY.size
+        with open(segment_path, "rb") as f:
+            while count:
+                position = INDEX_ENTRY.unpack_from(index, (count - 1) * INDEX_ENTRY.size)[0]
+                f.seek(position)
+                header = f.read(RECORD_HEADER.size)
+                if len(header) == RECORD_HEADER.size:
+                    end = position + RECORD_HEADER.size + RECORD_HEADER.unpack(header)[0]
+                    if end <= data_size:
+                        break
+                count -= 1
+                end = 0
+
+        index = index[:count * INDEX_ENTRY.size]
+        index_path.write_bytes(index)
+        with open(segment_path, "r+b") as f:
+            f.truncate(end)
+        log.counts[-1] = count
+        log.active_size = end
+
+    # -- reads --------------------------------------------------------------
+
+    def _segment_bytes(self, log: _TaskLog, base: int):
+        """The segment's raw bytes: an mmap if uncompressed, inflated otherwise."""
+        path = self._segment_path(log, base)
+        try:
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return b""
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            pass
+
+        compressed = path.with_name(path.name + ".z")
+        with self._lock:
+            data = self._inflated.get(compressed)
+            if data is not None:
+                self._inflated.move_to_end(compressed)
+                return data
+        data = zlib.decompress(compressed.read_bytes())
+        with self._lock:
+            self._inflated[compressed] = data
+            while len(self._inflated) > 4:
+                self._inflated.popitem(last=False)
+        return data
+
+    def _read_range(self, task_id: str, offset: int, limit: int) -> List[Dict[str, Any]]:
+        log = self._load(task_id)
+        with self._lock:
+            bases, counts = list(log.bases), list(log.counts)
+        if not bases:
+            return []
+
+        records = []
+        i = max(bisect.bisect_right(bases, offset) - 1, 0)
+        offset = max(offset, bases[0])
+        while i < len(bases) and len(records) < limit:
+            base, count = bases[i], counts[i]
+            first, last = offset - base, min(count, offset - base + limit - len(records))
+            if first < count:
+                try:
+                    with open(self._index_path(log, base), "rb") as f:
+                        index = f.read(count * INDEX_ENTRY.size)
+                    data = self._segment_bytes(log, base)
+                except FileNotFoundError:
+                    # Dropped by retention after the snapshot was taken
+                    offset = base + count
+                    i += 1
+                    continue
+                try:
+                    for n in range(first, last):
+                        position = INDEX_ENTRY.unpack_from(index, n * INDEX_ENTRY.size)[0]
+                        length, timestamp, direction = RECORD_HEADER.unpack_from(data, position)
+                        start = position + RECORD_HEADER.size
+                        records.append({
+                            "offset": base + n,
+                            "timestamp": timestamp,
+                            "direction": _DIRECTIONS[direction],
+                            "frame": json.loads(data[start:start + length]),
+                        })
+                finally:
+                    if isinstance(data, mmap.mmap):
+                        data.close()
+            offset = base + count
+            i += 1
+        return records
+
+    async def read(self, task_id: str, offset: int = 0, limit: int = 500) -> List[Dict[str, Any]]:
+        """Up to ``limit`` flushed records of a task, starting at ``offset``."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._read_range, task_id, offset, limit)
+
+    async def stream(self, task_id: str, offset: int = 0, batch: int = 500) -> AsyncIterator[Dict[str, Any]]:
+        """Yield every flushed record of a task from ``offset`` onwards."""
+        while True:
+            records = await self.read(task_id, offset, batch)
+            for record in records:
+                yield record
+            if len(records) < batch:
+                return
+            offset = records[-1]["offset"] + 1
+
+    def next_offset(self, task_id: str) -> int:
+        """Offset the task's next flushed record will get."""
+        log = self._load(task_id)
+        with self._lock:
+            return log.next_offset
+
+    # -- retention ----------------------------------------------------------
+
+    def list_segments(self) -> List[Tuple[float, str, int, int, bool]]:
+        """Every segment on disk as (mtime, task dir, base offset, bytes, active), oldest first."""
+        segments = []
+        if not self.root.is_dir():
+            return segments
+        for task_dir in self.root.iterdir():
+            if not task_dir.is_dir():
+                continue
+            bases = sorted(int(p.stem) for p in task_dir.glob("*.idx"))
+            mtime = 0.0
+            for base in bases:
+                # mtime never decreases along a task, so its head always sorts first
+                size = 0
+                for suffix in (".idx", ".log", ".log.z"):
+                    try:
+                        stat = (task_dir / f"{base:020d}{suffix}").stat()
+                    except FileNotFoundError:
+                        continue
+                    size += stat.st_size
+                    mtime = max(mtime, stat.st_mtime)
+                segments.append((mtime, task_dir.name, base, size, base == bases[-1]))
+        segments.sort()
+        return segments
+
+    def _drop_segment(self, task_dir: str, base: int) -> int:
+        """Delete a task's oldest segment; dropping the last one removes the task."""
+        path = self.root / task_dir
+        bases = sorted(int(p.stem) for p in path.glob("*.idx"))
+        if not bases or bases[0] != base:
+            return 0  # only the head can go, so offsets stay contiguous
+
+        freed = 0
+        for suffix in (".log", ".log.z", ".idx"):
+            segment = path / f"{base:020d}{suffix}"
+            try:
+                freed += segment.stat().st_size
+                segment.unlink()
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._inflated.pop(path / f"{base:020d}.log.z", None)
+            log = self._logs.get(task_dir)
+            if len(bases) == 1:
+                self._logs.pop(task_dir, None)
+            elif log is not None and log.bases and log.bases[0] == base:
+                del log.bases[0], log.counts[0], log.sealed[0]
+        if len(bases) == 1:
+            for leftover in path.iterdir():
+                leftover.unlink()
+            path.rmdir()
+        return freed
+
+    async def drop_segment(self, task_dir: str, base: int) -> int:
+        """Delete one segment on the writer thread, so it never races an append."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, self._drop_segment, task_dir, base)
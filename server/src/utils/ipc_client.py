@@ -1,10 +1,55 @@
 import asyncio
 import json
 import logging
-from typing import Optional, Dict, Any
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from utils.metrics import frame_received_at, metrics
 
 logger = logging.getLogger(__name__)
 
+class Priority(IntEnum):
+    """Outbound lanes; lower values are written first."""
+    CONTROL = 0  # small frames that must not wait: cancel, approvals, resume
+    BULK = 1     # tasks with images, configuration payloads, everything else
+
+class LaneScheduler:
+    """Grants exclusive use of the link, serving queued control frames before bulk ones."""
+    
+    def __init__(self):
+        self._busy = False
+        self._waiters: Dict[Priority, Deque[asyncio.Future]] = {lane: deque() for lane in Priority}
+        
+    def pending(self, priority: Priority) -> int:
+        return sum(1 for fut in self._waiters[priority] if not fut.done())
+        
+    async def acquire(self, priority: Priority):
+        if not self._busy:
+            self._busy = True
+            return
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(fut)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # The link was handed to us just as we were cancelled
+                self.release()
+            raise
+            
+    def release(self):
+        for lane in Priority:
+            waiters = self._waiters[lane]
+            while waiters:
+                fut = waiters.popleft()
+                if not fut.done():
+                    # Hand the link straight to the next waiter
+                    fut.set_result(None)
+                    return
+        self._busy = False
+
 class IPCClient:
     def __init__(self, host: str = "127.0.0.1", port: int = 9999):
         self.host = host
@@ -13,6 +58,17 @@ class IPCClient:
         self.writer: Optional[asyncio.StreamWriter] = None
         self.connected = False
         self.message_id = 0
+        self.scheduler = LaneScheduler()
+        # Servers that echo request ids (announced in their welcome) get pipelined requests;
+        # others get one outstanding request at a time, since their replies cannot be told apart
+        self.pipelined = False
+        # Replies owed to senders, by request id, in write order
+        self._replies: Deque[Tuple[str, asyncio.Future]] = deque()
+        self._reader_task: Optional[asyncio.Task] = None
+        # Frames that answer no request (events, pushes); delivered in order by one worker
+        self.on_unsolicited: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+        self._unsolicited: Optional["asyncio.Queue[Dict[str, Any]]"] = None
+        self._dispatch_task: Optional[asyncio.Task] = None
         
     async def connect(self):
         try:
@@ -22,6 +78,10 @@ class IPCClient:
             
             welcome = await self.read_message()
             logger.info(f"Server welcome: {welcome}")
+            self.pipelined = bool((welcome.get("data") or {}).get("echoesIds"))
+            self._unsolicited = asyncio.Queue()
+            self._reader_task = asyncio.create_task(self._read_replies())
+            self._dispatch_task = asyncio.create_task(self._dispatch_unsolicited())
             
         except Exception as e:
             logger.error(f"Failed to connect to IPC server: {e}")
@@ -29,29 +89,103 @@ class IPCClient:
             raise
     
     def disconnect(self):
+        for task in (self._reader_task, self._dispatch_task):
+            if task is not None:
+                task.cancel()
+        self._reader_task = self._dispatch_task = None
+        self._fail_replies(Exception("Disconnected from IPC server"))
         if self.writer:
             self.writer.close()
         self.connected = False
         logger.info("Disconnected from IPC server")
     
-    async def send_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
+    async def send_message(self, message: Dict[str, Any], priority: Priority = Priority.BULK) -> Dict[str, Any]:
         if not self.connected or not self.writer:
             raise Exception("Not connected to IPC server")
         
-        self.message_id += 1
-        message["id"] = str(self.message_id)
-        
+        queued_at = time.perf_counter()
+        reply = asyncio.get_running_loop().create_future()
+        await self.scheduler.acquire(priority)
+        holding = True
         try:
+            self.message_id += 1
+            message["id"] = str(self.message_id)
+            
             message_str = json.dumps(message) + "\n"
+            self._replies.append((message["id"], reply))
             self.writer.write(message_str.encode())
             await self.writer.drain()
             
-            response = await self.read_message()
-            return response
+            # Time from queueing to the frame being on the wire
+            sent_at = time.perf_counter()
+            metrics.observe(f"ipc.send_latency.{priority.name.lower()}", sent_at - queued_at)
+            if message.get("type") == "cancelTask":
+                # From the WebSocket frame's arrival when there is one
+                metrics.observe("ipc.cancel_latency", sent_at - (frame_received_at.get() or queued_at))
             
+            if self.pipelined:
+                # Replies are matched by id, so the link is free while this one is pending
+                self.scheduler.release()
+                holding = False
+            return await reply
         except Exception as e:
             logger.error(f"Failed to send message: {e}")
+            if (message.get("id"), reply) in self._replies:
+                self._replies.remove((message["id"], reply))
+            raise
+        finally:
+            if holding:
+                self.scheduler.release()
+    
+    def _take_reply(self, response: Dict[str, Any]) -> Optional[asyncio.Future]:
+        """The pending request ``response`` answers, or None if it answers none."""
+        reply_id = response.get("id")
+        if reply_id is not None:
+            for i, (message_id, future) in enumerate(self._replies):
+                if message_id == reply_id:
+                    del self._replies[i]
+                    return future
+            return None
+        if self.pipelined or response.get("type") == "event" or not self._replies:
+            return None
+        # One request at a time without ids: the next non-event frame is its reply
+        return self._replies.popleft()[1]
+    
+    async def _read_replies(self):
+        """Hand each incoming frame to the request it answers, or to ``on_unsolicited``."""
+        try:
+            while True:
+                try:
+                    response = await self.read_message()
+                except json.JSONDecodeError:
+                    continue
+                future = self._take_reply(response)
+                if future is None:
+                    self._unsolicited.put_nowait(response)
+                elif not future.done():
+                    future.set_result(response)
+        except asyncio.CancelledError:
             raise
+        except Exception as e:
+            self.connected = False
+            self._fail_replies(e)
+    
+    async def _dispatch_unsolicited(self):
+        while True:
+            message = await self._unsolicited.get()
+            if self.on_unsolicited is None:
+                logger.debug(f"Unsolicited IPC message with no handler: {message.get('type')}")
+                continue
+            try:
+                await self.on_unsolicited(message)
+            except Exception as e:
+                logger.error(f"Error handling IPC {message.get('type')} message: {e}")
+    
+    def _fail_replies(self, error: Exception):
+        while self._replies:
+            _, future = self._replies.popleft()
+            if not future.done():
+                future.set_exception(error)
     
     async def read_message(self) -> Dict[str, Any]:
         if not self.reader:
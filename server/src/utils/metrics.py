@@ -0,0 +1,73 @@
+"""In-process metrics registry exposed on /metrics."""
+
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Optional
+
+# perf_counter() when the WebSocket frame being handled was received, for end-to-end latencies
+frame_received_at: ContextVar[Optional[float]] = ContextVar("frame_received_at", default=None)
+
+
+class Timing:
+    """Count, sum and max of observed values, plus a window for percentiles."""
+
+    def __init__(self, window: int = 1024):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent: Deque[float] = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        self.recent.append(value)
+
+    def percentile(self, pct: float) -> float:
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+        return ordered[index]
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "avg": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+        }
+
+
+class Metrics:
+    """Counters, gauges and timings keyed by dotted names."""
+
+    def __init__(self):
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.gauges: Dict[str, Callable[[], Any]] = {}
+        self.timings: Dict[str, Timing] = {}
+
+    def inc(self, name: str, value: int = 1):
+        self.counters[name] += value
+
+    def observe(self, name: str, value: float):
+        timing = self.timings.get(name)
+        if timing is None:
+            timing = self.timings[name] = Timing()
+        timing.observe(value)
+
+    def gauge(self, name: str, func: Callable[[], Any]):
+        """Register a callable read at snapshot time."""
+        self.gauges[name] = func
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "counters": dict(self.counters),
+            "gauges": {name: func() for name, func in self.gauges.items()},
+            "timings": {name: timing.snapshot() for name, timing in self.timings.items()},
+        }
+
+
+metrics = Metrics()
@@ -0,0 +1,106 @@
+"""In-process token-bucket rate limiting for WebSocket frames and REST calls."""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Cheap frames that steer work already running; generous budget
+CONTROL = "control"
+# Frames that start work in the VS Code extension; tight budget
+TASK = "task"
+# Payload-heavy or configuration frames
+BULK = "bulk"
+
+CONTROL_TYPES = {
+    "ping", "refreshToken", "cancelTask", "askResponse", "resumeTask",
+    "subscribeTask", "unsubscribeTask", "grantApprover", "revokeApprover", "setStreamOptions", "resync"
+}
+TASK_TYPES = {"newTask", "task.start", "message.send", "tool.execute"}
+
+# (tokens per second, burst) per message class
+DEFAULT_BUDGETS = {
+    CONTROL: (20.0, 60),
+    TASK: (0.5, 5),
+    BULK: (2.0, 10),
+}
+
+
+def classify_message(message_type: Optional[str]) -> str:
+    if message_type in CONTROL_TYPES:
+        return CONTROL
+    if message_type in TASK_TYPES:
+        return TASK
+    return BULK
+
+
+def classify_request(method: str, path: str) -> str:
+    if method in ("GET", "HEAD", "OPTIONS"):
+        return CONTROL
+    if method == "POST" and path.rstrip("/") == "/api/tasks":
+        return TASK
+    return BULK
+
+
+class RateLimiter:
+    """Token buckets keyed by ``(class, key)``, refilled lazily on access.
+
+    A check is a dict lookup and a little arithmetic. Buckets are kept in a
+    bounded LRU; an evicted bucket comes back full, which only errs towards
+    letting a long-idle key through.
+    """
+
+    def __init__(self, budgets: Optional[Dict[str, Tuple[float, int]]] = None, max_buckets: int = 100000):
+        self.budgets = dict(DEFAULT_BUDGETS if budgets is None else budgets)
+        self.max_buckets = max_buckets
+        self._buckets: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()  # -> [tokens, updated]
+        self.throttled = 0
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        """Read ``RATE_LIMIT_<CLASS>_PER_SEC`` / ``_BURST``; a rate of 0 disables that class."""
+        budgets = {}
+        for name, (rate, burst) in DEFAULT_BUDGETS.items():
+            rate = float(os.getenv(f"RATE_LIMIT_{name.upper()}_PER_SEC", str(rate)))
+            burst = int(os.getenv(f"RATE_LIMIT_{name.upper()}_BURST", str(burst)))
+            if rate > 0:
+                budgets[name] = (rate, burst)
+        return cls(budgets)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _bucket(self, klass: str, key: str, now: float) -> List[float]:
+        rate, burst = self.budgets[klass]
+        bucket = self._buckets.get((klass, key))
+        if bucket is None:
+            bucket = self._buckets[(klass, key)] = [float(burst), now]
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            bucket[0] = min(float(burst), bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            self._buckets.move_to_end((klass, key))
+        return bucket
+
+    def acquire(self, klass: str, keys: Iterable[Optional[str]], cost: float = 1.0) -> float:
+        """Take ``cost`` tokens from every key's bucket, or none of them.
+
+        Returns 0 when allowed, otherwise the seconds until all buckets could
+        pay. A class with no budget is never limited.
+        """
+        if klass not in self.budgets:
+            return 0.0
+        rate = self.budgets[klass][0]
+        now = time.monotonic()
+        buckets = [self._bucket(klass, key, now) for key in keys if key]
+        retry_after = 0.0
+        for bucket in buckets:
+            if bucket[0] < cost:
+                retry_after = max(retry_after, (cost - bucket[0]) / rate)
+        if retry_after:
+            self.throttled += 1
+            return retry_after
+        for bucket in buckets:
+            bucket[0] -= cost
+        return 0.0
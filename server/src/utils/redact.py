@@ -0,0 +1,32 @@
+"""Strip credentials from frames before they are persisted or served back."""
+
+import re
+from typing import Any
+
+REDACTED = "[redacted]"
+
+# apiKey, api_key, openAiApiKey, awsSecretKey, awsAccessKey, awsSessionToken, password, ...
+# but not maxTokens or tokenEstimate
+_SECRET_FIELD = re.compile(
+    r"^(?:token|.*(?:api_?key|secret(?:_?key)?|access_?key|password|(?:access|auth|session|refresh|bearer)_?token))$",
+    re.IGNORECASE,
+)
+
+
+def is_secret_field(name: Any) -> bool:
+    return isinstance(name, str) and bool(_SECRET_FIELD.match(name))
+
+
+def redact(value: Any) -> Any:
+    """Copy of ``value`` with every credential field's value replaced by ``REDACTED``.
+
+    Only dicts and lists are copied; strings and other leaves are shared.
+    """
+    if isinstance(value, dict):
+        return {
+            key: (REDACTED if item and is_secret_field(key) else redact(item))
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
@@ -0,0 +1,105 @@
+"""Dependency-free prompt token estimates for catching over-context tasks early."""
+
+import os
+from typing import Any, Dict, Mapping, Optional
+
+# Characters per token of English/code text and a flat cost per attached image,
+# by provider family; a provider's catalog entry may override either value
+FAMILY_CALIBRATION: Dict[str, Dict[str, float]] = {
+    "anthropic": {"chars_per_token": 3.5, "image_tokens": 1600},
+    "openai": {"chars_per_token": 4.0, "image_tokens": 765},
+    "azure": {"chars_per_token": 4.0, "image_tokens": 765},
+    "gemini": {"chars_per_token": 4.0, "image_tokens": 258},
+    "ollama": {"chars_per_token": 3.6, "image_tokens": 576},
+}
+DEFAULT_CALIBRATION = {"chars_per_token": 3.5, "image_tokens": 1000}
+
+# Estimates above budget * REJECT_RATIO are refused, above budget * WARN_RATIO flagged
+TOKEN_REJECT_RATIO = float(os.getenv("TOKEN_REJECT_RATIO", "1.1"))
+TOKEN_WARN_RATIO = float(os.getenv("TOKEN_WARN_RATIO", "0.8"))
+# Longer non-ASCII texts are measured on a sample instead of in full
+SAMPLE_THRESHOLD = 16384
+
+
+def calibration(provider: Optional[str], info: Optional[Mapping[str, Any]] = None) -> Dict[str, float]:
+    values = dict(FAMILY_CALIBRATION.get(provider or "", DEFAULT_CALIBRATION))
+    if info:
+        for key in ("chars_per_token", "image_tokens"):
+            if key in info:
+                values[key] = info[key]
+    return values
+
+
+def _sample(text: str, windows: int = 32, width: int = 512) -> str:
+    step = len(text) // windows
+    return "".join(text[i:i + width] for i in range(0, len(text), step))
+
+
+def estimate_text_tokens(text: Optional[str], chars_per_token: float) -> int:
+    """Approximate token count of ``text`` without a Python-level loop over it.
+
+    ASCII runs at ``chars_per_token``; non-ASCII characters (CJK, emoji,
+    accented text) are counted as about one token each, since tokenizers
+    rarely merge them. Their share is inferred from the UTF-8 overhead of
+    the text, or of evenly spaced windows of it once it is long, which
+    keeps a 200 KB prompt well under a millisecond.
+    """
+    if not text:
+        return 0
+    length = len(text)
+    if text.isascii():
+        return int(length / chars_per_token) + 1
+    sample = _sample(text) if length > SAMPLE_THRESHOLD else text
+    extra_bytes = len(sample.encode("utf-8", "surrogatepass")) - len(sample)
+    # 2-4 UTF-8 bytes per such character
+    non_ascii = min(length, int((extra_bytes + 1) / 2 * length / len(sample)))
+    return int((length - non_ascii) / chars_per_token) + non_ascii + 1
+
+
+class TokenEstimate:
+    """Estimated prompt size of one task against its configured context."""
+
+    __slots__ = ("tokens", "budget", "context_length", "max_tokens")
+
+    def __init__(self, tokens: int, context_length: int, max_tokens: int = 0):
+        self.tokens = tokens
+        self.context_length = context_length
+        self.max_tokens = max_tokens
+        # Room for the prompt once the reply's max_tokens is set aside
+        self.budget = max(0, context_length - max_tokens)
+
+    @property
+    def over(self) -> bool:
+        return self.tokens > self.budget * TOKEN_REJECT_RATIO
+
+    @property
+    def warning(self) -> bool:
+        return self.tokens > self.budget * TOKEN_WARN_RATIO
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "tokens": self.tokens,
+            "budget": self.budget,
+            "contextLength": self.context_length,
+            "maxTokens": self.max_tokens,
+            "warning": self.warning,
+        }
+
+
+def estimate_task(
+    prompt: Optional[str],
+    image_count: int,
+    custom_instructions: Optional[str],
+    provider: Optional[str],
+    context_length: int,
+    max_tokens: Optional[int] = None,
+    info: Optional[Mapping[str, Any]] = None
+) -> TokenEstimate:
+    values = calibration(provider, info)
+    chars_per_token = values["chars_per_token"]
+    tokens = (
+        estimate_text_tokens(prompt, chars_per_token)
+        + estimate_text_tokens(custom_instructions, chars_per_token)
+        + int(image_count * values["image_tokens"])
+    )
+    return TokenEstimate(tokens, context_length, max_tokens or 0)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test API-key authentication for machine clients
+"""
+
+import asyncio
+import json
+import sys
+import time
+
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.testclient import TestClient
+
+sys.path.append('src')
+import main
+from api.auth import ApiKeyStore, api_keys, get_current_user, pwd_context, require_scope
+
+
+def credentials(token):
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+def test_key_is_stored_only_as_digest():
+    store = ApiKeyStore(secret="test-secret")
+    key = store.issue("ci-bot", ["tasks"])
+    api_key = store.lookup(key)
+    assert api_key.name == "ci-bot" and api_key.subject == "apikey:ci-bot"
+    assert api_key.digest == store.digest(key) and key not in api_key.digest
+    assert store.lookup(key + "x") is None
+    assert ApiKeyStore(secret="other-secret").lookup(key) is None
+
+
+def test_verification_is_much_cheaper_than_bcrypt():
+    store = ApiKeyStore()
+    key = store.issue("bench")
+    started = time.perf_counter()
+    for _ in range(1000):
+        assert store.verify(key) is not None
+    per_key_us = (time.perf_counter() - started) / 1000 * 1e6
+
+    hashed = pwd_context.hash("password")
+    started = time.perf_counter()
+    pwd_context.verify("password", hashed)
+    bcrypt_us = (time.perf_counter() - started) * 1e6
+
+    print(f"   api key: {per_key_us:.1f} µs/verify, bcrypt: {bcrypt_us:.0f} µs/verify")
+    assert store.usage() == {"bench": 1000}
+    assert per_key_us * 100 < bcrypt_us
+
+
+def test_revoke_and_reload(tmp_path):
+    store = ApiKeyStore(secret="s")
+    key = store.issue("deploy", ["tasks", "config"])
+    path = tmp_path / "keys.json"
+    path.write_text(json.dumps({"deploy": {"digest": store.digest(key), "scopes": ["tasks"]}}))
+    store.revoke("deploy")
+    assert store.lookup(key) is None
+
+    reloaded = ApiKeyStore(secret="s")
+    reloaded.load(str(path))
+    assert reloaded.lookup(key).scopes == {"tasks"}
+
+
+def test_get_current_user_accepts_api_keys():
+    key = api_keys.issue("nightly", ["messages"])
+    assert asyncio.run(get_current_user(credentials(key))) == "apikey:nightly"
+    assert api_keys.usage()["nightly"] == 1
+    try:
+        asyncio.run(get_current_user(credentials("rcb_not-a-key")))
+        assert False, "unknown key accepted"
+    except HTTPException as e:
+        assert e.status_code == 401
+
+    check = require_scope("messages")
+    asyncio.run(check(credentials(key)))
+    try:
+        asyncio.run(require_scope("tools")(credentials(key)))
+        assert False, "missing scope accepted"
+    except HTTPException as e:
+        assert e.status_code == 403
+    api_keys.revoke("nightly")
+
+
+def test_scopes_gate_routers():
+    key = api_keys.issue("reader", ["sessions"])
+    client = TestClient(main.app)
+    headers = {"Authorization": f"Bearer {key}"}
+    assert client.get("/sessions", headers=headers).status_code == 200
+    assert client.get("/api/config/providers", headers=headers).status_code == 403
+    api_keys.revoke("reader")
+    assert client.get("/sessions", headers=headers).status_code == 401
+
+
+if __name__ == "__main__":
+    import pathlib
+    import tempfile
+
+    test_key_is_stored_only_as_digest()
+    test_verification_is_much_cheaper_than_bcrypt()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_revoke_and_reload(pathlib.Path(tmp))
+    test_get_current_user_accepts_api_keys()
+    test_scopes_gate_routers()
+    print("✅ API key tests passed")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Test the content-addressed blob store and blobRef messages without a running server
+"""
+
+import asyncio
+import base64
+import io
+import sys
+import tempfile
+from pathlib import Path
+
+from PIL import Image
+
+sys.path.append('src')
+from storage.blob_store import BlobStore
+from storage.retention import BlobRetention, Compactor, RetentionPolicy
+from messages.router import MessageRouter
+from messages.types import WebviewMessage
+from config.provider_manager import ProviderManager
+
+
+def test_put_is_idempotent_and_spills_to_disk():
+    """Blobs are keyed by hash and evicted to disk, not lost"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BlobStore(memory_limit=1000, spill_dir=tmp)
+
+        async def run():
+            first = await store.put(b"a" * 600)
+            again = await store.put(b"a" * 600)
+            second = await store.put(b"b" * 600)
+            assert first == again
+            assert store.stats()["memory_blobs"] == 1
+            assert await store.has(first)
+            assert await store.get(first) == b"a" * 600
+            assert await store.get("../../etc/passwd") is None
+            return second
+
+        second = asyncio.run(run())
+        assert second == BlobStore.digest(b"b" * 600)
+
+
+def test_spilled_blobs_are_evicted_to_the_disk_budget():
+    """Retention deletes the least recently used spill files and forgets their mime types"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BlobStore(memory_limit=1000, spill_dir=tmp)
+
+        async def run():
+            digests = []
+            for i in range(6):
+                digests.append(await store.put(bytes([i]) * 600, "image/png"))
+                await asyncio.sleep(0.01)  # distinct mtimes
+            retention = BlobRetention(store, RetentionPolicy(max_bytes=2000))
+            reclaimed = await Compactor([retention], batch_size=2).run_once()
+            return digests, reclaimed
+
+        digests, reclaimed = asyncio.run(run())
+        spilled = [digest for _, digest, _ in store.list_spilled()]
+
+    # Five spilled, the newest never left memory; two go to get under 2000 bytes
+    assert reclaimed["blobs"] == 1200
+    assert sorted(spilled) == sorted(digests[2:5])
+    assert digests[0] not in store.mime_types and digests[4] in store.mime_types
+    assert asyncio.run(store.get(digests[0])) is None
+
+
+def test_oversized_put_blob_is_refused_before_decoding():
+    router = MessageRouter(ProviderManager())
+    router.blob_store.max_blob_size = 1000
+    encoded = base64.b64encode(b"x" * 2000).decode()
+
+    result = asyncio.run(router.route_from_web("client-1", WebviewMessage(
+        type="putBlob", data={"data": encoded})))
+    fits = asyncio.run(router.route_from_web("client-1", WebviewMessage(
+        type="putBlob", data={"data": base64.b64encode(b"x" * 1000).decode()})))
+    router.image_handler.shutdown()
+
+    assert "error" in result
+    assert fits["size"] == 1000
+
+
+class RecordingIPC:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, message, priority=None):
+        self.sent.append(message)
+        return {"type": "ack"}
+
+
+def test_new_task_with_blob_refs():
+    """newTask can reference a previously uploaded prompt and image by hash"""
+    with tempfile.TemporaryDirectory() as tmp:
+        router = MessageRouter(ProviderManager())
+        router.blob_store.spill_dir = Path(tmp)
+        ipc = RecordingIPC()
+        router.register_ipc_client("client-1", ipc)
+
+        buffer = io.BytesIO()
+        Image.new("RGB", (16, 16)).save(buffer, format="PNG")
+        image_b64 = base64.b64encode(buffer.getvalue()).decode()
+
+        async def run():
+            prompt = await router.route_from_web("client-1", WebviewMessage(
+                type="putBlob", data={"text": "Refactor this module " * 1000}))
+            image = await router.route_from_web("client-1", WebviewMessage(
+                type="putBlob", data={"data": image_b64, "mime_type": "image/png"}))
+            await router.route_from_web("client-1", WebviewMessage(
+                type="newTask",
+                data={"prompt": {"blobRef": prompt["hash"]}},
+                images=[{"type": "blobRef", "data": image["hash"], "mime_type": "image/png"}],
+            ))
+
+        asyncio.run(run())
+        router.image_handler.shutdown()
+
+    task = ipc.sent[-1]
+    assert task["prompt"].startswith("Refactor this module")
+    assert len(task["images"]) == 1
+    assert base64.b64decode(task["images"][0]["data"]) == buffer.getvalue()
+
+
+if __name__ == "__main__":
+    test_put_is_idempotent_and_spills_to_disk()
+    test_spilled_blobs_are_evicted_to_the_disk_budget()
+    test_oversized_put_blob_is_refused_before_decoding()
+    test_new_task_with_blob_refs()
+    print("✅ Blob store tests passed")
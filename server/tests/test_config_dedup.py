@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test that provider configuration is only sent to Roo-Code when it changes
+"""
+
+import asyncio
+import sys
+
+sys.path.append('src')
+from messages.router import MessageRouter
+from messages.types import WebviewMessage
+from config.provider_manager import ProviderManager, config_fingerprint
+
+
+class FakeIPC:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, message, priority=None):
+        self.sent.append(message)
+        return {"type": "ack"}
+
+
+def test_fingerprint_is_canonical():
+    assert config_fingerprint({"a": 1, "b": 2}) == config_fingerprint({"b": 2, "a": 1})
+    assert config_fingerprint({"a": 1}) != config_fingerprint({"a": 2})
+
+
+def test_unchanged_config_is_not_rebuilt():
+    manager = ProviderManager(reload_interval=0)
+    config = {"provider": "anthropic", "model": "claude-3-opus", "prompt": "ignored"}
+    first = asyncio.run(manager.set_provider("c1", dict(config)))
+    assert asyncio.run(manager.set_provider("c1", dict(config, prompt="other"))) is first
+    changed = asyncio.run(manager.set_provider("c1", dict(config, temperature=0.1)))
+    assert changed is not first and changed["data"]["temperature"] == 0.1
+    assert "max_tokens" not in config  # the caller's dict is left alone
+
+
+def test_save_api_configuration_skips_repeat_writes():
+    router = MessageRouter(ProviderManager(reload_interval=0))
+    ipc = FakeIPC()
+    router.register_ipc_client("c1", ipc)
+    data = {"provider": "openai", "model": "gpt-4"}
+
+    async def run():
+        first = await router.route_from_web("c1", WebviewMessage(type="saveApiConfiguration", data=dict(data)))
+        second = await router.route_from_web("c1", WebviewMessage(type="saveApiConfiguration", data=dict(data)))
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert "unchanged" not in first and second["unchanged"] is True
+    assert len(ipc.sent) == 1
+
+    # A new backend connection has not seen the config yet
+    router.register_ipc_client("c1", FakeIPC())
+    asyncio.run(router.route_from_web("c1", WebviewMessage(type="saveApiConfiguration", data=dict(data))))
+    assert len(router.ipc_clients["c1"].sent) == 1
+
+
+def test_new_task_carries_config_only_when_changed():
+    router = MessageRouter(ProviderManager(reload_interval=0))
+    ipc = FakeIPC()
+    router.register_ipc_client("c1", ipc)
+
+    async def run():
+        for prompt, model in (("one", "gpt-4"), ("two", "gpt-4"), ("three", "gpt-4-turbo")):
+            await router.route_from_web("c1", WebviewMessage(
+                type="newTask", data={"prompt": prompt, "provider": "openai", "model": model}))
+
+    asyncio.run(run())
+    configurations = [m["configuration"] for m in ipc.sent if m["type"] == "newTask"]
+    assert configurations[0]["apiModelId"] == "gpt-4"
+    assert configurations[1] == {}
+    assert configurations[2]["apiModelId"] == "gpt-4-turbo"
+
+
+if __name__ == "__main__":
+    test_fingerprint_is_canonical()
+    test_unchanged_config_is_not_rebuilt()
+    test_save_api_configuration_skips_repeat_writes()
+    test_new_task_carries_config_only_when_changed()
+    print("✅ Config dedup tests passed")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test the slotted session and per-connection records
+"""
+
+import asyncio
+import sys
+import tracemalloc
+from datetime import datetime
+
+sys.path.append('src')
+from main import ConnectionManager
+from models.session import Session, SessionInfo, SessionManager
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_json(self, message):
+        self.sent.append(message)
+
+    async def send_text(self, text):
+        self.sent.append(text)
+
+
+def test_session_is_slotted_and_converts_at_the_boundary():
+    now = datetime.utcnow()
+    session = Session(id="s1", client_id="client-1", created_at=now, last_activity=now)
+    assert not hasattr(session, "__dict__")
+    assert session.context is None
+
+    info = session.to_model()
+    assert isinstance(info, SessionInfo)
+    assert info.context == {}
+    assert info.dict()["client_id"] == "client-1"
+
+
+def test_one_record_per_connection():
+    async def run():
+        manager = ConnectionManager()
+        websocket = FakeWebSocket()
+        await manager.connect(websocket, "client-1", observer=True)
+        connection = manager.connections["client-1"]
+        await manager.send_message("client-1", {"type": "pong"})
+        await manager.send_personal_message("hello", "client-1")
+        await manager.handle_message("client-1", {"type": "task.start", "data": {}})
+        session_id = connection.session.id
+        manager.disconnect("client-1")
+        return manager, connection, websocket, session_id
+
+    manager, connection, websocket, session_id = asyncio.run(run())
+    assert connection.observer and connection.adapter is None
+    assert connection.messages_out == 3
+    assert websocket.sent[-1]["type"] == "error"
+    assert manager.connections == {}
+    assert not asyncio.run(SessionManager.get_session(session_id)).active
+
+
+def test_bytes_per_session():
+    count = 10000
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    now = datetime.utcnow()
+    sessions = [
+        Session(id=f"{i:036d}", client_id=f"client-{i}", created_at=now, last_activity=now)
+        for i in range(count)
+    ]
+    per_session = (tracemalloc.get_traced_memory()[0] - before) / count
+    tracemalloc.stop()
+    print(f"   {per_session:.0f} bytes/session")
+    assert len(sessions) == count
+    assert per_session < 400
+
+
+if __name__ == "__main__":
+    test_session_is_slotted_and_converts_at_the_boundary()
+    test_one_record_per_connection()
+    test_bytes_per_session()
+    print("✅ Connection record tests passed")
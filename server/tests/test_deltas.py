@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test delta encoding of streamed partial status updates without a running server
+"""
+
+import asyncio
+import json
+import sys
+
+sys.path.append('src')
+from messages.router import MessageRouter
+from messages.types import WebviewMessage
+from messages.deltas import make_delta
+from config.provider_manager import ProviderManager
+
+
+class RecordingWebSockets:
+    def __init__(self):
+        self.sent = {}
+
+    async def send_personal_message(self, message: str, client_id: str):
+        self.sent.setdefault(client_id, []).append(json.loads(message))
+
+
+def apply(text, frame):
+    """Apply a delta the way a browser does, indexing UTF-16 code units."""
+    units = text.encode("utf-16-le")
+    if frame["op"] == "append":
+        assert frame["offset"] * 2 == len(units)
+        return text + frame["text"]
+    patched = units[:frame["start"] * 2] + frame["text"].encode("utf-16-le") + units[frame["end"] * 2:]
+    return patched.decode("utf-16-le")
+
+
+def test_make_delta():
+    assert make_delta("Hello", "Hello world") == {"op": "append", "offset": 5, "text": " world"}
+    patch = make_delta("The quick brown fox jumps", "The quick red fox jumps")
+    assert patch["op"] == "patch"
+    assert apply("The quick brown fox jumps", patch) == "The quick red fox jumps"
+    assert make_delta("abc", "xyz") is None
+
+
+def test_offsets_count_utf16_code_units():
+    assert make_delta("😀 hi", "😀 hi there") == {"op": "append", "offset": 5, "text": " there"}
+    before, after = "😀 the quick brown 🦊 jumps over it", "😀 the quick red 🦊 jumps over it"
+    patch = make_delta(before, after)
+    assert (patch["start"], patch["end"]) == (13, 18)
+    assert apply(before, patch) == after
+
+
+def test_partial_stream_sends_deltas_to_negotiated_clients_only():
+    router = MessageRouter(ProviderManager())
+    web = RecordingWebSockets()
+    router.set_websocket_manager(web)
+
+    chunks = ["Let me", "Let me look", "Let me look at the code", "Let me look at the code."]
+
+    async def run():
+        await router.route_from_roocode("owner", {"type": "event", "data": {"event": "taskStarted", "data": {"taskId": "t-1"}}})
+        await router.route_from_web("owner", WebviewMessage(type="setStreamOptions", data={"deltas": True}))
+        await router.route_from_web("owner", WebviewMessage(type="grantApprover", data={"taskId": "t-1", "clientId": "legacy"}))
+        await router.route_from_web("legacy", WebviewMessage(type="subscribeTask", data={"taskId": "t-1"}))
+        for i, text in enumerate(chunks):
+            await router.route_from_roocode("owner", {"type": "say", "data": {
+                "say_type": "text", "ts": 1000, "text": text, "partial": i < len(chunks) - 1}})
+
+    asyncio.run(run())
+
+    owner_frames = [f for f in web.sent["owner"] if f["type"] in ("status_update", "status_delta")]
+    assert owner_frames[0]["type"] == "status_update"
+    assert all(f["type"] == "status_delta" for f in owner_frames[1:])
+    text = owner_frames[0]["data"]["text"]
+    for frame in owner_frames[1:]:
+        text = apply(text, frame)
+    assert text == chunks[-1]
+    assert owner_frames[-1]["partial"] is False
+
+    legacy_frames = [f for f in web.sent["legacy"] if f["type"] == "status_update"]
+    assert [f["data"]["text"] for f in legacy_frames] == chunks
+
+
+def test_resync_sends_full_snapshot():
+    router = MessageRouter(ProviderManager())
+    web = RecordingWebSockets()
+    router.set_websocket_manager(web)
+
+    async def run():
+        await router.route_from_web("owner", WebviewMessage(type="setStreamOptions", data={"deltas": True}))
+        await router.route_from_roocode("owner", {"type": "say", "data": {"say_type": "text", "ts": 1, "text": "a", "partial": True}})
+        await router.route_from_web("owner", WebviewMessage(type="resync"))
+        await router.route_from_roocode("owner", {"type": "say", "data": {"say_type": "text", "ts": 1, "text": "ab", "partial": True}})
+
+    asyncio.run(run())
+
+    assert [f["type"] for f in web.sent["owner"]] == ["status_update", "status_update"]
+
+
+if __name__ == "__main__":
+    test_make_delta()
+    test_offsets_count_utf16_code_units()
+    test_partial_stream_sends_deltas_to_negotiated_clients_only()
+    test_resync_sends_full_snapshot()
+    print("✅ Delta encoding tests passed")
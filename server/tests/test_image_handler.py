@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Test the image ingestion pipeline without requiring the server or VS Code extension
+"""
+
+import asyncio
+import base64
+import io
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from PIL import Image
+
+sys.path.append('src')
+from images import handler as image_handler
+from images.handler import ImageHandler
+from messages.types import ImageData
+
+
+def make_png(width: int, height: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 40, 40)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_small_base64_passes_through():
+    """Images already within limits are forwarded untouched"""
+    handler = ImageHandler()
+    data = "data:image/png;base64," + base64.b64encode(make_png(8, 8)).decode()
+    image = ImageData(type="base64", data=data, mime_type="image/png", name="tiny.png")
+
+    result = asyncio.run(handler.process(image))
+
+    assert result["data"] == data
+    assert (result["width"], result["height"]) == (8, 8)
+    assert result["name"] == "tiny.png"
+    handler.shutdown()
+
+
+def test_large_path_is_downscaled():
+    """Oversized screenshots are shrunk to the provider's max dimension"""
+    handler = ImageHandler()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "screenshot.png"
+        path.write_bytes(make_png(4000, 1000))
+        image = ImageData(type="path", data=str(path), mime_type="image/png")
+
+        result = asyncio.run(handler.process(image, {"max_image_dimension": 1000}))
+
+    assert (result["width"], result["height"]) == (1000, 250)
+    decoded = Image.open(io.BytesIO(base64.b64decode(result["data"])))
+    assert decoded.size == (1000, 250)
+    handler.shutdown()
+
+
+def test_file_url_and_cache_hit():
+    """file:// URLs load from disk and re-sent images hit the content-hash cache"""
+    handler = ImageHandler()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "diagram.png"
+        path.write_bytes(make_png(64, 64))
+        by_url = ImageData(type="url", data=path.as_uri(), mime_type="image/png")
+        by_path = ImageData(type="path", data=str(path), mime_type="image/png")
+
+        async def run():
+            first = await handler.process(by_url)
+            second = await handler.process(by_path)
+            return first, second
+
+        first, second = asyncio.run(run())
+
+    assert first["hash"] == second["hash"]
+    assert handler.cache_hits == 1
+    assert handler.cache_misses == 1
+    handler.shutdown()
+
+
+def test_byte_budget_is_enforced():
+    """Images over the byte limit are re-encoded until they fit"""
+    handler = ImageHandler()
+    noisy = Image.effect_noise((800, 800), 100).convert("RGB")
+    buffer = io.BytesIO()
+    noisy.save(buffer, format="JPEG", quality=95)
+    image = ImageData(type="base64", data=base64.b64encode(buffer.getvalue()).decode(), mime_type="image/jpeg")
+
+    result = asyncio.run(handler.process(image, {"max_image_bytes": 60_000}))
+
+    assert len(base64.b64decode(result["data"])) <= 60_000
+    assert result["mime_type"] == "image/jpeg"
+    handler.shutdown()
+
+
+def test_unlisted_formats_are_reencoded():
+    """A small BMP is converted to PNG rather than forwarded under a PNG label"""
+    handler = ImageHandler()
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), (0, 90, 200)).save(buffer, format="BMP")
+    image = ImageData(type="base64", data=base64.b64encode(buffer.getvalue()).decode(), mime_type="image/png")
+
+    result = asyncio.run(handler.process(image))
+
+    assert result["mime_type"] == "image/png"
+    decoded = Image.open(io.BytesIO(base64.b64decode(result["data"])))
+    assert decoded.format == "PNG" and decoded.size == (8, 8)
+    handler.shutdown()
+
+
+def test_pixel_count_is_capped_before_decoding():
+    """Images declaring too many pixels are refused; big JPEGs are decoded at a reduced scale"""
+    handler = ImageHandler()
+    buffer = io.BytesIO()
+    Image.new("RGB", (4000, 1000), (10, 10, 10)).save(buffer, format="JPEG")
+    jpeg = base64.b64encode(buffer.getvalue()).decode()
+    limit = image_handler.MAX_SOURCE_PIXELS
+    try:
+        result = asyncio.run(handler.process(
+            ImageData(type="base64", data=jpeg, mime_type="image/jpeg"), {"max_image_dimension": 1000}
+        ))
+        assert (result["width"], result["height"]) == (1000, 250)
+
+        image_handler.MAX_SOURCE_PIXELS = 1_000_000
+        try:
+            asyncio.run(handler.process(ImageData(type="base64", data=jpeg, mime_type="image/jpeg")))
+            assert False, "oversized image decoded"
+        except ValueError as e:
+            assert "pixels" in str(e)
+    finally:
+        image_handler.MAX_SOURCE_PIXELS = limit
+        handler.shutdown()
+
+
+def serve_bytes(body: bytes):
+    """Local HTTP server answering every GET with ``body``, sent without a length."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.end_headers()
+            for i in range(0, len(body), 65536):
+                self.wfile.write(body[i:i + 65536])
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/image.png"
+
+
+def test_remote_urls_need_an_allowlisted_host():
+    """http(s) URLs are refused unless their host is allowlisted, and capped while streaming"""
+    handler = ImageHandler()
+    server, url = serve_bytes(make_png(16, 16))
+    allowed, limit = image_handler.IMAGE_URL_ALLOWED_HOSTS, image_handler.MAX_SOURCE_BYTES
+    try:
+        for blocked in (url, "http://169.254.169.254/latest/meta-data"):
+            try:
+                asyncio.run(handler.process(ImageData(type="url", data=blocked, mime_type="image/png")))
+                assert False, f"{blocked} was fetched"
+            except ValueError as e:
+                assert "not allowed" in str(e)
+
+        image_handler.IMAGE_URL_ALLOWED_HOSTS = frozenset({"127.0.0.1"})
+        result = asyncio.run(handler.process(ImageData(type="url", data=url, mime_type="image/png")))
+        assert (result["width"], result["height"]) == (16, 16)
+
+        server.shutdown()
+        server, url = serve_bytes(b"x" * 1_000_000)
+        image_handler.MAX_SOURCE_BYTES = 100_000
+        try:
+            asyncio.run(handler.process(ImageData(type="url", data=url, mime_type="image/png")))
+            assert False, "oversized download accepted"
+        except ValueError as e:
+            assert "exceeds" in str(e)
+    finally:
+        image_handler.IMAGE_URL_ALLOWED_HOSTS, image_handler.MAX_SOURCE_BYTES = allowed, limit
+        server.shutdown()
+        handler.shutdown()
+
+
+if __name__ == "__main__":
+    test_small_base64_passes_through()
+    test_large_path_is_downscaled()
+    test_file_url_and_cache_hit()
+    test_byte_budget_is_enforced()
+    test_unlisted_formats_are_reencoded()
+    test_pixel_count_is_capped_before_decoding()
+    test_remote_urls_need_an_allowlisted_host()
+    print("✅ Image handler tests passed")
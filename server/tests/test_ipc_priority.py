@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Test that control frames overtake queued bulk frames on the IPC link, using a local stub server
+"""
+
+import asyncio
+import json
+import sys
+import time
+
+sys.path.append('src')
+from main import ConnectionManager
+from config.provider_manager import ProviderManager
+from messages.router import MessageRouter
+from utils.ipc_client import IPCClient, Priority
+from utils.metrics import metrics
+from utils.rate_limit import classify_message
+
+
+async def start_stub_server(received, delays=None, echoes_ids=True, events=()):
+    """Echo-style IPC stub that answers each frame after a short delay.
+
+    ``events`` are pushed, without an id, before each reply.
+    """
+    delays = delays or {}
+
+    async def handle(reader, writer):
+        writer.write(json.dumps({"type": "welcome", "data": {"echoesIds": echoes_ids}}).encode() + b"\n")
+        await writer.drain()
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            message = json.loads(line)
+            received.append(message["type"])
+            asyncio.get_running_loop().create_task(reply(writer, message, delays.get(message["type"], 0)))
+            # A slow reader, so large frames back up on the client's side of the socket
+            await asyncio.sleep(0.02)
+        writer.close()
+
+    async def reply(writer, message, delay):
+        await asyncio.sleep(delay)
+        for event in events:
+            writer.write(json.dumps(event).encode() + b"\n")
+        response = {"type": "ack", "data": {"for": message["type"]}}
+        if echoes_ids:
+            response["id"] = message["id"]
+        writer.write(json.dumps(response).encode() + b"\n")
+        await writer.drain()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0, limit=2 ** 24)
+    return server, server.sockets[0].getsockname()[1]
+
+
+def test_cancel_jumps_bulk_queue():
+    """A cancel queued behind several image-heavy tasks is written next"""
+    received = []
+
+    async def run():
+        server, port = await start_stub_server(received)
+        client = IPCClient("127.0.0.1", port)
+        await client.connect()
+
+        image = "x" * 8_000_000
+        bulk = [
+            asyncio.create_task(client.send_message({"type": "newTask", "images": [image]}))
+            for _ in range(4)
+        ]
+        # Queued while the first newTask is still being written
+        await asyncio.sleep(0)
+        cancel = asyncio.create_task(
+            client.send_message({"type": "cancelTask"}, priority=Priority.CONTROL)
+        )
+        await asyncio.gather(*bulk, cancel)
+
+        client.disconnect()
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(run())
+
+    # The first newTask already held the link; the cancel goes right after it
+    assert received[:2] == ["newTask", "cancelTask"]
+    assert received.count("newTask") == 4
+    assert metrics.timings["ipc.cancel_latency"].count >= 1
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_json(self, message):
+        self.sent.append((time.perf_counter(), message))
+
+
+def test_cancel_frame_not_stuck_behind_new_task():
+    """A cancelTask frame is handled while a slow newTask from the same socket awaits its reply"""
+    received = []
+
+    async def run():
+        server, port = await start_stub_server(received, {"newTask": 0.5})
+        manager = ConnectionManager()
+        manager.message_router = MessageRouter(ProviderManager(reload_interval=0))
+        websocket = FakeWebSocket()
+        await manager.connect(websocket, "c1", observer=True)
+        connection = manager.connections["c1"]
+        client = IPCClient("127.0.0.1", port)
+        await client.connect()
+        manager.message_router.register_ipc_client("c1", client)
+
+        started = time.perf_counter()
+        for frame in ({"type": "newTask", "data": {"prompt": "long job"}}, {"type": "cancelTask", "data": {}}):
+            manager.dispatch(connection, frame, classify_message(frame["type"]), time.perf_counter())
+        while len(websocket.sent) < 2:
+            await asyncio.sleep(0.01)
+
+        manager.disconnect("c1")
+        client.disconnect()
+        server.close()
+        await server.wait_closed()
+        return started, websocket.sent
+
+    started, sent = asyncio.run(run())
+
+    assert received == ["newTask", "cancelTask"]
+    (cancelled_at, first), (_, second) = sent
+    assert first["data"]["status"] == "task_cancelled"
+    assert second["data"]["status"] == "task_started"
+    assert cancelled_at - started < 0.25
+    assert metrics.timings["ipc.cancel_latency"].count >= 1
+
+
+def test_out_of_order_replies_and_events_are_not_misassigned():
+    """Replies reach their own sender by id; id-less events go to on_unsolicited"""
+    received = []
+    event = {"type": "event", "data": {"event": "taskCompleted", "data": {}}}
+
+    async def run():
+        server, port = await start_stub_server(received, {"newTask": 0.2}, events=[event])
+        client = IPCClient("127.0.0.1", port)
+        pushed = []
+
+        async def on_unsolicited(message):
+            pushed.append(message)
+
+        client.on_unsolicited = on_unsolicited
+        await client.connect()
+        slow = asyncio.create_task(client.send_message({"type": "newTask"}))
+        fast = asyncio.create_task(client.send_message({"type": "readFile"}))
+        replies = await asyncio.gather(slow, fast)
+        await asyncio.sleep(0.05)
+
+        client.disconnect()
+        server.close()
+        await server.wait_closed()
+        return replies, pushed
+
+    (slow, fast), pushed = asyncio.run(run())
+
+    assert slow["data"]["for"] == "newTask"
+    assert fast["data"]["for"] == "readFile"
+    assert pushed == [event, event]
+
+
+def test_server_without_ids_gets_one_request_at_a_time():
+    """Without echoed ids the next request waits for the previous reply, so replies stay paired"""
+    received = []
+    event = {"type": "event", "data": {"event": "taskStarted", "data": {}}}
+
+    async def run():
+        server, port = await start_stub_server(received, {"newTask": 0.2}, echoes_ids=False, events=[event])
+        client = IPCClient("127.0.0.1", port)
+        pushed = []
+
+        async def on_unsolicited(message):
+            pushed.append(message)
+
+        client.on_unsolicited = on_unsolicited
+        await client.connect()
+        slow = asyncio.create_task(client.send_message({"type": "newTask"}))
+        await asyncio.sleep(0.05)
+        fast = asyncio.create_task(client.send_message({"type": "readFile"}))
+        await asyncio.sleep(0.05)
+        written_while_pending = list(received)
+        replies = await asyncio.gather(slow, fast)
+        await asyncio.sleep(0.05)
+
+        client.disconnect()
+        server.close()
+        await server.wait_closed()
+        return written_while_pending, replies, pushed
+
+    written_while_pending, (slow, fast), pushed = asyncio.run(run())
+
+    assert written_while_pending == ["newTask"]
+    assert received == ["newTask", "readFile"]
+    assert slow["data"]["for"] == "newTask"
+    assert fast["data"]["for"] == "readFile"
+    assert pushed == [event, event]
+
+
+def test_unsolicited_frames_reach_the_router():
+    """A registered IPC client's pushed frames are routed to the client's WebSocket"""
+    pushed = {"type": "say", "data": {"taskId": "t1", "say": "text", "text": "hello"}}
+
+    class Recorder:
+        def __init__(self):
+            self.messages = []
+
+        async def route_from_roocode(self, client_id, message):
+            self.messages.append((client_id, message))
+
+    router = MessageRouter(ProviderManager(reload_interval=0))
+    client = IPCClient("127.0.0.1", 0)
+    router.register_ipc_client("c1", client)
+    recorder = Recorder()
+    router.route_from_roocode = recorder.route_from_roocode
+
+    asyncio.run(client.on_unsolicited(pushed))
+    assert recorder.messages == [("c1", pushed)]
+
+    router.unregister_ipc_client("c1")
+    assert client.on_unsolicited is None
+
+
+if __name__ == "__main__":
+    test_cancel_jumps_bulk_queue()
+    test_cancel_frame_not_stuck_behind_new_task()
+    test_out_of_order_replies_and_events_are_not_misassigned()
+    test_server_without_ids_gets_one_request_at_a_time()
+    test_unsolicited_frames_reach_the_router()
+    print("✅ IPC priority lane tests passed")
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Test the persisted message history: batched appends, keyset paging and FTS5 search
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append('src')
+from config.provider_manager import ProviderManager
+from messages.router import MessageRouter
+from messages.types import WebviewMessage
+from models.database import Base, create_engines
+from models.message import MessageHistory, create_search_index
+from utils.redact import REDACTED, redact
+
+ROWS = int(os.getenv("HISTORY_ROWS", "50000"))
+
+
+async def make_history(path):
+    write_engine, read_engine = create_engines(f"sqlite+aiosqlite:///{path}")
+    async with write_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await create_search_index(conn)
+    history = MessageHistory(
+        batch_size=5000,
+        max_pending=ROWS + 1,
+        session_factory=sessionmaker(write_engine, class_=AsyncSession, expire_on_commit=False),
+        read_session_factory=sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False),
+    )
+    return history, write_engine, read_engine
+
+
+def test_keyset_pages_and_search():
+    async def run(path):
+        history, write_engine, read_engine = await make_history(path)
+        for i in range(ROWS):
+            history.record("client-1", f"task-{i % 100}", "out", {
+                "type": "say",
+                "data": {"say_type": "text", "text": f"step {i} of the refactor"}
+            })
+        history.record("client-1", "task-7", "out", {
+            "type": "ask", "data": {"ask_type": "command", "command": "pytest -k flaky_widget"}
+        })
+        await history.flush()
+
+        started = time.perf_counter()
+        latest = await history.fetch(task_id="task-7", limit=50)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        older = await history.fetch(task_id="task-7", limit=50, before=latest[-1]["id"])
+        found = await history.fetch(query="flaky_widget")
+        scoped = await history.fetch(task_id="task-8", query="flaky_widget")
+        hostile = await history.fetch(query='"unbalanced OR (')
+
+        await write_engine.dispose()
+        await read_engine.dispose()
+        return latest, older, found, scoped, hostile, elapsed_ms
+
+    with tempfile.TemporaryDirectory() as tmp:
+        latest, older, found, scoped, hostile, elapsed_ms = asyncio.run(run(os.path.join(tmp, "history.db")))
+
+    print(f"   last 50 of task-7 out of {ROWS} rows: {elapsed_ms:.2f} ms")
+    assert len(latest) == 50
+    assert latest[0]["type"] == "ask"
+    assert all(a["id"] > b["id"] for a, b in zip(latest, latest[1:]))
+    assert older[0]["id"] < latest[-1]["id"]
+    assert [m["content"] for m in found] == ["pytest -k flaky_widget"]
+    assert scoped == []
+    assert hostile == []
+
+
+def test_images_are_not_stored():
+    history = MessageHistory()
+    history.record("client-1", None, "in", {
+        "type": "newTask", "data": {"prompt": "Match this mockup"}, "images": [{"data": "x" * 1000}]
+    })
+    row = history._pending[0]
+    assert row["payload"]["images"] == 1
+    assert row["content"] == "Match this mockup"
+
+
+class Connection:
+    def __init__(self, principal):
+        self.principal = principal
+
+
+class WebSockets:
+    connections = {"alice-tab": Connection("alice"), "bob-tab": Connection("bob")}
+
+    async def send_personal_message(self, message, client_id):
+        pass
+
+
+def test_credentials_are_redacted_before_recording():
+    router = MessageRouter(ProviderManager(reload_interval=0))
+    router.set_websocket_manager(WebSockets())
+    router.history = MessageHistory()
+    asyncio.run(router.route_from_web("alice-tab", WebviewMessage(type="saveApiConfiguration", data={
+        "provider": "openai", "model": "gpt-4", "api_key": "sk-live-123", "openAiApiKey": "sk-live-456"
+    })))
+    router.image_handler.shutdown()
+
+    row = router.history._pending[0]
+    assert row["principal"] == "alice"
+    assert row["payload"]["data"]["api_key"] == REDACTED
+    assert row["payload"]["data"]["openAiApiKey"] == REDACTED
+    assert "sk-live" not in repr(row)
+    assert redact({"maxTokens": 10, "tokenEstimate": {"tokens": 3}, "awsSessionToken": "t"}) == {
+        "maxTokens": 10, "tokenEstimate": {"tokens": 3}, "awsSessionToken": REDACTED
+    }
+
+
+def test_history_is_scoped_to_the_caller():
+    async def run(path):
+        history, write_engine, read_engine = await make_history(path)
+        history.record("alice-tab", "t1", "in", {"type": "newTask", "data": {"prompt": "alice's"}}, "alice")
+        history.record("bob-tab", "t2", "in", {"type": "newTask", "data": {"prompt": "bob's"}}, "bob")
+        await history.flush()
+        mine = await history.fetch(principal="alice")
+        theirs = await history.fetch(task_id="t2", principal="alice")
+        everyone = await history.fetch()
+        await write_engine.dispose()
+        await read_engine.dispose()
+        return mine, theirs, everyone
+
+    with tempfile.TemporaryDirectory() as tmp:
+        mine, theirs, everyone = asyncio.run(run(os.path.join(tmp, "history.db")))
+
+    assert [m["content"] for m in mine] == ["alice's"]
+    assert theirs == []
+    assert len(everyone) == 2
+
+
+if __name__ == "__main__":
+    test_keyset_pages_and_search()
+    test_images_are_not_stored()
+    test_credentials_are_redacted_before_recording()
+    test_history_is_scoped_to_the_caller()
+    print("✅ Message history tests passed")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test live model discovery against a local stub of an OpenAI-compatible server
+"""
+
+import asyncio
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append('src')
+from config.discovery import ModelDiscovery
+from config.provider_manager import ProviderManager
+
+
+class StubServer:
+    """Serves GET /v1/models; ``models`` and ``fail`` can change between calls."""
+
+    def __init__(self, delay: float = 0.0):
+        self.models = ["qwen-3-coder", "local-llama"]
+        self.fail = False
+        self.delay = delay
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests += 1
+                time.sleep(stub.delay)
+                if stub.fail or self.path != "/v1/models":
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                body = json.dumps({"object": "list", "data": [{"id": m} for m in stub.models]}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def test_concurrent_callers_share_one_request():
+    with StubServer(delay=0.2) as stub:
+        async def run():
+            discovery = ModelDiscovery(ttl=60)
+            results = await asyncio.gather(*(discovery.get_models(stub.base_url) for _ in range(100)))
+            await discovery.close()
+            return results
+
+        results = asyncio.run(run())
+    assert stub.requests == 1
+    assert all(r == ["qwen-3-coder", "local-llama"] for r in results)
+
+
+def test_stale_while_revalidate_and_on_error():
+    with StubServer() as stub:
+        async def run():
+            discovery = ModelDiscovery(ttl=0.1, retry_after=0.1)
+            assert await discovery.get_models(stub.base_url) == ["qwen-3-coder", "local-llama"]
+
+            # Expired: the old list comes back at once while one refresh runs
+            stub.models = ["qwen-3-coder", "new-model"]
+            await asyncio.sleep(0.15)
+            assert await discovery.get_models(stub.base_url) == ["qwen-3-coder", "local-llama"]
+            await asyncio.sleep(0.1)
+            assert await discovery.get_models(stub.base_url) == ["qwen-3-coder", "new-model"]
+
+            # Upstream down: keep serving the last good list
+            stub.fail = True
+            await asyncio.sleep(0.15)
+            for _ in range(3):
+                assert await discovery.get_models(stub.base_url) == ["qwen-3-coder", "new-model"]
+                await asyncio.sleep(0.05)
+            await discovery.close()
+
+        asyncio.run(run())
+
+
+def test_provider_manager_falls_back_to_catalog():
+    with StubServer() as stub:
+        async def run():
+            manager = ProviderManager(reload_interval=0)
+            live = await manager.get_available_models("openai-compatible", stub.base_url)
+            stub.fail = True
+            fallback = await manager.get_available_models("openai-compatible", stub.base_url + "/missing")
+            await manager.stop()
+            return live, fallback, manager.catalog.models_payload["openai-compatible"]
+
+        live, fallback, catalog_models = asyncio.run(run())
+    assert live == ["qwen-3-coder", "local-llama"]
+    assert fallback == catalog_models
+
+
+if __name__ == "__main__":
+    test_concurrent_callers_share_one_request()
+    test_stale_while_revalidate_and_on_error()
+    test_provider_manager_falls_back_to_catalog()
+    print("✅ Model discovery tests passed")
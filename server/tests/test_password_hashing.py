@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test that bcrypt runs off the event loop: loop lag during a login burst and the pending-login limit
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+sys.path.append('src')
+from api import auth
+from api.auth import PasswordHasher
+
+BURST = int(os.getenv("LOGIN_BURST", "100"))
+ROUNDS = int(os.getenv("LOGIN_ROUNDS", "8"))  # production hashes use 12; lower keeps the test quick
+
+
+def test_loop_stays_responsive_during_login_burst():
+    hashed = CryptContext(schemes=["bcrypt"], bcrypt__rounds=ROUNDS).hash("hunter2")
+
+    async def run():
+        hasher = PasswordHasher(max_pending=BURST)
+        lag = 0.0
+        done = False
+
+        async def ticker():
+            nonlocal lag
+            while not done:
+                started = time.perf_counter()
+                await asyncio.sleep(0.001)
+                lag = max(lag, time.perf_counter() - started - 0.001)
+
+        tick = asyncio.create_task(ticker())
+        await asyncio.sleep(0.01)
+        started = time.perf_counter()
+        results = await asyncio.gather(*(
+            hasher.verify("hunter2" if i % 2 else "wrong", hashed) for i in range(BURST)
+        ))
+        elapsed = time.perf_counter() - started
+        done = True
+        await tick
+        hasher.shutdown()
+        return results, lag, elapsed
+
+    results, lag, elapsed = asyncio.run(run())
+    print(f"   {BURST} logins in {elapsed:.2f}s, max loop lag {lag * 1000:.1f} ms")
+    assert results == [bool(i % 2) for i in range(BURST)]
+    assert lag < 0.05
+
+
+def test_excess_logins_are_rejected_not_queued():
+    hashed = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("pw")
+
+    async def run():
+        hasher = PasswordHasher(workers=1, max_pending=3)
+        outcomes = await asyncio.gather(
+            *(hasher.verify("pw", hashed) for _ in range(5)), return_exceptions=True
+        )
+        hasher.shutdown()
+        return outcomes
+
+    outcomes = asyncio.run(run())
+    assert outcomes[:3] == [True, True, True]
+    assert all(isinstance(o, HTTPException) and o.status_code == 503 for o in outcomes[3:])
+
+
+def test_demo_login_still_works():
+    async def run():
+        return await auth.authenticate_user("admin", "admin"), await auth.authenticate_user("admin", "nope")
+
+    ok, bad = asyncio.run(run())
+    assert ok == {"username": "admin"} and bad is None
+
+
+if __name__ == "__main__":
+    test_loop_stays_responsive_during_login_burst()
+    test_excess_logins_are_rejected_not_queued()
+    test_demo_login_still_works()
+    print("✅ Password hashing tests passed")
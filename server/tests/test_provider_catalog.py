@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test the indexed, hot-reloadable provider catalog
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+sys.path.append('src')
+from config.catalog import DEFAULT_CATALOG_FILE, ProviderCatalog
+from config.provider_manager import ProviderManager
+
+
+def write_catalog(path, models, mtime):
+    with open(path, "w") as f:
+        json.dump({
+            "local": {
+                "models": models,
+                "default_max_tokens": 1024,
+                "default_temperature": 0.2,
+                "supports_vision": False,
+                "max_context": 8000,
+                "capabilities": ["tools"]
+            },
+            "cloud": {
+                "models": ["shared-model", "seer"],
+                "default_max_tokens": 4096,
+                "default_temperature": 0.7,
+                "supports_vision": True,
+                "max_context": 100000
+            }
+        }, f)
+    os.utime(path, (mtime, mtime))
+
+
+def test_indexes():
+    catalog = ProviderCatalog.load(DEFAULT_CATALOG_FILE)
+    assert "anthropic" in catalog and "nope" not in catalog
+    assert catalog.has_model("anthropic", "claude-3-opus")
+    assert not catalog.has_model("anthropic", "gpt-4")
+    assert set(catalog.providers_for_model("gpt-4")) == {"openai", "azure"}
+    assert ("gemini", "gemini-pro-vision") in catalog.models_with("vision")
+    assert not any(provider == "ollama" for provider, _ in catalog.models_with("vision"))
+
+
+def test_payloads_are_precomputed():
+    manager = ProviderManager(reload_interval=0)
+    first = asyncio.run(manager.get_available_providers())
+    assert first is asyncio.run(manager.get_available_providers())
+    assert first["openai"]["max_context"] == 128000
+    assert "supports_vision" in first["ollama"] and "default_max_tokens" not in first["ollama"]
+    assert asyncio.run(manager.get_available_models("ollama"))[0] == "llama2"
+    assert asyncio.run(manager.get_available_models("nope")) == []
+
+
+def test_hot_reload(tmp_path):
+    path = str(tmp_path / "providers.json")
+    write_catalog(path, ["shared-model"], 1000)
+    manager = ProviderManager(catalog_path=path, reload_interval=0)
+    old = manager.catalog
+    assert old.providers_for_model("shared-model") == ("local", "cloud")
+    assert old.models_with("tools") == (("local", "shared-model"),)
+
+    async def scenario():
+        assert not await manager.reload_if_changed()
+        write_catalog(path, ["shared-model", "new-model"], 2000)
+        assert await manager.reload_if_changed()
+        assert manager.catalog.has_model("local", "new-model")
+        assert not old.has_model("local", "new-model")  # holders of the old catalog are unaffected
+
+        with open(path, "w") as f:
+            f.write("{ not json")
+        os.utime(path, (3000, 3000))
+        assert not await manager.reload_if_changed()
+        assert manager.catalog.has_model("local", "new-model")
+
+        message = await manager.set_provider("c1", {"provider": "local", "model": "new-model"})
+        assert message["data"]["maxTokens"] == 1024
+
+    asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    import pathlib
+    import tempfile
+
+    test_indexes()
+    test_payloads_are_precomputed()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_hot_reload(pathlib.Path(tmp))
+    print("✅ Provider catalog tests passed")
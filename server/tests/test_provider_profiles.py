@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Test persisted provider profiles and newTask references to them
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append('src')
+import main
+from api.auth import api_keys, create_access_token, is_admin
+from messages.router import MessageRouter
+from messages.types import WebviewMessage
+from config.provider_manager import ProviderManager
+from models.database import Base, create_engines
+from models.provider_profile import ProfileStore
+
+
+class FakeIPC:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, message, priority=None):
+        self.sent.append(message)
+        return {"success": True}
+
+
+class Connection:
+    principal = "alice"
+
+
+class WebSockets:
+    connections = {"tab-1": Connection()}
+
+    async def send_personal_message(self, message, client_id):
+        pass
+
+
+class CountingFactory:
+    """Wraps a sessionmaker and counts how many sessions were opened."""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.opened = 0
+
+    def __call__(self):
+        self.opened += 1
+        return self.factory()
+
+
+async def make_store(path):
+    write_engine, read_engine = create_engines(f"sqlite+aiosqlite:///{path}")
+    async with write_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    writes = sessionmaker(write_engine, class_=AsyncSession, expire_on_commit=False)
+    reads = CountingFactory(sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False))
+    return ProfileStore(session_factory=writes, read_factory=reads), reads
+
+
+def test_lazy_load_and_shadowing():
+    async def run(path):
+        store, reads = await make_store(path)
+        await store.save("fast", {"provider": "openai", "model": "gpt-3.5-turbo"})
+        await store.save("fast", {"provider": "ollama", "model": "mistral"}, owner="alice")
+
+        # A fresh store (e.g. after a restart) reads nothing until asked
+        fresh = ProfileStore(session_factory=store.session_factory, read_factory=reads)
+        reads.opened = 0
+        assert (await fresh.get("fast", "alice"))["provider"] == "ollama"
+        assert (await fresh.get("fast"))["provider"] == "openai"
+        assert (await fresh.get("fast", "alice"))["provider"] == "ollama"
+        assert await fresh.get("missing", "alice") is None
+        assert await fresh.get("missing", "alice") is None
+        assert reads.opened == 2
+
+        results = await asyncio.gather(*(fresh.get("fast", "bob") for _ in range(20)))
+        assert all(r["provider"] == "openai" for r in results)
+        assert reads.opened == 3
+
+        assert await fresh.delete("fast", owner="alice")
+        assert (await fresh.get("fast", "alice"))["provider"] == "openai"
+        assert [p["name"] for p in await fresh.list("alice")] == ["fast"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(os.path.join(tmp, "profiles.db")))
+
+
+def test_new_task_by_profile_name():
+    async def run(path):
+        store, _ = await make_store(path)
+        await store.save("pinned", {"provider": "anthropic", "model": "claude-3-haiku", "temperature": 0.2}, owner="alice")
+        manager = ProviderManager(reload_interval=0)
+        manager.profiles = store
+        router = MessageRouter(manager)
+        router.set_websocket_manager(WebSockets())
+        ipc = FakeIPC()
+        router.register_ipc_client("tab-1", ipc)
+
+        for prompt in ("one", "two"):
+            await router.route_from_web("tab-1", WebviewMessage(
+                type="newTask", data={"prompt": prompt, "profile": "pinned"}))
+        await router.route_from_web("tab-1", WebviewMessage(
+            type="newTask", data={"prompt": "three", "profile": "pinned", "model": "claude-3-opus"}))
+        try:
+            await router.route_from_web("tab-1", WebviewMessage(
+                type="newTask", data={"prompt": "four", "profile": "nope"}))
+            assert False, "unknown profile accepted"
+        except ValueError:
+            pass
+        return [m["configuration"] for m in ipc.sent]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configurations = asyncio.run(run(os.path.join(tmp, "profiles.db")))
+
+    assert configurations[0]["apiModelId"] == "claude-3-haiku"
+    assert configurations[0]["temperature"] == 0.2
+    assert configurations[1] == {}  # unchanged, not sent again
+    assert configurations[2]["apiModelId"] == "claude-3-opus"
+    assert len(configurations) == 3
+
+
+def test_only_admins_write_global_profiles():
+    bob = create_access_token({"sub": "bob"})
+    config_key = api_keys.issue("ci-config", ["config"])
+    admin_key = api_keys.issue("ops", ["config", "admin"])
+    client = TestClient(main.app)
+    try:
+        for token in (bob, config_key):
+            headers = {"Authorization": f"Bearer {token}"}
+            assert client.put("/api/config/profiles/fast?shared=true", headers=headers,
+                              json={"provider": "openai", "model": "gpt-4"}).status_code == 403
+            assert client.delete("/api/config/profiles/fast?shared=true", headers=headers).status_code == 403
+
+        def admin(token):
+            return asyncio.run(is_admin(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)))
+
+        assert not admin(bob) and not admin(config_key)
+        assert admin(admin_key) and admin(create_access_token({"sub": "admin"}))
+    finally:
+        api_keys.revoke("ci-config")
+        api_keys.revoke("ops")
+
+
+if __name__ == "__main__":
+    test_lazy_load_and_shadowing()
+    test_new_task_by_profile_name()
+    test_only_admins_write_global_profiles()
+    print("✅ Provider profile tests passed")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test token-bucket rate limiting of WebSocket frames and REST calls
+"""
+
+import sys
+import time
+from datetime import timedelta
+
+from fastapi.testclient import TestClient
+
+sys.path.append('src')
+import main
+from api.auth import create_access_token
+from utils.rate_limit import BULK, CONTROL, TASK, RateLimiter, classify_message, classify_request
+
+
+def test_bucket_refills_and_reports_retry_after():
+    limiter = RateLimiter({TASK: (10.0, 2)})
+    assert limiter.acquire(TASK, ["client:a"]) == 0
+    assert limiter.acquire(TASK, ["client:a"]) == 0
+    retry_after = limiter.acquire(TASK, ["client:a"])
+    assert 0 < retry_after <= 0.1
+    assert limiter.acquire(TASK, ["client:b"]) == 0  # other keys are unaffected
+    time.sleep(retry_after)
+    assert limiter.acquire(TASK, ["client:a"]) == 0
+    assert limiter.throttled == 1
+
+
+def test_classes_have_separate_budgets():
+    limiter = RateLimiter({CONTROL: (100.0, 100), TASK: (0.1, 1)})
+    assert limiter.acquire(TASK, ["client:a"]) == 0
+    assert limiter.acquire(TASK, ["client:a"]) > 0
+    assert all(limiter.acquire(CONTROL, ["client:a"]) == 0 for _ in range(50))
+    assert limiter.acquire(BULK, ["client:a"]) == 0  # no budget, never limited
+
+
+def test_denied_call_charges_no_bucket():
+    limiter = RateLimiter({TASK: (0.1, 2)})
+    limiter.acquire(TASK, ["user:alice"])
+    limiter.acquire(TASK, ["user:alice"])
+    # The user is out of tokens, so the fresh client bucket must stay full
+    assert limiter.acquire(TASK, ["user:alice", "client:tab-2"]) > 0
+    assert limiter.acquire(TASK, ["client:tab-2"]) == 0
+    assert limiter.acquire(TASK, ["client:tab-2"]) == 0
+
+
+def test_classification():
+    assert classify_message("cancelTask") == CONTROL
+    assert classify_message("newTask") == TASK
+    assert classify_message("putBlob") == BULK
+    assert classify_request("GET", "/api/tasks") == CONTROL
+    assert classify_request("POST", "/api/tasks/") == TASK
+    assert classify_request("POST", "/api/config/providers") == BULK
+
+
+def with_limiter(limiter):
+    def wrap(test):
+        def run():
+            original, main.rate_limiter = main.rate_limiter, limiter
+            try:
+                test()
+            finally:
+                main.rate_limiter = original
+        run.__name__ = test.__name__
+        return run
+    return wrap
+
+
+@with_limiter(RateLimiter({TASK: (0.1, 3)}))
+def test_websocket_flood_gets_retry_after():
+    client = TestClient(main.app)
+    token = create_access_token({"sub": "flooder"}, timedelta(minutes=5))
+    with client.websocket_connect(f"/ws/flood-tab?observer=true&token={token}") as ws:
+        replies = []
+        for _ in range(5):
+            ws.send_json({"type": "task.start", "data": {"prompt": "hi"}})
+            replies.append(ws.receive_json()["data"])
+    throttled = [r for r in replies if "retry_after" in r]
+    assert len(throttled) == 2
+    assert throttled[0]["requestType"] == "task.start"
+    assert throttled[0]["retry_after"] > 0
+
+
+@with_limiter(RateLimiter({CONTROL: (0.1, 2)}))
+def test_rest_middleware_returns_429():
+    client = TestClient(main.app)
+    assert client.get("/").status_code == 200
+    assert client.get("/").status_code == 200
+    response = client.get("/")
+    assert response.status_code == 429
+    assert response.json()["retry_after"] > 0
+    assert int(response.headers["Retry-After"]) >= 1
+    assert client.get("/health").status_code == 200  # exempt
+
+
+if __name__ == "__main__":
+    test_bucket_refills_and_reports_retry_after()
+    test_classes_have_separate_budgets()
+    test_denied_call_charges_no_bucket()
+    test_classification()
+    test_websocket_flood_gets_retry_after()
+    test_rest_middleware_returns_429()
+    print("✅ Rate limit tests passed")
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Test budgeted retention: age and size limits, time-sliced compaction and reclaimed-bytes metrics
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append('src')
+from models.database import Base, create_engines
+from models.message import MessageHistory, MessageRecord
+from models.session import Base as SessionBase, SessionRecord
+from models.task import TaskRecord
+from storage.retention import (
+    ApprovalRetention, Compactor, MessageRetention, RetentionPolicy, SessionRetention, TaskRetention,
+    TranscriptRetention
+)
+from storage.transcript_log import TranscriptLog
+from utils.metrics import metrics
+
+DAY = 86400
+
+
+def test_database_stores_respect_age_and_size():
+    async def run(path):
+        write_engine, read_engine = create_engines(f"sqlite+aiosqlite:///{path}")
+        async with write_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(SessionBase.metadata.create_all)
+            now = datetime.utcnow()
+            await conn.execute(insert(MessageRecord), [
+                {
+                    "client_id": "c", "task_id": "t", "direction": "out", "type": "say",
+                    "content": "x" * 100, "payload": {},
+                    "created_at": now - timedelta(days=40 if i < 3000 else 1)
+                }
+                for i in range(5000)
+            ])
+            await conn.execute(insert(SessionRecord), [
+                {"id": "old-closed", "client_id": "c", "active": False, "last_activity": now - timedelta(days=60)},
+                {"id": "old-active", "client_id": "c", "active": True, "last_activity": now - timedelta(days=60)},
+                {"id": "new-closed", "client_id": "c", "active": False, "last_activity": now},
+            ])
+            await conn.execute(insert(TaskRecord), [
+                {"id": "old-done", "client_id": "c", "state": "completed", "updated_at": now - timedelta(days=60)},
+                {"id": "old-running", "client_id": "c", "state": "running", "updated_at": now - timedelta(days=60)},
+                {"id": "new-done", "client_id": "c", "state": "aborted", "updated_at": now},
+            ])
+        write = sessionmaker(write_engine, class_=AsyncSession, expire_on_commit=False)
+        read = sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+
+        # 30 days by age, then at most ~1000 rows' worth of bytes
+        messages = MessageRetention(RetentionPolicy(max_age=30 * DAY, max_bytes=1000 * 102), write, read)
+        sessions = SessionRetention(RetentionPolicy(max_age=30 * DAY), write, read)
+        tasks = TaskRetention(RetentionPolicy(max_age=30 * DAY), write, read)
+        compactor = Compactor([messages, sessions, tasks], batch_size=250, slice_seconds=0.001, pause_seconds=0)
+        reclaimed = await compactor.run_once()
+
+        async with read() as db:
+            remaining = (await db.execute(select(func.count()).select_from(MessageRecord))).scalar()
+            session_ids = sorted((await db.execute(select(SessionRecord.id))).scalars().all())
+            task_ids = sorted((await db.execute(select(TaskRecord.id))).scalars().all())
+        await write_engine.dispose()
+        await read_engine.dispose()
+        return reclaimed, remaining, session_ids, task_ids
+
+    before = metrics.counters["retention.messages.reclaimed_bytes"]
+    with tempfile.TemporaryDirectory() as tmp:
+        reclaimed, remaining, session_ids, task_ids = asyncio.run(run(os.path.join(tmp, "retention.db")))
+
+    assert remaining == 1000
+    assert reclaimed["messages"] == 4000 * 102
+    assert metrics.counters["retention.messages.reclaimed_bytes"] - before == 4000 * 102
+    assert session_ids == ["new-closed", "old-active"]
+    # Only finished tasks age out
+    assert task_ids == ["new-done", "old-running"]
+    assert metrics.timings["retention.slice_ms"].count > 0
+
+
+def test_answered_approvals_go_first():
+    old = (datetime.now() - timedelta(days=2)).isoformat()
+    fresh = datetime.now().isoformat()
+    approvals = {
+        "a1": {"created_at": old, "status": "approved", "data": {}},
+        "a2": {"created_at": fresh, "status": "denied", "data": {"text": "x" * 500}},
+        "a3": {"created_at": fresh, "status": "pending", "data": {"text": "x" * 500}},
+    }
+    store = ApprovalRetention(approvals, RetentionPolicy(max_age=DAY, max_bytes=600))
+    reclaimed = asyncio.run(Compactor([store]).run_once())
+    assert list(approvals) == ["a3"]
+    assert reclaimed["approvals"] > 500
+
+
+def test_message_total_is_summed_once_then_kept_current():
+    async def run(path):
+        write_engine, read_engine = create_engines(f"sqlite+aiosqlite:///{path}")
+        async with write_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        write = sessionmaker(write_engine, class_=AsyncSession, expire_on_commit=False)
+        read = sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+
+        async def table_bytes():
+            async with read() as db:
+                return (await db.execute(select(func.coalesce(func.sum(MessageRetention._row_bytes()), 0)))).scalar()
+
+        history = MessageHistory(session_factory=write, read_session_factory=read)
+        for i in range(50):
+            history.record("c", "t", "out", {"type": "say", "data": {"text": f"before {i} é"}})
+        await history.flush()
+
+        store = MessageRetention(RetentionPolicy(max_bytes=10 ** 9), write, read)
+        history.on_persisted = store.added
+        await store.begin_pass()
+        seeded = store._size == await table_bytes()
+
+        for i in range(50):
+            history.record("c", "t", "out", {"type": "say", "data": {"text": f"after {i}", "n": [i] * i}})
+        await history.flush()
+        # Later passes trust the running total instead of summing the table again
+        store.read_session_factory = None
+        await store.begin_pass()
+        current = store._size == await table_bytes()
+
+        await write_engine.dispose()
+        await read_engine.dispose()
+        return seeded, current
+
+    with tempfile.TemporaryDirectory() as tmp:
+        seeded, current = asyncio.run(run(os.path.join(tmp, "retention.db")))
+    assert seeded and current
+
+
+def test_pending_head_does_not_block_answered_approvals():
+    fresh = datetime.now().isoformat()
+    approvals = {
+        f"p{i}": {"created_at": fresh, "status": "pending", "data": {"text": "x" * 100}}
+        for i in range(5)
+    }
+    approvals.update({
+        f"a{i}": {"created_at": fresh, "status": "approved", "data": {"text": "x" * 100}}
+        for i in range(5)
+    })
+    store = ApprovalRetention(approvals, RetentionPolicy(max_age=DAY, max_bytes=700))
+    asyncio.run(Compactor([store], batch_size=2).run_once())
+    # The pending ones alone exceed the budget; every answered one behind them goes
+    assert list(approvals) == [f"p{i}" for i in range(5)]
+    assert store._size == sum(store._bytes(a) for a in approvals.values())
+
+
+def test_approvals_are_sized_once():
+    approvals = {
+        f"a{i}": {"created_at": datetime.now().isoformat(), "status": "pending", "data": {"text": "x" * 100}}
+        for i in range(1200)
+    }
+    store = ApprovalRetention(approvals, RetentionPolicy(max_bytes=10 ** 9), slice_size=100)
+    sized = []
+    measure = store._bytes
+    store._bytes = lambda approval: sized.append(1) or measure(approval)
+
+    asyncio.run(store.begin_pass())
+    total = store._size
+    approvals["late"] = dict(approvals["a0"])
+    del approvals["a1"]
+    asyncio.run(store.begin_pass())
+
+    assert len(sized) == 1201
+    assert store._size == total
+    assert store._size == sum(measure(a) for a in approvals.values())
+
+
+def test_transcript_segments_are_dropped_oldest_first():
+    async def run(root):
+        log = TranscriptLog(root_dir=root, segment_bytes=4096)
+        for task in ("old", "live"):
+            for i in range(200):
+                log.append(task, "out", {"n": i, "text": "y" * 64})
+            await log.flush()
+        # Age the whole "old" task
+        aged = time.time() - 40 * DAY
+        for path in os.scandir(os.path.join(root, "old")):
+            os.utime(path.path, (aged, aged))
+
+        sizes = {seg[1]: 0 for seg in log.list_segments()}
+        for seg in log.list_segments():
+            sizes[seg[1]] += seg[3]
+        budget = sizes["live"] - 1000
+        store = TranscriptRetention(log, RetentionPolicy(max_age=30 * DAY, max_bytes=budget))
+        reclaimed = await Compactor([store]).run_once()
+
+        live = await log.read("live", limit=1000)
+        remaining = log.list_segments()
+        log.shutdown()
+        return reclaimed, live, remaining, sizes, budget
+
+    with tempfile.TemporaryDirectory() as root:
+        reclaimed, live, remaining, sizes, budget = asyncio.run(run(root))
+        old_gone = not os.path.exists(os.path.join(root, "old"))
+
+    assert old_gone
+    assert {seg[1] for seg in remaining} == {"live"}
+    assert sum(seg[3] for seg in remaining) <= budget
+    assert remaining[-1][4]  # the live segment survives
+    assert live[0]["offset"] > 0 and live[-1]["frame"]["n"] == 199
+    assert reclaimed["transcripts"] >= sizes["old"]
+
+
+if __name__ == "__main__":
+    test_database_stores_respect_age_and_size()
+    test_answered_approvals_go_first()
+    test_message_total_is_summed_once_then_kept_current()
+    test_pending_head_does_not_block_answered_approvals()
+    test_approvals_are_sized_once()
+    test_transcript_segments_are_dropped_oldest_first()
+    print("✅ Retention tests passed")
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Test the session registry indexes without a running server
+"""
+
+import asyncio
+import sys
+
+sys.path.append('src')
+from models.session import SessionManager
+
+
+def test_client_index_and_active_count():
+    async def run():
+        await SessionManager.cleanup_all()
+        first = await SessionManager.create_session("dashboard")
+        second = await SessionManager.create_session("dashboard")
+        other = await SessionManager.create_session("cli")
+
+        assert await SessionManager.get_session_by_client("dashboard") is second
+        assert SessionManager.active_count() == 3
+
+        SessionManager.close_session(first.id)
+        assert SessionManager.active_count() == 2
+        assert [s.id for s in SessionManager.get_active_sessions()] == [second.id, other.id]
+
+        await SessionManager.cleanup_all()
+        assert SessionManager.active_count() == 0
+        assert await SessionManager.get_session_by_client("dashboard") is None
+
+    asyncio.run(run())
+
+
+def test_cursor_paging():
+    async def run():
+        await SessionManager.cleanup_all()
+        sessions = [await SessionManager.create_session(f"client-{i}") for i in range(7)]
+        SessionManager.close_session(sessions[3].id)
+
+        pages, after = [], None
+        while True:
+            page = SessionManager.get_active_sessions(limit=2, after=after)
+            if not page:
+                break
+            pages.append([s.client_id for s in page])
+            after = page[-1].id
+
+        await SessionManager.cleanup_all()
+        return pages
+
+    assert asyncio.run(run()) == [
+        ["client-0", "client-1"], ["client-2", "client-4"], ["client-5", "client-6"]
+    ]
+
+
+if __name__ == "__main__":
+    test_client_index_and_active_count()
+    test_cursor_paging()
+    print("✅ Session registry tests passed")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test read-through rehydration of sessions stored by an earlier run
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append('src')
+from models.session import SessionManager, SessionRecord, Base
+
+HISTORICAL = 5000
+
+
+def test_returning_clients_are_rehydrated_lazily():
+    async def run(path):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            old = datetime.utcnow() - timedelta(days=1)
+            await conn.execute(insert(SessionRecord), [
+                {
+                    "id": f"s-{i}", "client_id": f"client-{i % 1000}", "created_at": old,
+                    "last_activity": old + timedelta(seconds=i), "active": False,
+                    "context": {"turn": i}, "provider": "openai"
+                }
+                for i in range(HISTORICAL)
+            ])
+
+        queries = []
+        event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: queries.append(1))
+
+        await SessionManager.cleanup_all()
+        SessionManager.set_loader(sessionmaker(engine, class_=AsyncSession, expire_on_commit=False))
+        try:
+            assert queries == []  # nothing is loaded up front
+
+            returning = await SessionManager.create_session("client-7")
+            fresh = await SessionManager.create_session("newcomer")
+
+            # Concurrent misses for the same id share one query
+            queries.clear()
+            loaded = await asyncio.gather(*(SessionManager.get_session("s-42") for _ in range(10)))
+            shared_queries = len(queries)
+
+            queries.clear()
+            assert await SessionManager.get_session("nope") is None
+            assert await SessionManager.get_session("nope") is None
+            missing_queries = len(queries)
+
+            # Reconnecting before the reaper runs reuses the in-memory session
+            SessionManager.close_session(returning.id)
+            again = await SessionManager.create_session("client-7")
+            assert again is returning and again.active
+        finally:
+            SessionManager.set_loader(None)
+            await SessionManager.cleanup_all()
+            await engine.dispose()
+        return returning, fresh, loaded, shared_queries, missing_queries, again
+
+    with tempfile.TemporaryDirectory() as tmp:
+        returning, fresh, loaded, shared_queries, missing_queries, again = asyncio.run(
+            run(os.path.join(tmp, "sessions.db"))
+        )
+
+    assert returning.id == "s-4007"
+    assert returning.context == {"turn": 4007}
+    assert returning.provider == "openai"
+    assert fresh.id.count("-") == 4 and fresh.context is None
+    assert all(s is loaded[0] for s in loaded)
+    assert loaded[0].context == {"turn": 42} and not loaded[0].active
+    assert shared_queries == 1
+    assert missing_queries == 1
+
+
+if __name__ == "__main__":
+    test_returning_clients_are_rehydrated_lazily()
+    print("✅ Session rehydration tests passed")
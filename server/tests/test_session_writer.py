@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test write-behind session persistence against a throwaway SQLite database
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append('src')
+from models.session import SessionManager, SessionRecord, Base
+from models.session_writer import SessionWriter
+
+
+async def make_factory(path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine, sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def test_sessions_are_batched_and_flushed_on_stop():
+    """Creates, activity and closes reach the table without per-event writes"""
+
+    async def run(path):
+        engine, factory = await make_factory(path)
+        writer = SessionWriter(flush_interval=60, session_factory=factory)
+        SessionManager.set_writer(writer)
+        writer.start()
+        try:
+            sessions = [await SessionManager.create_session(f"client-{i}") for i in range(250)]
+            for session in sessions:
+                await SessionManager.update_activity(session.id)
+            SessionManager.close_session(sessions[0].id)
+
+            # Nothing is written until the flush; updates coalesce per session
+            assert writer.pending == 250
+
+            await SessionManager.cleanup_all()
+            await writer.stop()
+
+            async with factory() as db:
+                records = (await db.execute(select(SessionRecord))).scalars().all()
+        finally:
+            SessionManager.set_writer(None)
+            await engine.dispose()
+        return records
+
+    with tempfile.TemporaryDirectory() as tmp:
+        records = asyncio.run(run(os.path.join(tmp, "sessions.db")))
+
+    assert len(records) == 250
+    assert not any(record.active for record in records)
+
+
+def test_activity_updates_are_dropped_when_full():
+    writer = SessionWriter(max_pending=1)
+
+    class Stub:
+        def __init__(self, id):
+            self.id = id
+
+    writer.record(Stub("a"))
+    writer.record(Stub("b"), important=False)
+    writer.record(Stub("c"))
+    assert writer.pending == 2
+
+    # A re-recorded id keeps the newest object
+    newer = Stub("a")
+    writer.record(newer)
+    assert writer._pending["a"] is newer
+    assert list(writer._pending) == ["c", "a"]
+
+
+if __name__ == "__main__":
+    test_sessions_are_batched_and_flushed_on_stop()
+    test_activity_updates_are_dropped_when_full()
+    print("✅ Session writer tests passed")
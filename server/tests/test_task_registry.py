@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Test the in-memory task state machine and the task controls routed through it
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append('src')
+from api.tasks import owned_task
+from messages.router import MessageRouter
+from config.provider_manager import ProviderManager
+from models.database import Base, create_engines
+from models.task import TaskRecord, TaskRegistry, TaskState
+from utils.ipc_client import IPCClient
+
+
+class FakeIPC:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, message, priority=None):
+        self.sent.append(message)
+        return {"success": True}
+
+
+def test_transitions_from_upstream_messages():
+    tasks = TaskRegistry()
+    tasks.ensure("t1", "client-1")
+    assert tasks.get("t1").state == TaskState.CREATED
+
+    tasks.observe("client-1", "t1", "say", {"say_type": "text", "text": "Reading files"})
+    assert tasks.get("t1").state == TaskState.RUNNING
+
+    tasks.observe("client-1", "t1", "ask", {"ask_type": "command", "command": "npm test"})
+    assert tasks.get("t1").state == TaskState.WAITING_APPROVAL
+    tasks.approval_answered("t1")
+    assert tasks.get("t1").state == TaskState.RUNNING
+
+    tasks.observe("client-1", "t1", "event", {"name": "taskSpawned", "childTaskId": "t2"})
+    assert tasks.get("t2").parent_id == "t1"
+    assert tasks.get("t2").state == TaskState.RUNNING
+
+    tasks.observe("client-1", "t1", "event", {"name": "taskCompleted"})
+    assert tasks.get("t1").state == TaskState.COMPLETED
+    # Stray progress after completion does not reopen the task
+    tasks.observe("client-1", "t1", "say", {"say_type": "text"})
+    assert tasks.get("t1").state == TaskState.COMPLETED
+    assert tasks.get("t1").message_count == 5
+
+
+def test_controls_go_to_the_owning_connection():
+    async def run():
+        router = MessageRouter(ProviderManager())
+        ipc = FakeIPC()
+        router.register_ipc_client("client-1", ipc)
+        router.tasks.ensure("t1", "client-1", principal="alice")
+
+        missing = await router.control_task("nope", "cancel", "alice")
+        foreign = await router.control_task("t1", "cancel", "bob")
+        cancelled = await router.control_task("t1", "cancel", "alice")
+        closed = await router.control_task("t1", "close", "bob", admin=True)
+        bad = await router.control_task("t1", "explode", "alice")
+        router.ipc_clients.clear()
+        orphaned = await router.control_task("t1", "resume", "alice")
+        return router, ipc, missing, foreign, cancelled, closed, bad, orphaned
+
+    router, ipc, missing, foreign, cancelled, closed, bad, orphaned = asyncio.run(run())
+    assert missing["code"] == 404
+    assert foreign == missing
+    assert cancelled["status"] == "cancelled"
+    assert closed["status"] == "closed"
+    assert bad["code"] == 400
+    assert orphaned["code"] == 409
+    assert [m["type"] for m in ipc.sent] == ["cancelTask", "clearCurrentTask"]
+    assert router.tasks.get("t1").state == TaskState.CLOSED
+
+
+def test_snapshot_upserts_changed_tasks():
+    async def run(path):
+        write_engine, read_engine = create_engines(f"sqlite+aiosqlite:///{path}")
+        async with write_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        factory = sessionmaker(write_engine, class_=AsyncSession, expire_on_commit=False)
+
+        tasks = TaskRegistry(session_factory=factory)
+        for i in range(250):
+            tasks.ensure(f"t{i}", "client-1")
+        await tasks.snapshot()
+        tasks.observe("client-1", "t7", "event", {"name": "taskAborted"})
+        assert tasks._dirty == {"t7"}
+        await tasks.snapshot()
+
+        async with factory() as db:
+            rows = (await db.execute(select(TaskRecord))).scalars().all()
+        await write_engine.dispose()
+        await read_engine.dispose()
+        return rows
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = asyncio.run(run(os.path.join(tmp, "tasks.db")))
+
+    assert len(rows) == 250
+    states = {r.id: r.state for r in rows}
+    assert states["t7"] == "aborted"
+    assert states["t8"] == "created"
+
+
+def test_finished_tasks_are_evicted_after_snapshot():
+    async def run(path):
+        write_engine, read_engine = create_engines(f"sqlite+aiosqlite:///{path}")
+        async with write_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        write = sessionmaker(write_engine, class_=AsyncSession, expire_on_commit=False)
+        read = sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+
+        tasks = TaskRegistry(session_factory=write, read_session_factory=read, evict_after=0)
+        tasks.ensure("done", "client-1")
+        tasks.ensure("live", "client-1")
+        tasks.set_state("done", TaskState.COMPLETED, "taskCompleted")
+        await tasks.snapshot()
+        await tasks.snapshot()
+        in_memory = set(tasks.tasks)
+
+        # Evicted tasks are still answerable, read back from the table
+        loaded = await tasks.load("done")
+        missing = await tasks.load("never")
+        await write_engine.dispose()
+        await read_engine.dispose()
+        return in_memory, loaded, missing
+
+    with tempfile.TemporaryDirectory() as tmp:
+        in_memory, loaded, missing = asyncio.run(run(os.path.join(tmp, "tasks.db")))
+
+    assert in_memory == {"live"}
+    assert loaded.state == TaskState.COMPLETED and loaded.client_id == "client-1"
+    assert missing is None
+
+
+def test_tasks_are_only_visible_to_their_owner():
+    tasks = TaskRegistry()
+    tasks.ensure("t1", "alice-tab", principal="alice")
+    request = SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(task_registry=tasks)))
+
+    assert asyncio.run(owned_task(request, "t1", "alice")).id == "t1"
+    assert asyncio.run(owned_task(request, "t1", "bob", admin=True)).id == "t1"
+    try:
+        asyncio.run(owned_task(request, "t1", "bob"))
+        assert False, "another user's task was readable"
+    except HTTPException as e:
+        assert e.status_code == 404
+
+
+
+def test_task_state_follows_frames_pushed_over_ipc():
+    """say/event frames Roo-Code pushes on its own reach the registry through the IPC client"""
+    async def handle(reader, writer):
+        def send(frame):
+            writer.write(json.dumps(frame).encode() + b"\n")
+
+        send({"type": "welcome", "data": {"echoesIds": True}})
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            message = json.loads(line)
+            if message["type"] == "newTask":
+                send({"type": "taskCreated", "id": message["id"], "data": {"taskId": "t9"}})
+                send({"type": "say", "data": {"taskId": "t9", "say_type": "text", "text": "Reading files"}})
+                send({"type": "event", "data": {"event": "taskCompleted", "data": {"taskId": "t9"}}})
+            await writer.drain()
+        writer.close()
+
+    async def run():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        router = MessageRouter(ProviderManager(reload_interval=0))
+        client = IPCClient("127.0.0.1", server.sockets[0].getsockname()[1])
+        await client.connect()
+        router.register_ipc_client("client-1", client)
+
+        reply = await client.send_message({"type": "newTask", "text": "hello"})
+        router.tasks.ensure(reply["data"]["taskId"], "client-1", principal="alice")
+        for _ in range(100):
+            task = router.tasks.get("t9")
+            if task and task.state == TaskState.COMPLETED:
+                break
+            await asyncio.sleep(0.01)
+
+        router.unregister_ipc_client("client-1")
+        client.disconnect()
+        server.close()
+        await server.wait_closed()
+        return router.tasks.get("t9")
+
+    task = asyncio.run(run())
+
+    assert task.state == TaskState.COMPLETED
+    assert task.principal == "alice"
+    assert task.message_count == 2
+
+
+if __name__ == "__main__":
+    test_transitions_from_upstream_messages()
+    test_controls_go_to_the_owning_connection()
+    test_snapshot_upserts_changed_tasks()
+    test_finished_tasks_are_evicted_after_snapshot()
+    test_tasks_are_only_visible_to_their_owner()
+    test_task_state_follows_frames_pushed_over_ipc()
+    print("✅ Task registry tests passed")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test the verified-token cache behind get_current_user
+"""
+
+import asyncio
+import sys
+import time
+from datetime import timedelta
+
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+sys.path.append('src')
+from api import auth
+from api.auth import TokenCache, create_access_token, get_current_user, token_cache, verify_token
+
+
+def call(token):
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    return asyncio.run(get_current_user(credentials))
+
+
+def test_hits_skip_jwt_decode():
+    token = create_access_token({"sub": "dashboard"}, timedelta(minutes=5))
+    decodes = 0
+    real_decode = auth.jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        nonlocal decodes
+        decodes += 1
+        return real_decode(*args, **kwargs)
+
+    auth.jwt.decode = counting_decode
+    try:
+        hits_before = token_cache.hits
+        started = time.perf_counter()
+        for _ in range(1000):
+            assert call(token) == "dashboard"
+        per_call_us = (time.perf_counter() - started) / 1000 * 1e6
+    finally:
+        auth.jwt.decode = real_decode
+
+    print(f"   get_current_user: {per_call_us:.1f} µs/call with cache")
+    assert decodes == 1
+    assert token_cache.hits - hits_before == 999
+
+
+def test_entries_expire_with_the_token():
+    cache = TokenCache(max_size=2)
+    cache.put("a", "alice", time.time() - 1)
+    cache.put("b", "bob", time.time() + 60)
+    cache.put("c", "carol", time.time() + 60)
+    assert cache.get("a") is None  # expired (and also evicted by the LRU bound)
+    assert cache.get("b") == "bob"
+    cache.put("d", "dave", time.time() + 60)
+    assert cache.get("c") is None and cache.get("b") == "bob"
+
+
+def test_revocation_beats_the_cache():
+    revoked = []
+
+    def hook(token, subject):
+        revoked.append((token, subject))
+
+    token_cache.add_revocation_hook(hook)
+    try:
+        token = create_access_token({"sub": "ci-bot"}, timedelta(minutes=5))
+        other = create_access_token({"sub": "ci-bot", "n": 2}, timedelta(minutes=5))
+        assert verify_token(token) == "ci-bot"
+
+        token_cache.revoke(token)
+        assert verify_token(token) is None
+        try:
+            call(token)
+            assert False, "revoked token accepted"
+        except HTTPException as e:
+            assert e.status_code == 401
+
+        assert verify_token(other) == "ci-bot"
+        time.sleep(1.01)  # iat has one-second resolution; same-second tokens count as revoked
+        token_cache.revoke_subject("ci-bot")
+        assert verify_token(other) is None
+        time.sleep(1.01)
+        fresh = create_access_token({"sub": "ci-bot"}, timedelta(minutes=5))
+        assert verify_token(fresh) == "ci-bot"
+        assert revoked[0] == (token, None) and revoked[1] == (None, "ci-bot")
+    finally:
+        # Only this test's hook; main registers its own on the shared cache
+        token_cache._hooks.remove(hook)
+
+
+if __name__ == "__main__":
+    test_hits_skip_jwt_decode()
+    test_entries_expire_with_the_token()
+    test_revocation_beats_the_cache()
+    print("✅ Token cache tests passed")
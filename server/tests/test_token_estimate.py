@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test the prompt token estimator and the over-context check on newTask
+"""
+
+import asyncio
+import sys
+import time
+
+sys.path.append('src')
+from messages.router import MessageRouter
+from messages.types import WebviewMessage
+from config.provider_manager import ProviderManager
+from utils.tokens import calibration, estimate_task, estimate_text_tokens
+
+
+class FakeIPC:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, message, priority=None):
+        self.sent.append(message)
+        return {"success": True}
+
+
+def test_estimates_are_in_the_right_range():
+    code = "def add(a, b):\n    return a + b  # sum two numbers\n" * 100
+    tokens = estimate_text_tokens(code, 4.0)
+    assert len(code) / 5 < tokens < len(code) / 3
+    # Non-ASCII text is far denser in tokens than its character count suggests at 4 chars/token
+    cjk = "日本語のテキストを処理する" * 2000
+    assert estimate_text_tokens(cjk, 4.0) > len(cjk) * 0.9
+    assert estimate_text_tokens("", 4.0) == 0 and estimate_text_tokens(None, 4.0) == 0
+
+
+def test_calibration_by_family():
+    assert calibration("anthropic")["chars_per_token"] == 3.5
+    assert calibration("openai")["image_tokens"] == 765
+    assert calibration("openai-compatible", {"chars_per_token": 3.0})["chars_per_token"] == 3.0
+    with_images = estimate_task("hi", 2, None, "gemini", 1000)
+    assert with_images.tokens == estimate_task("hi", 0, None, "gemini", 1000).tokens + 516
+
+
+def test_200kb_prompt_well_under_a_millisecond():
+    prompts = [
+        ("x = compute(y)  # step\n" * 10000)[:200000],
+        ("Überprüfe die Änderungen 日本語 " * 8000)[:200000],
+    ]
+    for prompt in prompts:
+        started = time.perf_counter()
+        for _ in range(100):
+            estimate_task(prompt, 1, "Be concise.", "anthropic", 200000, 4096)
+        per_call_us = (time.perf_counter() - started) / 100 * 1e6
+        print(f"   200 KB estimate: {per_call_us:.0f} µs")
+        assert per_call_us < 500
+
+
+def test_over_context_task_never_reaches_ipc():
+    router = MessageRouter(ProviderManager(reload_interval=0))
+    ipc = FakeIPC()
+    router.register_ipc_client("c1", ipc)
+    config = {"provider": "ollama", "model": "mistral", "context_length": 8000, "max_tokens": 1000}
+
+    async def run():
+        small = await router.route_from_web("c1", WebviewMessage(
+            type="newTask", data=dict(config, prompt="Fix the failing test")))
+        large = await router.route_from_web("c1", WebviewMessage(
+            type="newTask", data=dict(config, prompt="lorem ipsum dolor " * 5000)))
+        return small, large
+
+    small, large = asyncio.run(run())
+    assert small["status"] == "task_started"
+    assert small["tokenEstimate"]["budget"] == 7000 and not small["tokenEstimate"]["warning"]
+    assert "error" in large and large["tokenEstimate"]["tokens"] > 7000
+    assert [m["prompt"] for m in ipc.sent] == ["Fix the failing test"]
+
+
+if __name__ == "__main__":
+    test_estimates_are_in_the_right_range()
+    test_calibration_by_family()
+    test_200kb_prompt_well_under_a_millisecond()
+    test_over_context_task_never_reaches_ipc()
+    print("✅ Token estimate tests passed")
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test fan-out of one Roo-Code task to several web clients without a running server
+"""
+
+import asyncio
+import json
+import sys
+
+sys.path.append('src')
+from messages.router import MessageRouter
+from messages.types import WebviewMessage
+from config.provider_manager import ProviderManager
+
+
+class RecordingWebSockets:
+    def __init__(self):
+        self.sent = {}
+
+    async def send_personal_message(self, message: str, client_id: str):
+        self.sent.setdefault(client_id, []).append(message)
+
+
+class RecordingIPC:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, message, priority=None):
+        self.sent.append(message)
+        return {"type": "ack"}
+
+
+def make_router():
+    router = MessageRouter(ProviderManager())
+    web = RecordingWebSockets()
+    router.set_websocket_manager(web)
+    ipc = RecordingIPC()
+    router.register_ipc_client("owner", ipc)
+    return router, web, ipc
+
+
+def test_events_fan_out_to_subscribers():
+    """Every subscriber receives the same encoded frame as the owner"""
+    router, web, _ = make_router()
+
+    async def run():
+        await router.route_from_roocode("owner", {"type": "event", "data": {"event": "taskStarted", "data": {"taskId": "t-1"}}})
+        for watcher in ("dashboard", "cli"):
+            await router.route_from_web("owner", WebviewMessage(type="grantApprover", data={"taskId": "t-1", "clientId": watcher}))
+            await router.route_from_web(watcher, WebviewMessage(type="subscribeTask", data={"taskId": "t-1"}))
+        await router.route_from_roocode("owner", {"type": "say", "data": {"say_type": "text", "text": "hello"}})
+
+    asyncio.run(run())
+
+    assert web.sent["dashboard"][-1] == web.sent["owner"][-1]
+    assert web.sent["cli"][-1] == web.sent["owner"][-1]
+    assert json.loads(web.sent["cli"][-1])["data"]["text"] == "hello"
+
+
+def test_only_approvers_may_answer():
+    """Read-only observers cannot answer approvals; approvers answer over the owner's IPC"""
+    router, web, ipc = make_router()
+
+    async def run():
+        await router.route_from_roocode("owner", {"type": "event", "data": {"event": "taskStarted", "data": {"taskId": "t-2"}}})
+        await router.route_from_web("owner", WebviewMessage(type="grantApprover", data={"taskId": "t-2", "clientId": "viewer"}))
+        await router.route_from_web("viewer", WebviewMessage(type="subscribeTask", data={"taskId": "t-2"}))
+        await router.route_from_web("owner", WebviewMessage(type="grantApprover", data={"taskId": "t-2", "clientId": "lead"}))
+        await router.route_from_web("lead", WebviewMessage(type="subscribeTask", data={"taskId": "t-2", "role": "approver"}))
+        await router.route_from_roocode("owner", {"type": "ask", "data": {"ask_type": "command", "command": "ls"}})
+        approval_id = json.loads(web.sent["viewer"][-1])["data"]["approval_id"]
+
+        denied = await router.route_from_web("viewer", WebviewMessage(
+            type="askResponse", data={"approval_id": approval_id, "approved": True}))
+        allowed = await router.route_from_web("lead", WebviewMessage(
+            type="askResponse", data={"approval_id": approval_id, "approved": True}))
+        return denied, allowed
+
+    denied, allowed = asyncio.run(run())
+
+    assert "error" in denied
+    assert allowed["status"] == "response_sent"
+    assert ipc.sent[-1]["type"] == "askResponse"
+
+
+def test_self_requested_subscription_is_refused():
+    """Nobody can watch or approve someone else's task without the owner's grant"""
+    router, web, ipc = make_router()
+
+    async def run():
+        await router.route_from_roocode("owner", {"type": "event", "data": {"event": "taskStarted", "data": {"taskId": "t-4"}}})
+        approver = await router.route_from_web("intruder", WebviewMessage(
+            type="subscribeTask", data={"taskId": "t-4", "role": "approver"}))
+        granted = await router.route_from_web("intruder", WebviewMessage(
+            type="grantApprover", data={"taskId": "t-4", "clientId": "intruder"}))
+        observer = await router.route_from_web("intruder", WebviewMessage(type="subscribeTask", data={"taskId": "t-4"}))
+        await router.route_from_roocode("owner", {"type": "ask", "data": {"ask_type": "command", "command": "rm -rf /"}})
+        approval_id = json.loads(web.sent["owner"][-1])["data"]["approval_id"]
+        answered = await router.route_from_web("intruder", WebviewMessage(
+            type="askResponse", data={"approval_id": approval_id, "approved": True}))
+        return approver, granted, observer, answered
+
+    approver, granted, observer, answered = asyncio.run(run())
+    assert all("error" in result for result in (approver, granted, observer, answered))
+    assert "intruder" not in router.topics.subscribers("t-4")
+    assert "intruder" not in web.sent
+    assert not any(m["type"] == "askResponse" for m in ipc.sent)
+
+
+def test_revoked_approver_drops_to_observer():
+    router, web, ipc = make_router()
+
+    async def run():
+        await router.route_from_roocode("owner", {"type": "event", "data": {"event": "taskStarted", "data": {"taskId": "t-5"}}})
+        await router.route_from_web("owner", WebviewMessage(type="grantApprover", data={"taskId": "t-5", "clientId": "lead"}))
+        await router.route_from_web("lead", WebviewMessage(type="subscribeTask", data={"taskId": "t-5", "role": "approver"}))
+        await router.route_from_web("owner", WebviewMessage(type="revokeApprover", data={"taskId": "t-5", "clientId": "lead"}))
+
+    asyncio.run(run())
+    assert not router.topics.can_approve("t-5", "lead")
+
+
+def test_disconnect_drops_subscriptions():
+    router, web, _ = make_router()
+    router.topics.subscribe("t-3", "dashboard")
+    router.remove_client("dashboard")
+    assert router.topics.subscribers("t-3") == []
+
+
+if __name__ == "__main__":
+    test_events_fan_out_to_subscribers()
+    test_only_approvers_may_answer()
+    test_self_requested_subscription_is_refused()
+    test_revoked_approver_drops_to_observer()
+    test_disconnect_drops_subscriptions()
+    print("✅ Topic fan-out tests passed")
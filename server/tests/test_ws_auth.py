@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Test WebSocket authentication at the handshake, token expiry and revocation
+"""
+
+import sys
+import threading
+import time
+from datetime import timedelta
+
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+sys.path.append('src')
+import main
+from api import auth
+from api.auth import create_access_token, token_cache
+
+client = TestClient(main.app)
+
+
+def expect_close(websocket, code, reason=None, timeout=None):
+    """Assert the server closes ``websocket`` with ``code`` (and ``reason``) within ``timeout`` seconds."""
+    outcome = []
+
+    def receive():
+        try:
+            outcome.append(websocket.receive_json())
+        except WebSocketDisconnect as e:
+            outcome.append(e)
+
+    # receive_json blocks with no timeout of its own
+    waiter = threading.Thread(target=receive, daemon=True)
+    waiter.start()
+    waiter.join(timeout)
+    assert outcome, f"socket still open after {timeout}s"
+    closed = outcome[0]
+    assert isinstance(closed, WebSocketDisconnect), f"socket stayed open: {closed}"
+    assert closed.code == code, closed.code
+    if reason is not None:
+        assert closed.reason == reason, closed.reason
+
+
+def test_upgrade_without_valid_token_is_refused():
+    for url in ("/ws/anon?observer=true", "/ws/anon?observer=true&token=garbage"):
+        try:
+            with client.websocket_connect(url):
+                assert False, "upgrade accepted"
+        except WebSocketDisconnect as e:
+            assert e.code == 1008
+
+
+def test_no_crypto_after_the_handshake():
+    token = create_access_token({"sub": "alice"}, timedelta(minutes=5))
+    decodes = 0
+    real_decode = auth.jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        nonlocal decodes
+        decodes += 1
+        return real_decode(*args, **kwargs)
+
+    auth.jwt.decode = counting_decode
+    try:
+        with client.websocket_connect(f"/ws/alice-tab?observer=true&token={token}") as ws:
+            for i in range(50):
+                ws.send_json({"type": "ping", "data": {"n": i}})
+                assert ws.receive_json()["data"] == {"n": i}
+            connection = main.manager.connections["alice-tab"]
+    finally:
+        auth.jwt.decode = real_decode
+
+    assert connection.principal == "alice"
+    assert decodes == 1
+
+
+def test_bearer_subprotocol():
+    token = create_access_token({"sub": "bob"}, timedelta(minutes=5))
+    with client.websocket_connect("/ws/bob-tab?observer=true", subprotocols=["bearer", token]) as ws:
+        assert ws.accepted_subprotocol == "bearer"
+        ws.send_json({"type": "ping", "data": {}})
+        ws.receive_json()
+        assert main.manager.connections["bob-tab"].principal == "bob"
+
+
+def test_expiry_closes_unless_refreshed():
+    short = create_access_token({"sub": "carol"}, timedelta(seconds=1))
+    with client.websocket_connect(f"/ws/carol-tab?observer=true&token={short}") as ws:
+        longer = create_access_token({"sub": "carol", "v": 2}, timedelta(minutes=5))
+        ws.send_json({"type": "refreshToken", "data": {"token": longer}})
+        assert ws.receive_json()["type"] == "tokenRefreshed"
+        time.sleep(1.5)
+        ws.send_json({"type": "ping", "data": {}})
+        assert ws.receive_json()["type"] == "pong"
+
+    started = time.time()
+    short = create_access_token({"sub": "dave"}, timedelta(seconds=1))
+    with client.websocket_connect(f"/ws/dave-tab?observer=true&token={short}") as ws:
+        expect_close(ws, 4401, "Token expired", timeout=3)
+    assert time.time() - started < 3
+    assert "dave-tab" not in main.manager.connections
+
+
+def test_revoked_token_drops_the_socket():
+    # Outlives the test, so only the revocation can close the socket
+    token = create_access_token({"sub": "erin"}, timedelta(hours=1))
+    with client.websocket_connect(f"/ws/erin-tab?observer=true&token={token}") as ws:
+        ws.send_json({"type": "ping", "data": {}})
+        ws.receive_json()
+        token_cache.revoke(token)
+        expect_close(ws, 4401, "Token revoked", timeout=2)
+
+
+def test_client_id_is_bound_to_its_principal():
+    alice = create_access_token({"sub": "alice"}, timedelta(minutes=5))
+    bob = create_access_token({"sub": "bob"}, timedelta(minutes=5))
+    active_before = main.SessionManager.active_count()
+    with client.websocket_connect(f"/ws/shared-tab?observer=true&token={alice}") as first:
+        first.send_json({"type": "ping", "data": {}})
+        first.receive_json()
+        original = main.manager.connections["shared-tab"]
+
+        # Another user cannot take the id over
+        try:
+            with client.websocket_connect(f"/ws/shared-tab?observer=true&token={bob}"):
+                assert False, "takeover accepted"
+        except WebSocketDisconnect as e:
+            assert e.code == 1008
+        assert main.manager.connections["shared-tab"] is original
+
+        # The same user reconnecting replaces the old socket and retires its session
+        with client.websocket_connect(f"/ws/shared-tab?observer=true&token={alice}") as second:
+            expect_close(first, 4409)
+            second.send_json({"type": "ping", "data": {}})
+            assert second.receive_json()["type"] == "pong"
+            replacement = main.manager.connections["shared-tab"]
+            assert replacement is not original and replacement.principal == "alice"
+            assert main.SessionManager.active_count() == active_before + 1
+    assert "shared-tab" not in main.manager.connections
+    assert main.SessionManager.active_count() == active_before
+
+
+if __name__ == "__main__":
+    test_upgrade_without_valid_token_is_refused()
+    test_no_crypto_after_the_handshake()
+    test_bearer_subprotocol()
+    test_expiry_closes_unless_refreshed()
+    test_revoked_token_drops_the_socket()
+    test_client_id_is_bound_to_its_principal()
+    print("✅ WebSocket auth tests passed")